@@ -0,0 +1,189 @@
+"""
+This script checks the AttackMaps (src/attack_maps.py), and compares the speed of their incremental updates and full
+rebuilds. It checks that:
+    (a) the legal moves (see move_legality.get_legal_moves()) are exactly the moves that don't leave the user's king in
+        check, as found by making every move and searching for a check from scratch (with the independent rules of
+        synthetic_boards.py)
+    (b) after a sequence of random changes to a board (moves of either side's pieces, castling, and bigger changes like
+        misrecognitions), the incrementally updated maps are the same as maps rebuilt from scratch
+The boards are the random boards of move_legality_differential.py.
+
+Usage (from the repository's root directory):
+    python -m benchmarks.attack_maps_equivalence [--positions N] [--changes N] [--seed SEED]
+"""
+import argparse
+import sys
+import time
+import numpy as np
+
+from src import chess_piece, move_legality
+from src.attack_maps import AttackMaps
+from src.board_state import BoardState
+from benchmarks.benchmark_utils import format_latencies
+from benchmarks.move_legality_differential import random_board
+from benchmarks.synthetic_boards import SyntheticBoardRenderer, PIECE_NAMES, EMPTY, _is_in_check
+
+DEFAULT_NUM_POSITIONS = 5000
+DEFAULT_NUM_CHANGES = 20 # the number of random changes made to each board
+MISRECOGNITION_PROBABILITY = 0.05 # the probability that a change is a bigger change, which rebuilds the maps
+MAX_REPORTED_ERRORS = 10
+
+_FEN_LETTERS = {chess_piece.get_piece_code(name, color): letter.upper() if color == 'white' else letter
+                for letter, name in PIECE_NAMES.items() for color in ('white', 'black')}
+
+
+def make_move(codes, current_pos, next_pos):
+    """
+    This function moves a piece (in place), including the rook of a castling and the pawn captured en passant.
+    """
+    (col, row), (next_col, next_row) = current_pos, next_pos
+    name = chess_piece.PIECE_CODES[codes[row, col]][0]
+    if name == 'king' and abs(next_col - col) == 2:
+        rook_col = 7 if next_col > col else 0
+        codes[row, (col + next_col) // 2], codes[row, rook_col] = codes[row, rook_col], chess_piece.EMPTY_CODE
+    elif name == 'pawn' and next_col != col and codes[next_row, next_col] == chess_piece.EMPTY_CODE:
+        codes[next_row + 1, next_col] = chess_piece.EMPTY_CODE
+    codes[next_row, next_col], codes[row, col] = codes[row, col], chess_piece.EMPTY_CODE
+
+
+def is_user_in_check(codes, user_color):
+    """
+    This function determines if the user's king is in check, with the rules of synthetic_boards.py.
+    """
+    position = np.vectorize(lambda code: _FEN_LETTERS.get(code, EMPTY))(codes)
+    if user_color == 'black':
+        position = position[::-1, ::-1]
+    king_squares = np.argwhere(position == ('K' if user_color == 'white' else 'k'))
+    return len(king_squares) > 0 and _is_in_check(position, tuple(king_squares[0]), by_white=user_color == 'black')
+
+
+def find_legal_moves(board_state, user_color):
+    """
+    This function finds the legal moves of the user by making every move (ignoring the king's safety), and keeping the
+    moves that don't leave the user's king in check.
+
+    Output:
+        - return: a set of the legal moves, as (current position, next position, piece name)
+    """
+    legal_moves = set()
+    for row, col in np.argwhere(np.isin(board_state.codes, [chess_piece.get_piece_code(name, user_color)
+                                                            for name in chess_piece.PIECE_TYPES])):
+        current_pos = (int(col), int(row))
+        name = board_state[current_pos[1], current_pos[0]].name
+        destinations = move_legality.get_destinations(name, user_color, current_pos, board_state)
+        for next_square in range(0, 64):
+            if not destinations >> next_square & 1:
+                continue
+            next_pos = (next_square % 8, next_square // 8)
+            codes = board_state.codes.copy()
+            make_move(codes, current_pos, next_pos)
+            if is_user_in_check(codes, user_color):
+                continue
+            if name == 'king' and abs(next_pos[0] - current_pos[0]) == 2:
+                # The king can't castle out of check, or through an attacked square
+                passed_codes = board_state.codes.copy()
+                make_move(passed_codes, current_pos, ((current_pos[0] + next_pos[0]) // 2, next_pos[1]))
+                if is_user_in_check(board_state.codes, user_color) or is_user_in_check(passed_codes, user_color):
+                    continue
+            legal_moves.add((current_pos, next_pos, name))
+    return legal_moves
+
+
+def random_change(codes, rng):
+    """
+    This function makes a random change to a board (in place): a piece of either side moved to a random square (that
+    isn't its own side's), a castling, or (rarely) a misrecognition of several squares.
+    """
+    if rng.random() < MISRECOGNITION_PROBABILITY:
+        squares = rng.choice(64, size=rng.integers(5, 10), replace=False)
+        codes.ravel()[squares] = rng.choice([code for code in range(len(chess_piece.PIECE_CODES))
+                                             if chess_piece.PIECE_CODES[code][0] != 'king'], size=len(squares))
+        return
+    occupied_squares = np.flatnonzero(np.isin(codes, list(_FEN_LETTERS)))
+    square = occupied_squares[rng.integers(len(occupied_squares))]
+    row, col = divmod(int(square), 8)
+    color = chess_piece.PIECE_CODES[codes[row, col]][1]
+    if chess_piece.PIECE_CODES[codes[row, col]][0] == 'king' and row == 7 and 2 <= col <= 5 and rng.random() < 0.5:
+        make_move(codes, (col, row), (col + 2 * (1 if rng.integers(2) else -1), row))
+        return
+    destinations = [next_square for next_square in range(0, 64)
+                    if chess_piece.PIECE_CODES[codes.ravel()[next_square]][1] != color
+                    and chess_piece.PIECE_CODES[codes.ravel()[next_square]][0] != 'king']
+    next_row, next_col = divmod(destinations[rng.integers(len(destinations))], 8)
+    codes[next_row, next_col], codes[row, col] = codes[row, col], chess_piece.EMPTY_CODE
+
+
+def compare_maps(expected, actual):
+    """
+    This function lists the differences between two AttackMaps of the same board.
+    """
+    return [field for field in ('piece_attacks', 'king_squares', 'attacked', 'checkers', 'pinned', 'pin_rays',
+                                'check_masks')
+            if getattr(expected, field) != getattr(actual, field)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the attack maps, and time their updates")
+    parser.add_argument('--positions', type=int, default=DEFAULT_NUM_POSITIONS, help="the number of boards to check")
+    parser.add_argument('--changes', type=int, default=DEFAULT_NUM_CHANGES,
+                        help="the number of random changes made to each board")
+    parser.add_argument('--seed', type=int, default=0, help="the seed of the random number generator")
+    args = parser.parse_args()
+
+    renderer = SyntheticBoardRenderer(args.seed)
+    rng = np.random.default_rng(args.seed)
+    num_legal_moves = 0
+    num_king_safety_moves = 0 # moves ignoring the king's safety, which are illegal
+    legality_errors = []
+    update_errors = []
+    update_latencies = []
+    rebuild_latencies = []
+    for _ in range(args.positions):
+        board_state, user_color = random_board(renderer, rng)
+        attack_maps = AttackMaps(board_state, user_color)
+        legal_moves = {(current_pos, next_pos, name)
+                       for (next_pos, name), sources in
+                       move_legality.get_legal_moves(board_state, user_color, attack_maps).items()
+                       for current_pos in sources}
+        unchecked_moves = sum(map(len, move_legality.get_legal_moves(board_state, user_color).values()))
+        expected_moves = find_legal_moves(board_state, user_color)
+        num_legal_moves += len(expected_moves)
+        num_king_safety_moves += unchecked_moves - len(expected_moves)
+        if legal_moves != expected_moves:
+            legality_errors.append((board_state, user_color, expected_moves - legal_moves, legal_moves - expected_moves))
+
+        codes = board_state.codes.copy()
+        for _ in range(args.changes):
+            random_change(codes, rng)
+            board_state = BoardState(codes)
+            board_state.get_occupancy()
+            start_time = time.perf_counter()
+            attack_maps.update(board_state)
+            update_latencies.append(time.perf_counter() - start_time)
+            start_time = time.perf_counter()
+            rebuilt_maps = AttackMaps(board_state, user_color)
+            rebuild_latencies.append(time.perf_counter() - start_time)
+            differences = compare_maps(rebuilt_maps, attack_maps)
+            if differences:
+                update_errors.append((board_state, user_color, differences))
+                attack_maps = rebuilt_maps
+
+    print(f"Checked the legal moves of {args.positions} boards: {num_legal_moves} legal moves, "
+          f"{num_king_safety_moves} moves left out for the king's safety, {len(legality_errors)} boards with errors")
+    print(f"Checked {len(update_latencies)} updates: {len(update_errors)} differ from a rebuild")
+    print(f"  update  {format_latencies(update_latencies)}")
+    print(f"  rebuild {format_latencies(rebuild_latencies)}")
+
+    for board_state, user_color, missing_moves, extra_moves in legality_errors[:MAX_REPORTED_ERRORS]:
+        print(f"{user_color} at the bottom: missing legal moves {sorted(missing_moves)}, "
+              f"illegal moves {sorted(extra_moves)}")
+        print(board_state)
+    for board_state, user_color, differences in update_errors[:MAX_REPORTED_ERRORS]:
+        print(f"{user_color} at the bottom: updated maps differ in {differences}")
+        print(board_state)
+    if legality_errors or update_errors:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+"""
+This file defines helper functions that are shared by the benchmarks.
+"""
+import time
+import numpy as np
+
+
+def time_calls(function, num_calls):
+    """
+    Call a function repeatedly and measure how long each call takes.
+
+    Parameters:
+        - function: the function to call (without arguments)
+        - num_calls: the number of times to call the function
+    Output:
+        - return: a list of the latency (in seconds) of every call
+    """
+    latencies = []
+    for _ in range(num_calls):
+        start = time.perf_counter()
+        function()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def format_latencies(latencies):
+    """
+    Summarize a list of latencies (in seconds) as a single line: throughput, mean, p50, and p99.
+    """
+    latencies_ms = 1000 * np.array(latencies)
+    return (f"{len(latencies_ms) / np.sum(latencies_ms) * 1000:8.1f} per second | "
+            f"mean {np.mean(latencies_ms):7.2f} ms | "
+            f"p50 {np.percentile(latencies_ms, 50):7.2f} ms | "
+            f"p99 {np.percentile(latencies_ms, 99):7.2f} ms")
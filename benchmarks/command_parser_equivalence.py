@@ -0,0 +1,95 @@
+"""
+This script checks the compiled command parser (src/command_parser.py) against the command extraction that it replaced
+(legacy_command_parser.py), and compares the speed of the two. Both extract a command from the same word buffers, which
+must end up with the same command (type, words, and length) and the same remaining words.
+
+The word buffers are enumerated exhaustively:
+    (a) every sequence of up to --max-length words, over every keyword of the command dictionary and a word that
+        isn't a keyword
+    (b) every valid command (every command format, with every combination of its keywords), alone, and followed by
+        each of these words
+Any difference is reported, and the script exits with an error.
+
+Usage (from the repository's root directory):
+    python -m benchmarks.command_parser_equivalence [--max-length N]
+"""
+import argparse
+import itertools
+import sys
+import time
+
+from src.text_to_command import TextToCmdBuffer
+from benchmarks.legacy_command_parser import legacy_get_command
+
+DEFAULT_MAX_LENGTH = 4
+UNKNOWN_WORD = 'banana'
+MAX_REPORTED_ERRORS = 10
+
+
+def describe(command, words):
+    """
+    This function summarizes the result of a command extraction, so that two results can be compared.
+    """
+    if command is None:
+        return None, words
+    return type(command).__name__, command.data, command.length, words
+
+
+def enumerate_word_buffers(buffer, max_length):
+    """
+    This function enumerates the word buffers to check (see the top of the file).
+    """
+    vocabulary = sorted({str(word) for words in buffer.keywords_dictionary.values() for word in words})
+    vocabulary.append(UNKNOWN_WORD)
+    for length in range(1, max_length + 1):
+        for words in itertools.product(vocabulary, repeat=length):
+            yield list(words)
+    for command_format in buffer.command_formats:
+        keyword_lists = [buffer.keywords_dictionary[word_type] for word_type in command_format.components]
+        for words in itertools.product(*keyword_lists):
+            yield list(words)
+            for next_word in vocabulary:
+                yield list(words) + [next_word]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the compiled command parser against the legacy one")
+    parser.add_argument('--max-length', type=int, default=DEFAULT_MAX_LENGTH,
+                        help="the length of the longest sequences of keywords to enumerate")
+    args = parser.parse_args()
+
+    buffer = TextToCmdBuffer()
+    legacy_time = compiled_time = 0
+    num_buffers = num_commands = 0
+    errors = []
+    for words in enumerate_word_buffers(buffer, args.max_length):
+        legacy_words, compiled_words = words.copy(), words.copy()
+        start_time = time.perf_counter()
+        legacy_command = legacy_get_command(legacy_words, buffer.command_formats, buffer.keywords_dictionary)
+        legacy_time += time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        compiled_command = buffer.parser.parse(compiled_words)
+        if compiled_command is not None:
+            del compiled_words[:compiled_command.length] # like TextToCmdBuffer.get_command()
+        compiled_time += time.perf_counter() - start_time
+
+        num_buffers += 1
+        num_commands += legacy_command is not None
+        expected, actual = describe(legacy_command, legacy_words), describe(compiled_command, compiled_words)
+        if expected != actual:
+            errors.append((words, expected, actual))
+
+    print(f"Checked {num_buffers} word buffers ({num_commands} with a command)")
+    print(f"  legacy parser:   {1e6 * legacy_time / num_buffers:6.2f} us per buffer")
+    print(f"  compiled parser: {1e6 * compiled_time / num_buffers:6.2f} us per buffer "
+          f"({legacy_time / compiled_time:.1f}x faster)")
+    if errors:
+        print(f"{len(errors)} differences, including:")
+        for words, expected, actual in errors[:MAX_REPORTED_ERRORS]:
+            print(f"  {words}: expected {expected}, got {actual}")
+        sys.exit(1)
+    print("No differences")
+
+
+if __name__ == '__main__':
+    main()
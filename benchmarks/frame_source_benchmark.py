@@ -0,0 +1,79 @@
+"""
+This script benchmarks every frame source (i.e. screen capture backend), and the whole board recognition stack on
+recorded frames. Backends that aren't available on this machine (ex: no display, mss not installed) are skipped.
+
+Usage (from the repository's root directory):
+    python -m benchmarks.frame_source_benchmark [--frames N] [--replay-path PATH]
+
+The replay path can be an image, a directory of images, or a video file. It defaults to the sample chessboard.
+"""
+import argparse
+import os
+import tempfile
+
+from src import board_recognition
+from src.board_recognition import BoardRecognizer
+from src.frame_source import (FRAME_SOURCE_NAMES, create_frame_source, ImageGrabFrameSource, MssFrameSource,
+                              ReplayFrameSource)
+from benchmarks.benchmark_utils import time_calls, format_latencies
+
+DEFAULT_NUM_FRAMES = 50
+DEFAULT_REPLAY_PATH = 'res/chessboard-sample.png'
+BOARD_REGION_SIZE = 800 # the width and height (in pixels) of the region grabbed when the board is tracked
+
+
+def benchmark_frame_sources(num_frames, replay_path):
+    print(f"Frame sources ({num_frames} frames each)")
+    # The frame sources are created directly, since create_frame_source() falls back to ImageGrab without mss
+    frame_source_types = {'imagegrab': ImageGrabFrameSource, 'mss': MssFrameSource,
+                          'replay': lambda: ReplayFrameSource.from_path(replay_path)}
+    for name in FRAME_SOURCE_NAMES:
+        try:
+            frame_source = frame_source_types[name]()
+            screen_width, screen_height = frame_source.get_screen_size()
+        except Exception as e:
+            print(f"  {name:10} unavailable: {type(e).__name__}: {e}")
+            continue
+
+        def grab_region(region):
+            frame_source.next_frame()
+            frame_source.grab(region)
+
+        full_screen = (0, 0, screen_width, screen_height)
+        board_region = (0, 0, min(BOARD_REGION_SIZE, screen_width), min(BOARD_REGION_SIZE, screen_height))
+        print(f"  {name:10} full screen  {format_latencies(time_calls(lambda: grab_region(full_screen), num_frames))}")
+        print(f"  {name:10} board region {format_latencies(time_calls(lambda: grab_region(board_region), num_frames))}")
+
+
+def benchmark_board_recognition(num_frames, replay_path):
+    print(f"Board recognition on replayed frames from {replay_path} ({num_frames} frames each)")
+    for tracking in (False, True):
+        board_recognizer = BoardRecognizer(tracking=tracking, frame_source=create_frame_source('replay', replay_path))
+        num_detections = 0
+
+        def recognize():
+            nonlocal num_detections
+            if board_recognizer._get_board_coords() is not None:
+                board_recognizer._identify_pieces()
+                num_detections += 1
+
+        latencies = time_calls(recognize, num_frames)
+        mode = 'tracking' if tracking else 'full search'
+        print(f"  {mode:12} {format_latencies(latencies)} | board detected in {num_detections}/{num_frames} frames")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the frame sources and the board recognition")
+    parser.add_argument('--frames', type=int, default=DEFAULT_NUM_FRAMES, help="the number of frames to capture")
+    parser.add_argument('--replay-path', default=DEFAULT_REPLAY_PATH, help="the frames to replay")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # Don't overwrite the board's last known location
+        board_recognition.BOARD_LOCATION_FILE = os.path.join(temp_dir, 'board_location.yaml')
+        benchmark_frame_sources(args.frames, args.replay_path)
+        benchmark_board_recognition(args.frames, args.replay_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+"""
+This script checks the GameModel (src/game_model.py) on simulated games, and measures how often it lets the
+ControllerThread skip the board recognition before a move.
+
+Both sides play random legal moves (see move_legality.get_legal_moves()), from the initial position, with the user
+playing white or black. The simulation keeps its own castling rights and en passant square. After every move, the model
+observes the recognized boards: the board after the user's move, then the board after the opponent's move. Some of the
+recognized boards are misrecognized (a few random squares are wrong), like a real recognition would sometimes do.
+
+The script reports how the recognized boards were classified (matches, opponent moves, mismatches), the fraction of
+the user's moves for which the recognition was skipped (because the model already knew the opponent's move), and the
+time to observe a board. Without misrecognitions, the model must always find the opponent's move, and agree with the
+simulation on the board, the castling rights, and the en passant square: any disagreement is reported, and the script
+exits with an error.
+
+Usage (from the repository's root directory):
+    python -m benchmarks.game_model_simulation [--games N] [--misrecognition-rate RATE] [--seed SEED]
+"""
+import argparse
+import logging
+import sys
+import time
+import numpy as np
+
+from src import chess_piece, move_legality
+from src.attack_maps import AttackMaps
+from src.board_state import BoardState
+from src.game_model import GameModel
+from benchmarks.benchmark_utils import format_latencies
+from benchmarks.move_legality_differential import INITIAL_FEN, _PIECE_CODES
+from benchmarks.synthetic_boards import fen_to_position
+
+DEFAULT_NUM_GAMES = 200
+MAX_GAME_LENGTH = 150 # the most moves of each side in a game
+DEFAULT_MISRECOGNITION_RATE = 0.0 # the probability that a recognized board is misrecognized
+MAX_MISRECOGNIZED_SQUARES = 3
+MAX_REPORTED_ERRORS = 10
+
+
+class SimulatedGame:
+    """
+    A game between two random players, with its castling rights and en passant square. Each side's moves are found on
+    the board as seen from its own side (i.e. rotated for the opponent), since the rules are written for the user.
+    """
+    def __init__(self, user_color, rng):
+        self.user_color = user_color
+        self.rng = rng
+        position = fen_to_position(INITIAL_FEN)
+        codes = np.vectorize(_PIECE_CODES.get, otypes=[np.int8])(position)
+        self.codes = codes if user_color == 'white' else codes[::-1, ::-1].copy() # as seen by the user
+        self.castling_rights = {'white': {0, 7}, 'black': {0, 7}} # rook columns, as seen by each side
+        self.en_passant_pos = None # as seen by the side to move
+
+    def play(self, color):
+        """
+        This function plays a random legal move of a side.
+
+        Output:
+            - return: the move as seen by the user ((column, row), (column, row)), or None if the side can't move
+        """
+        codes = self.codes if color == self.user_color else self.codes[::-1, ::-1].copy()
+        board_state = BoardState(codes)
+        legal_moves = move_legality.get_legal_moves(board_state, color, AttackMaps(board_state, color))
+        moves = []
+        for (next_pos, name), sources in legal_moves.items():
+            for current_pos in sources:
+                if name == 'king' and abs(next_pos[0] - current_pos[0]) == 2:
+                    if (7 if next_pos[0] > current_pos[0] else 0) not in self.castling_rights[color]:
+                        continue
+                elif (name == 'pawn' and next_pos[0] != current_pos[0]
+                      and codes[next_pos[1], next_pos[0]] == chess_piece.EMPTY_CODE and next_pos != self.en_passant_pos):
+                    continue
+                moves.append((current_pos, next_pos))
+        if not moves:
+            return None
+        current_pos, next_pos = moves[self.rng.integers(len(moves))]
+        self._make_move(codes, color, current_pos, next_pos)
+        if color == self.user_color:
+            self.codes = codes
+            return current_pos, next_pos
+        self.codes = codes[::-1, ::-1].copy()
+        return (7 - current_pos[0], 7 - current_pos[1]), (7 - next_pos[0], 7 - next_pos[1])
+
+    def _make_move(self, codes, color, current_pos, next_pos):
+        """
+        This function makes a move on the board as seen by the side that moves, and updates the castling rights and
+        the en passant square.
+        """
+        (col, row), (next_col, next_row) = current_pos, next_pos
+        name = chess_piece.PIECE_CODES[codes[row, col]][0]
+        other_color = move_legality.OTHER_COLOR[color]
+        self.en_passant_pos = None
+        if name == 'king':
+            self.castling_rights[color] = set()
+            if abs(next_col - col) == 2:
+                rook_col = 7 if next_col > col else 0
+                codes[row, (col + next_col) // 2], codes[row, rook_col] = codes[row, rook_col], chess_piece.EMPTY_CODE
+        elif name == 'rook' and row == 7:
+            self.castling_rights[color].discard(col)
+        elif name == 'pawn':
+            if next_col != col and codes[next_row, next_col] == chess_piece.EMPTY_CODE:
+                codes[next_row + 1, next_col] = chess_piece.EMPTY_CODE
+            if row - next_row == 2:
+                self.en_passant_pos = (7 - col, 7 - (row - 1)) # as seen by the other side
+            if next_row == 0:
+                codes[row, col] = chess_piece.get_piece_code('queen', color)
+        if next_row == 0 and next_col in (0, 7):
+            self.castling_rights[other_color].discard(7 - next_col) # the other side's rook was captured
+        codes[next_row, next_col], codes[row, col] = codes[row, col], chess_piece.EMPTY_CODE
+
+
+def misrecognize(codes, rng):
+    """
+    This function returns a copy of a board with a few random squares misrecognized.
+    """
+    codes = codes.copy()
+    squares = rng.choice(64, size=rng.integers(1, MAX_MISRECOGNIZED_SQUARES + 1), replace=False)
+    codes.ravel()[squares] = rng.integers(len(chess_piece.PIECE_CODES) - 1, size=len(squares))
+    return codes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the game model on simulated games")
+    parser.add_argument('--games', type=int, default=DEFAULT_NUM_GAMES, help="the number of games to simulate")
+    parser.add_argument('--misrecognition-rate', type=float, default=DEFAULT_MISRECOGNITION_RATE,
+                        help="the probability that a recognized board is misrecognized")
+    parser.add_argument('--seed', type=int, default=0, help="the seed of the random number generator")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING) # the mismatches of the misrecognized boards are expected
+
+    rng = np.random.default_rng(args.seed)
+    results = {'match': 0, 'opponent move': 0, 'mismatch': 0}
+    observe_latencies = []
+    num_user_moves = 0
+    num_skipped_recognitions = 0
+    errors = []
+
+    def observe(game_model, codes):
+        if rng.random() < args.misrecognition_rate:
+            observe(game_model, misrecognize(codes, rng))
+        board_state = BoardState(codes)
+        start_time = time.perf_counter()
+        result = game_model.observe(board_state)
+        observe_latencies.append(time.perf_counter() - start_time)
+        results[result] += 1
+        return result
+
+    for game_ndx in range(args.games):
+        user_color = 'white' if game_ndx % 2 == 0 else 'black'
+        game = SimulatedGame(user_color, rng)
+        opponent_color = move_legality.OTHER_COLOR[user_color]
+        if user_color == 'black':
+            game.play(opponent_color)
+        game_model = GameModel(BoardState(game.codes), user_color)
+
+        for _ in range(MAX_GAME_LENGTH):
+            num_user_moves += 1
+            if game_model.is_users_turn:
+                num_skipped_recognitions += 1
+            else:
+                observe(game_model, game.codes) # the recognition before the user's move
+            move = game.play(user_color)
+            if move is None:
+                break
+            game_model.apply_user_move(*move)
+            observe(game_model, game.codes)
+            if game.play(opponent_color) is None:
+                break
+            result = observe(game_model, game.codes)
+
+            if args.misrecognition_rate == 0:
+                expected = (BoardState(game.codes), True, game.castling_rights[user_color], game.en_passant_pos)
+                actual = (game_model.board_state, game_model.is_users_turn,
+                          game_model.castling_rights[user_color], game_model.en_passant_pos)
+                if result != 'opponent move' or expected != actual:
+                    errors.append((result, expected, actual))
+                    game_model = GameModel(BoardState(game.codes), user_color)
+
+    num_boards = sum(results.values())
+    print(f"Simulated {args.games} games ({num_user_moves} moves of the user), "
+          f"with a misrecognition rate of {args.misrecognition_rate}")
+    print(f"  recognized boards: {num_boards} | " + ' | '.join(f"{result}: {count}"
+                                                               for result, count in results.items()))
+    print(f"  skipped recognitions: {num_skipped_recognitions} ({100 * num_skipped_recognitions / num_user_moves:.1f}% "
+          f"of the user's moves)")
+    print(f"  observe {format_latencies(observe_latencies)}")
+    if errors:
+        print(f"{len(errors)} disagreements with the simulation, including:")
+        for result, expected, actual in errors[:MAX_REPORTED_ERRORS]:
+            print(f"  {result}: expected (turn, castling, en passant) {expected[1:]}, got {actual[1:]}")
+            print(expected[0])
+            print(actual[0])
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
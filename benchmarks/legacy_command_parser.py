@@ -0,0 +1,58 @@
+"""
+This file is a frozen copy of the command extraction that TextToCmdBuffer.get_command used before it was replaced by the
+compiled automaton of src/command_parser.py. It's only used as the reference of command_parser_equivalence.py.
+Besides turning the method into a function of the words (the word buffer), the command formats, and the keywords, the
+only change is that its debug logs were removed.
+"""
+from src.command import Command, MoveCommand
+
+
+def legacy_get_command(words, command_formats, keywords_dictionary):
+    """
+    Extract a command from a word buffer, if the buffer contains is a sequence of words that represents a command.
+    Otherwise, return None.
+
+    Parameters:
+        - words: the word buffer (a list of words), from which the command's words are removed
+        - command_formats: a list of CommandFormat objects
+        - keywords_dictionary: the lists of keywords, by word type
+    Return:
+        - command: a move command (ie. Move object), a normal command (ie. Command object), or None
+    """
+    command = None
+    word_ndx = 0
+    possible_formats = command_formats.copy()
+
+    # Check to see if the sequence of the first 'word_ndx' number of words matches a command format
+    while word_ndx < len(words) and len(possible_formats) > 0:
+        format_ndx = 0
+
+        # Loop through every possible format
+        while format_ndx < len(possible_formats):
+            possible_format = possible_formats[format_ndx]
+
+            if words[word_ndx] in keywords_dictionary[possible_format.get_word_type(word_ndx)]:
+                # Fix the 2/to misinterpretation
+                if words[word_ndx] == '2' and possible_format.get_word_type(word_ndx) == 'to':
+                    words[word_ndx] = 'to'
+
+                # If the first 'word_ndx' number of words matches a command format,
+                # set the return value to the command that the first 'word_ndx' number of words represents
+                if possible_format.length == word_ndx + 1:
+                    if possible_format.name.find('move') != -1:
+                        command = MoveCommand(words[:word_ndx + 1])
+                    elif possible_format.name.find('single') != -1:
+                        command = Command(words[:word_ndx + 1])
+                    possible_formats.pop(format_ndx)
+                else:
+                    format_ndx += 1
+
+            # Remove all invalid formats
+            else:
+                possible_formats.pop(format_ndx)
+        word_ndx += 1
+
+    if command is not None:
+        del words[:command.length]
+
+    return command
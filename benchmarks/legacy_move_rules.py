@@ -0,0 +1,255 @@
+"""
+This file is a frozen copy of the move rules that ChessPiece.can_be_moved used before they were replaced by the bitboard
+rules in src/move_legality.py. It's only used as the reference of the differential test harness
+(move_legality_differential.py). Besides turning the method into a function, the only change is that its debug logs were
+removed.
+
+Definition of first and second diagonals of a square matrix:
+     a - - - b
+     - a - b -   The 'a's represent the first diagonal
+     - - * - -   The 'b's represent the second diagonal
+     - b - a -   The '*' is an element of both diagonals
+     b - - - a
+"""
+
+
+def legacy_can_be_moved(piece, current_pos, next_pos, board_state):
+    """
+    This function determines if a piece can be moved from point A to point B given the current state of the board,
+    using the legacy rules.
+
+    Parameters:
+        - piece: the ChessPiece to move
+        - current_pos: the piece's current position in the form (column, row)
+        - next_pos: the piece's destination position in the form (column, row)
+        - board_state: a BoardState
+    Output:
+        - return: if the piece can be moved from its current position to its next position, then return True,
+            else, return False
+    """
+    # TODO: establish the rules for each piece in a clearer, more elegant way
+
+    is_legal = True
+
+    # Rules that apply to all types of pieces
+    if current_pos == next_pos:
+        is_legal = False  # can't "move" by not moving
+    if board_state[next_pos[1], next_pos[0]].color == piece.color:
+        is_legal = False  # can't move to spot occupied by piece of same color
+
+    # Useful variables for helping to determine if a piece is in the way
+    sorted_rows = [current_pos[1], next_pos[1]]
+    sorted_rows.sort()
+    sorted_columns = [current_pos[0], next_pos[0]]
+    sorted_columns.sort()
+
+    # Rules specific to each type of piece
+    # KING
+    if piece.name == 'king':
+        # move by more than 1 column
+        if abs(current_pos[0] - next_pos[0]) > 1:
+            if not ((piece.color == 'white' and current_pos == (4, 7)) or
+                    (piece.color == 'black' and current_pos == (3, 7))):
+                is_legal = False
+            else:
+                if piece.color == 'black':
+                    if (current_pos[0] - next_pos[0]) == 2:
+                        if not ((board_state[7, 0].name == 'rook') and (board_state[7, 0].color == 'black')):
+                            is_legal = False
+                        else:
+                            if _horizontal_is_blocked(7, (3, 0), board_state):
+                                is_legal = False
+                    elif (current_pos[0] - next_pos[0]) == -2:
+                        if not ((board_state[7, 7].name == 'rook') and (board_state[7, 7].color == 'black')):
+                            is_legal = False
+                        else:
+                            if _horizontal_is_blocked(7, (3, 7), board_state):
+                                is_legal = False
+                    else:
+                        is_legal = False
+                else:
+                    if (current_pos[0] - next_pos[0]) == 2:
+                        if not ((board_state[7, 0].name == 'rook') and (board_state[7, 0].color == 'white')):
+                            is_legal = False
+                        else:
+                            if _horizontal_is_blocked(7, (4, 0), board_state):
+                                is_legal = False
+                    elif (current_pos[0] - next_pos[0]) == -2:
+                        if not ((board_state[7, 7].name == 'rook') and (board_state[7, 7].color == 'white')):
+                            is_legal = False
+                        else:
+                            if _horizontal_is_blocked(7, (4, 7), board_state):
+                                is_legal = False
+                    else:
+                        is_legal = False
+
+        # move by more than 1 row
+        if abs(current_pos[1] - next_pos[1]) > 1:
+            is_legal = False
+
+    # QUEEN
+    elif piece.name == 'queen':
+        # vertical move, but a piece is in the way
+        if _on_vertical_line(sorted_rows):
+            if _vertical_is_blocked(current_pos[0], sorted_rows, board_state):
+                is_legal = False
+        # horizontal move, but a piece is in the way
+        elif _on_horizontal_line(sorted_columns):
+            if _horizontal_is_blocked(current_pos[1], sorted_columns, board_state):
+                is_legal = False
+        # diagonal move (first), but a piece is in the way
+        elif _on_first_diagonal(current_pos, next_pos):
+            if _first_diagonal_is_blocked(sorted_rows, sorted_columns, board_state):
+                is_legal = False
+        # diagonal move (second), but a piece is in the way
+        elif _on_second_diagonal(current_pos, next_pos):
+            if _second_diagonal_is_blocked(sorted_rows, sorted_columns, board_state):
+                is_legal = False
+        # neither vertical, horizontal, nor diagonal move
+        else:
+            is_legal = False
+
+    # PAWN
+    elif piece.name == 'pawn':
+        # not vertical move
+        if not _on_vertical_line(sorted_columns):
+            if (current_pos[1] - next_pos[1]) == 1 and abs(current_pos[0] - next_pos[0]) == 1:
+                if board_state[next_pos[1], next_pos[0]].name == 'empty':
+                    if current_pos[1] == 3 and board_state[3, next_pos[0]].name == 'pawn':
+                        if piece.color == 'black':
+                            if not ((board_state[next_pos[1], next_pos[0]].color == 'white') or
+                                    (board_state[next_pos[1] + 1, next_pos[0]].color == 'white')):
+                                is_legal = False
+                        else:
+                            if not ((board_state[next_pos[1], next_pos[0]].color == 'black') or
+                                    (board_state[next_pos[1] + 1, next_pos[0]].color == 'black')):
+                                is_legal = False
+                    else:
+                        is_legal = False
+            else:
+                is_legal = False
+
+        # move forward by 2, but...
+        if current_pos[1] - next_pos[1] == 2:
+            # pawn not in starting position
+            if current_pos[1] != 6:
+                is_legal = False
+            # a piece is in the way
+            if _vertical_is_blocked(current_pos[0], sorted_rows, board_state):
+                is_legal = False
+        # neither a move by 1 nor 2 spots forward
+        elif current_pos[1] - next_pos[1] != 1:
+            is_legal = False
+
+    # ROOK
+    elif piece.name == 'rook':
+        # vertical move, but a piece is in the way
+        if _on_vertical_line(sorted_rows):
+            if _vertical_is_blocked(current_pos[0], sorted_rows, board_state):
+                is_legal = False
+        # horizontal move, but a piece is in the way
+        elif _on_horizontal_line(sorted_columns):
+            if _horizontal_is_blocked(current_pos[1], sorted_columns, board_state):
+                is_legal = False
+        # neither vertical nor horizontal move
+        else:
+            is_legal = False
+
+    # KNIGHT
+    elif piece.name == 'knight':
+        delta_col = current_pos[0] - next_pos[0]
+        delta_row = current_pos[1] - next_pos[1]
+        # not an L-shaped move
+        if not ((delta_col == 2 and delta_row == 1)
+                or (delta_col == 2 and delta_row == -1)
+                or (delta_col == 1 and delta_row == 2)
+                or (delta_col == 1 and delta_row == -2)
+                or (delta_col == -1 and delta_row == 2)
+                or (delta_col == -1 and delta_row == -2)
+                or (delta_col == -2 and delta_row == 1)
+                or (delta_col == -2 and delta_row == -1)):
+            is_legal = False
+
+    # BISHOP
+    elif piece.name == 'bishop':
+        # diagonal move (first), but a piece is in the way
+        if _on_first_diagonal(current_pos, next_pos):
+            if _first_diagonal_is_blocked(sorted_rows, sorted_columns, board_state):
+                is_legal = False
+        # diagonal move (second), but a piece is in the way
+        elif _on_second_diagonal(current_pos, next_pos):
+            if _second_diagonal_is_blocked(sorted_rows, sorted_columns, board_state):
+                is_legal = False
+        # not a diagonal move
+        else:
+            is_legal = False
+
+    return is_legal
+
+
+''' HELPER FUNCTIONS '''
+def _on_vertical_line(cols):
+    """
+    Determine if given column indices are the same
+    """
+    return cols[0] == cols[1]
+
+def _on_horizontal_line(rows):
+    """
+    Determine if given row indices are the same
+    """
+    return rows[0] == rows[1]
+
+def _on_first_diagonal(coords1, coords2):
+    """
+    Determine if given coordinates are in a diagonal of type "first"
+    Note: see top of file for definition of "first diagonal"
+    """
+    return coords1[0] - coords2[0] == coords1[1] - coords2[1]
+
+def _on_second_diagonal(coords1, coords2):
+    """
+    Determine if given coordinates are in a diagonal of type "second"
+    Note: see top of file for definition of "second diagonal"
+    """
+    return coords1[0] - coords2[0] == coords2[1] - coords1[1]
+
+def _vertical_is_blocked(column, sorted_rows, board_data):
+    """
+    Determine if a piece is between two vertically aligned coordinates
+    """
+    is_blocked = False
+    for i in range(sorted_rows[0] + 1, sorted_rows[1]):
+        if board_data[i, column].name != 'empty':
+            is_blocked = True
+    return is_blocked
+
+def _horizontal_is_blocked(row, sorted_columns, board_data):
+    """
+    Determine if a piece is between two horizontally aligned coordinates
+    """
+    is_blocked = False
+    for i in range(sorted_columns[0] + 1, sorted_columns[1]):
+        if board_data[row, i].name != 'empty':
+            is_blocked = True
+    return is_blocked
+
+def _first_diagonal_is_blocked(sorted_rows, sorted_columns, board_data):
+    """
+    Determine if a piece is between two coordinates aligned on a "first" diagonal
+    """
+    is_blocked = False
+    for i in range(1, sorted_rows[1] - sorted_rows[0]):
+        if board_data[sorted_rows[0] + i, sorted_columns[0] + i].name != 'empty':
+            is_blocked = True
+    return is_blocked
+
+def _second_diagonal_is_blocked(sorted_rows, sorted_columns, board_data):
+    """
+    Determine if a piece is between two coordinates aligned on a "second" diagonal
+    """
+    is_blocked = False
+    for i in range(1, sorted_rows[1] - sorted_rows[0]):
+        if board_data[sorted_rows[1] - i, sorted_columns[0] + i].name != 'empty':
+            is_blocked = True
+    return is_blocked
@@ -0,0 +1,124 @@
+"""
+This script checks that the LengthClusterer produces the same clusters as the original scikit-learn KernelDensity
+clusterer, and compares the speed of the two.
+
+The reference implementation needs scikit-learn and scipy, which Hands-Free Chess itself no longer depends on:
+    pip install scikit-learn scipy
+
+Usage (from the repository's root directory):
+    python -m benchmarks.length_clusterer_equivalence [number of scanlines per screen]
+"""
+import sys
+import time
+import numpy as np
+import cv2
+from PIL import Image
+from sklearn.neighbors import KernelDensity
+from scipy.signal import argrelextrema
+
+from src.board_recognition import BoardRecognizer, SCALED_HEIGHT, CPCS_LENGTH_CLUSTERER
+
+SAMPLE_BOARD_FILE = 'res/chessboard-sample.png'
+SCREEN_SHAPE = (SCALED_HEIGHT, 1280)
+DEFAULT_SCANLINES_PER_SCREEN = 200
+
+
+TIE_TOLERANCE = 1e-9 # densities closer than this are considered equal (floating point noise)
+
+
+def reference_log_density(values):
+    """
+    The original clusterer's density: fit a KernelDensity and evaluate it over a 90 point grid.
+    """
+    kde = KernelDensity(kernel='gaussian', bandwidth=1).fit(values.reshape(-1, 1))
+    s = np.linspace(0, round(SCALED_HEIGHT/8), round(SCALED_HEIGHT/8))
+    return kde.score_samples(s.reshape(-1, 1))
+
+
+def reference_cluster_bounds(log_density):
+    """
+    The original clusterer's boundaries: the indices of the density's minima.
+    """
+    minima = argrelextrema(log_density, np.less)[0]
+    return np.append(minima, round(SCALED_HEIGHT/8) - 1)
+
+
+def is_tie(log_density, expected_bounds, actual_bounds):
+    """
+    Determine if two sets of boundaries only differ where the density has two (numerically) equal neighboring points,
+    in which case whether a minimum exists there depends on floating point rounding.
+    """
+    for bound in np.setxor1d(expected_bounds, actual_bounds):
+        neighbors = log_density[[bound - 1, bound + 1]]
+        if np.abs(neighbors - log_density[bound]).min() > TIE_TOLERANCE:
+            return False
+    return True
+
+
+def generate_screens(rng):
+    """
+    Generate grayscale screens: some with the sample chessboard at various sizes and offsets, some with random clutter,
+    and some with random noise.
+    """
+    board = cv2.cvtColor(np.array(Image.open(SAMPLE_BOARD_FILE)), cv2.COLOR_BGR2GRAY)
+    for board_size in (240, 320, 400, 480, 560, 640):
+        screen = np.full(SCREEN_SHAPE, rng.integers(0, 256), dtype=np.uint8)
+        top = rng.integers(0, SCREEN_SHAPE[0] - board_size)
+        left = rng.integers(0, SCREEN_SHAPE[1] - board_size)
+        screen[top:top + board_size, left:left + board_size] = cv2.resize(board, (board_size, board_size))
+        yield screen
+
+    for _ in range(4):
+        screen = np.full(SCREEN_SHAPE, rng.integers(0, 256), dtype=np.uint8)
+        for _ in range(300):
+            top, left = rng.integers(0, SCREEN_SHAPE[0]), rng.integers(0, SCREEN_SHAPE[1])
+            height, width = rng.integers(1, 80), rng.integers(1, 300)
+            screen[top:top + height, left:left + width] = rng.integers(0, 256)
+        yield screen
+
+    yield rng.integers(0, 256, SCREEN_SHAPE, dtype=np.uint8)
+    yield rng.integers(0, 2, SCREEN_SHAPE, dtype=np.uint8) * 255
+
+
+def main():
+    scanlines_per_screen = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_SCANLINES_PER_SCREEN
+    rng = np.random.default_rng(0)
+
+    corpus = []
+    for screen in generate_screens(rng):
+        lines = rng.choice(SCREEN_SHAPE[0], min(scanlines_per_screen, SCREEN_SHAPE[0]), replace=False)
+        corpus.extend(cpcs.lengths for cpcs in BoardRecognizer._encode_scanlines(screen[np.sort(lines)]))
+        columns = rng.choice(SCREEN_SHAPE[1], min(scanlines_per_screen, SCREEN_SHAPE[1]), replace=False)
+        corpus.extend(cpcs.lengths for cpcs in BoardRecognizer._encode_scanlines(screen.T[np.sort(columns)]))
+
+    mismatches = 0
+    ties = 0
+    reference_time = 0
+    clusterer_time = 0
+    for lengths in corpus:
+        start = time.perf_counter()
+        log_density = reference_log_density(lengths)
+        expected_bounds = reference_cluster_bounds(log_density)
+        expected = np.searchsorted(expected_bounds, lengths, side='right')
+        reference_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        actual, _ = CPCS_LENGTH_CLUSTERER.cluster(lengths)
+        clusterer_time += time.perf_counter() - start
+
+        if not np.array_equal(expected, actual):
+            if is_tie(log_density, expected_bounds, CPCS_LENGTH_CLUSTERER.get_cluster_bounds(lengths)):
+                ties += 1
+            else:
+                mismatches += 1
+
+    print(f"Scanlines compared: {len(corpus)}")
+    print(f"Scanlines with different clusters: {mismatches}")
+    print(f"Scanlines with different clusters due to numerical ties: {ties}")
+    print(f"KernelDensity: {1000 * reference_time / len(corpus):.3f} ms per scanline")
+    print(f"LengthClusterer: {1000 * clusterer_time / len(corpus):.3f} ms per scanline")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
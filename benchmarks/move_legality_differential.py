@@ -0,0 +1,171 @@
+"""
+This script checks the bitboard move rules (src/move_legality.py) against the legacy move rules that they replaced
+(legacy_move_rules.py), and compares the speed of the two: per move, and per piece (the legacy rules check every
+destination one at a time, the bitboard rules find all of them at once). For every random board, one random piece of
+the user's color (the color at the bottom of the board) is checked against all 64 destinations by both implementations.
+Each check of the bitboard rules finds all the destinations of the piece again, and only the occupancy bitboards of the
+board (computed once per BoardState) are reused.
+
+The boards come from two sources:
+    (a) random legal positions (see synthetic_boards.py), seen from a random side
+    (b) the initial position, seen from a random side, with random pieces removed or moved to random empty squares (to
+        exercise castling and the pawns' first move)
+
+The bitboard rules fix a few bugs of the legacy rules, so the two disagree on some moves. Every disagreement must be one
+of these known bugs (where the legacy rules allow an illegal move):
+    (a) a rook or queen moving horizontally or vertically through a piece (the legacy rules checked the squares between
+        a horizontal move vertically, and vice versa, so they never found a piece in the way)
+    (b) castling towards column 0 through a piece (the legacy rules checked an empty range of squares)
+    (c) castling off the back row (the legacy rules allowed the king to move two columns and one row)
+    (d) a pawn moving forward onto an occupied square
+Any other disagreement is reported, and the script exits with an error.
+
+Usage (from the repository's root directory):
+    python -m benchmarks.move_legality_differential [--positions N] [--seed SEED]
+
+For a thorough check, use a million positions (--positions 1000000).
+"""
+import argparse
+import sys
+import time
+import numpy as np
+
+from src import chess_piece, move_legality
+from src.board_state import BoardState
+from benchmarks.legacy_move_rules import legacy_can_be_moved
+from benchmarks.synthetic_boards import (SyntheticBoardRenderer, fen_to_position, PIECE_NAMES, EMPTY,
+                                         _get_piece_name_and_color)
+
+DEFAULT_NUM_POSITIONS = 20000
+INITIAL_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR'
+MAX_MOVED_PIECES = 4 # the largest number of pieces moved to random empty squares of the initial position
+MAX_REPORTED_MISMATCHES = 10
+KNOWN_BUGS = ['orthogonal move through a piece', 'castling towards column 0 through a piece',
+              'castling off the back row', 'pawn moving forward onto an occupied square']
+
+_PIECE_CODES = {piece: chess_piece.get_piece_code(*_get_piece_name_and_color(piece))
+                for piece in list(PIECE_NAMES) + [piece.upper() for piece in PIECE_NAMES]}
+_PIECE_CODES[EMPTY] = chess_piece.EMPTY_CODE
+
+
+def random_board(renderer, rng):
+    """
+    This function generates a random board, from either of the two sources.
+
+    Output:
+        - return: a tuple of the BoardState (as seen on the screen), and the user's color (the color at the bottom)
+    """
+    if rng.integers(2):
+        position = renderer.random_position()
+    else:
+        position = fen_to_position(INITIAL_FEN)
+        removal_probability = rng.random()
+        for row, col in np.argwhere(position != EMPTY):
+            if position[row, col].lower() != 'k' and rng.random() < removal_probability:
+                position[row, col] = EMPTY
+        for _ in range(rng.integers(MAX_MOVED_PIECES + 1)):
+            occupied_squares = np.argwhere(position != EMPTY)
+            empty_squares = np.argwhere(position == EMPTY)
+            (from_row, from_col), (to_row, to_col) = (occupied_squares[rng.integers(len(occupied_squares))],
+                                                      empty_squares[rng.integers(len(empty_squares))])
+            position[to_row, to_col], position[from_row, from_col] = position[from_row, from_col], EMPTY
+
+    white_at_bottom = bool(rng.integers(2))
+    if not white_at_bottom:
+        position = position[::-1, ::-1]
+    codes = np.vectorize(_PIECE_CODES.get, otypes=[np.int8])(position)
+    return BoardState(codes), 'white' if white_at_bottom else 'black'
+
+
+def classify_mismatch(board_state, piece, current_pos, next_pos, legacy_result):
+    """
+    This function determines which of the known bugs of the legacy rules explains a disagreement between the two
+    implementations (see the top of the file).
+
+    Output:
+        - return: the known bug, or None if the disagreement is unexpected
+    """
+    if not legacy_result:
+        return None
+    (col, row), (next_col, next_row) = current_pos, next_pos
+    if piece.name in ('rook', 'queen') and (col == next_col or row == next_row):
+        col_step, row_step = np.sign(next_col - col), np.sign(next_row - row)
+        between = [(row + i * row_step, col + i * col_step) for i in range(1, max(abs(next_col - col),
+                                                                                  abs(next_row - row)))]
+        if any(board_state[square].name != 'empty' for square in between):
+            return KNOWN_BUGS[0]
+    if piece.name == 'king' and abs(next_col - col) == 2:
+        if next_row != move_legality.BACK_ROW:
+            return KNOWN_BUGS[2]
+        if next_col < col and any(board_state[row, i].name != 'empty' for i in range(1, col)):
+            return KNOWN_BUGS[1]
+    if piece.name == 'pawn' and next_col == col and board_state[next_row, next_col].name != 'empty':
+        return KNOWN_BUGS[3]
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the bitboard move rules against the legacy move rules")
+    parser.add_argument('--positions', type=int, default=DEFAULT_NUM_POSITIONS, help="the number of boards to check")
+    parser.add_argument('--seed', type=int, default=0, help="the seed of the random number generator")
+    args = parser.parse_args()
+
+    renderer = SyntheticBoardRenderer(args.seed)
+    rng = np.random.default_rng(args.seed)
+    destinations = [(col, row) for row in range(0, 8) for col in range(0, 8)]
+    legacy_time = bitboard_time = all_destinations_time = 0
+    num_checks = 0
+    num_legal_moves = 0
+    known_bug_counts = dict.fromkeys(KNOWN_BUGS, 0)
+    unexpected_mismatches = []
+    for _ in range(args.positions):
+        board_state, user_color = random_board(renderer, rng)
+        user_squares = np.argwhere(np.isin(board_state.codes, [chess_piece.get_piece_code(name, user_color)
+                                                               for name in chess_piece.PIECE_TYPES]))
+        row, col = user_squares[rng.integers(len(user_squares))]
+        current_pos = (int(col), int(row))
+        piece = board_state[current_pos[1], current_pos[0]]
+
+        start_time = time.perf_counter()
+        legacy_results = [legacy_can_be_moved(piece, current_pos, next_pos, board_state) for next_pos in destinations]
+        legacy_time += time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        bitboard_results = [piece.can_be_moved(current_pos, next_pos, board_state) for next_pos in destinations]
+        bitboard_time += time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        move_legality.get_destinations(piece.name, piece.color, current_pos, BoardState(board_state.codes))
+        all_destinations_time += time.perf_counter() - start_time
+
+        num_checks += len(destinations)
+        num_legal_moves += sum(bitboard_results)
+        for next_pos, legacy_result, bitboard_result in zip(destinations, legacy_results, bitboard_results):
+            if legacy_result != bitboard_result:
+                bug = classify_mismatch(board_state, piece, current_pos, next_pos, legacy_result)
+                if bug is not None:
+                    known_bug_counts[bug] += 1
+                else:
+                    unexpected_mismatches.append((board_state, piece, current_pos, next_pos, legacy_result))
+
+    print(f"Checked {num_checks} moves ({num_legal_moves} legal) on {args.positions} boards")
+    print(f"  legacy rules:   {1e6 * legacy_time / num_checks:6.2f} us per move")
+    print(f"  bitboard rules: {1e6 * bitboard_time / num_checks:6.2f} us per move "
+          f"({legacy_time / bitboard_time:.1f}x the speed of the legacy rules)")
+    print(f"  all destinations of a piece: legacy rules {1e6 * legacy_time / args.positions:7.2f} us, "
+          f"bitboard rules {1e6 * all_destinations_time / args.positions:7.2f} us "
+          f"({legacy_time / all_destinations_time:.1f}x faster)")
+    print("Moves that only the legacy rules allow (known bugs):")
+    for bug, count in known_bug_counts.items():
+        print(f"  {count:8} {bug}")
+
+    if len(unexpected_mismatches) > 0:
+        print(f"{len(unexpected_mismatches)} unexpected mismatches, including:")
+        for board_state, piece, current_pos, next_pos, legacy_result in unexpected_mismatches[:MAX_REPORTED_MISMATCHES]:
+            print(f"{piece.color} {piece.name} from {current_pos} to {next_pos}: legacy rules say {legacy_result}, "
+                  f"bitboard rules say {not legacy_result}")
+            print(board_state)
+        sys.exit(1)
+    print("No unexpected mismatches")
+
+
+if __name__ == '__main__':
+    main()
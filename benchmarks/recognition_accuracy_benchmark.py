@@ -0,0 +1,147 @@
+"""
+This script measures the accuracy and the latency of the board recognition on synthetic screenshots (see
+synthetic_boards.py). Every screenshot is recognized by a new BoardRecognizer (without tracking), so every
+recognition searches the whole screen and classifies all 64 squares. The script reports:
+    (a) the detection rate: the fraction of screenshots in which the board was found at the right location (every
+        gridline within GRIDLINE_TOLERANCE of a square's size of the ground truth)
+    (b) the per-square accuracy: the fraction of the squares of the detected boards that were correctly identified
+    (c) the fraction of boards on which every square was correctly identified
+    (d) the latency of the whole recognition (capture, location and identification): throughput, mean, p50, and p99
+Results are also broken down by screen resolution. Run it before and after a recognition optimization to check for
+regressions.
+
+Usage (from the repository's root directory):
+    python -m benchmarks.recognition_accuracy_benchmark [--images N] [--seed SEED] [--dataset DIR]
+
+If a dataset directory (saved by synthetic_boards.py) is given, its screenshots are used instead of new ones.
+"""
+import argparse
+import os
+import queue
+import time
+import numpy as np
+import yaml
+from PIL import Image
+
+from src.board_recognition import BoardRecognizer
+from src.frame_source import ReplayFrameSource
+from benchmarks.benchmark_utils import format_latencies
+from benchmarks.synthetic_boards import SyntheticBoard, SyntheticBoardRenderer
+
+DEFAULT_NUM_IMAGES = 1000
+GRIDLINE_TOLERANCE = 0.1 # the largest gridline error, as a fraction of a square's size, for a board to be detected
+MAX_REPORTED_ERRORS = 10 # the number of misidentified squares to list
+
+
+class RecognitionResults:
+    """
+    The accumulated results of the board recognition on a group of screenshots.
+    """
+    def __init__(self):
+        self.num_boards = 0
+        self.num_detected = 0
+        self.num_found_elsewhere = 0 # boards that were found, but at the wrong location
+        self.num_squares = 0
+        self.num_correct_squares = 0
+        self.num_correct_boards = 0
+        self.latencies = []
+
+    def summarize(self):
+        detection_rate = self.num_detected / self.num_boards if self.num_boards > 0 else 0
+        square_accuracy = self.num_correct_squares / self.num_squares if self.num_squares > 0 else 0
+        board_accuracy = self.num_correct_boards / self.num_detected if self.num_detected > 0 else 0
+        return (f"detected {100 * detection_rate:5.1f}% ({self.num_detected}/{self.num_boards}, "
+                f"{self.num_found_elsewhere} misplaced) | square accuracy {100 * square_accuracy:6.2f}% | "
+                f"fully correct boards {100 * board_accuracy:5.1f}%")
+
+
+def recognize(board):
+    """
+    This function recognizes a synthetic screenshot, and compares the result to the ground truth.
+
+    Output:
+        - return: a tuple of
+            (a) the latency (in seconds) of the recognition
+            (b) the detection status: 'detected', 'misplaced', or 'not found'
+            (c) a list of the (expected, identified) pieces of every misidentified square (if detected)
+    """
+    board_recognizer = BoardRecognizer(tracking=False, frame_source=ReplayFrameSource([board.img]))
+    start_time = time.perf_counter()
+    recognized_board = board_recognizer.recognize_board(queue.Queue(maxsize=1))
+    latency = time.perf_counter() - start_time
+
+    if recognized_board is None:
+        return latency, 'not found', []
+    (col_coords, row_coords), board_state = recognized_board
+    square_size = (board.col_coords[-1] - board.col_coords[0]) / 8
+    gridline_error = max(np.max(np.abs(np.array(col_coords) - board.col_coords)),
+                         np.max(np.abs(np.array(row_coords) - board.row_coords)))
+    if gridline_error > GRIDLINE_TOLERANCE * square_size:
+        return latency, 'misplaced', []
+
+    expected_squares = board.get_screen_squares()
+    errors = [(expected_squares[row, col], (board_state[row, col].name, board_state[row, col].color))
+              for row in range(0, 8) for col in range(0, 8)
+              if expected_squares[row, col] != (board_state[row, col].name, board_state[row, col].color)]
+    return latency, 'detected', errors
+
+
+def load_dataset(directory):
+    """
+    This function loads the screenshots and ground truth saved by synthetic_boards.save_dataset().
+    """
+    with open(os.path.join(directory, 'ground_truth.yaml'), 'r') as ground_truth_file:
+        ground_truth = yaml.safe_load(ground_truth_file)
+    for fname in sorted(ground_truth):
+        truth = ground_truth[fname]
+        yield SyntheticBoard(Image.open(os.path.join(directory, fname)).convert('RGB'), truth['fen'],
+                             truth['white_at_bottom'], truth['col_coords'], truth['row_coords'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the accuracy and latency of the board recognition")
+    parser.add_argument('--images', type=int, default=DEFAULT_NUM_IMAGES, help="the number of screenshots to render")
+    parser.add_argument('--seed', type=int, default=0, help="the seed of the random number generator")
+    parser.add_argument('--dataset', help="a directory of saved screenshots to use instead of rendering new ones")
+    args = parser.parse_args()
+
+    if args.dataset is not None:
+        boards = load_dataset(args.dataset)
+    else:
+        renderer = SyntheticBoardRenderer(args.seed)
+        boards = (renderer.render() for _ in range(args.images))
+
+    results = RecognitionResults()
+    results_by_resolution = {}
+    errors = []
+    for board in boards:
+        latency, status, board_errors = recognize(board)
+        for group in (results, results_by_resolution.setdefault(board.img.size, RecognitionResults())):
+            group.num_boards += 1
+            group.latencies.append(latency)
+            if status == 'misplaced':
+                group.num_found_elsewhere += 1
+            elif status == 'detected':
+                group.num_detected += 1
+                group.num_squares += 64
+                group.num_correct_squares += 64 - len(board_errors)
+                group.num_correct_boards += 1 if len(board_errors) == 0 else 0
+        errors += board_errors
+
+    print(f"Board recognition on {results.num_boards} synthetic screenshots")
+    print(f"  all          {results.summarize()}")
+    print(f"  latency      {format_latencies(results.latencies)}")
+    for (width, height), resolution_results in sorted(results_by_resolution.items()):
+        print(f"  {width:4}x{height:<4}    {resolution_results.summarize()}")
+        print(f"  {width:4}x{height:<4}    latency {format_latencies(resolution_results.latencies)}")
+
+    if len(errors) > 0:
+        print(f"Most common misidentifications (expected -> identified), out of {len(errors)}:")
+        error_names = ['-'.join(expected) + ' -> ' + '-'.join(identified) for expected, identified in errors]
+        names, counts = np.unique(error_names, return_counts=True)
+        for ndx in np.argsort(-counts)[:MAX_REPORTED_ERRORS]:
+            print(f"  {counts[ndx]:5} {names[ndx]}")
+
+
+if __name__ == '__main__':
+    main()
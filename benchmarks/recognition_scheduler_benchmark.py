@@ -0,0 +1,114 @@
+"""
+This script compares the idle cost and the command latency of the RecognitionScheduler to those of a fixed polling
+loop, on recorded frames. Each scenario runs for a few seconds, during which a command is simulated every few seconds
+(i.e. a recognition is requested, and waited for, like the ControllerThread does when it receives a move).
+
+Usage (from the repository's root directory):
+    python -m benchmarks.recognition_scheduler_benchmark [--duration SECONDS] [--command-interval SECONDS]
+        [--replay-path PATH]
+"""
+import argparse
+import os
+import queue
+import tempfile
+import threading
+import time
+import numpy as np
+from PIL import Image
+
+from src import board_recognition
+from src.board_recognition import BoardRecognizer
+from src.frame_source import ReplayFrameSource
+from src.recognition_scheduler import RecognitionScheduler, _thread_time
+from benchmarks.benchmark_utils import format_latencies
+
+DEFAULT_DURATION = 10.0
+DEFAULT_COMMAND_INTERVAL = 3.0
+DEFAULT_REPLAY_PATH = 'res/chessboard-sample.png'
+FIXED_PAUSE_TIME = 0.2 # the pause of the fixed polling loop that the scheduler replaces
+BLANK_SCREEN_COLOR = (40, 40, 40)
+
+
+def run_fixed_polling(board_recognizer, duration):
+    """
+    Recognize the board every FIXED_PAUSE_TIME seconds, and measure the duty cycle and the CPU time.
+    """
+    board_queue = queue.Queue(maxsize=5)
+    stop_event = threading.Event()
+    metrics = {'busy_time': 0.0, 'cpu_time': 0.0, 'num_recognitions': 0}
+
+    def poll():
+        start_cpu_time = _thread_time()
+        while not stop_event.is_set():
+            start_time = time.perf_counter()
+            board_recognizer.recognize_board(board_queue)
+            metrics['busy_time'] += time.perf_counter() - start_time
+            metrics['num_recognitions'] += 1
+            time.sleep(FIXED_PAUSE_TIME)
+        metrics['cpu_time'] = _thread_time() - start_cpu_time
+
+    thread = threading.Thread(target=poll)
+    thread.start()
+    time.sleep(duration)
+    stop_event.set()
+    thread.join()
+    return metrics
+
+
+def run_scheduler(board_recognizer, duration, command_interval):
+    """
+    Run the RecognitionScheduler while simulating a command every 'command_interval' seconds.
+    """
+    scheduler = RecognitionScheduler(board_recognizer, queue.Queue(maxsize=5))
+    scheduler.start()
+    start_time = time.perf_counter()
+    command_latencies = []
+    while time.perf_counter() - start_time + command_interval < duration:
+        time.sleep(command_interval)
+        command_start = time.perf_counter()
+        scheduler.wait_for_recognition(scheduler.request_recognition())
+        command_latencies.append(time.perf_counter() - command_start)
+    time.sleep(max(0.0, duration - (time.perf_counter() - start_time)))
+    metrics = scheduler.get_metrics()
+    scheduler.stop(wait_for_stop=True)
+    return metrics, command_latencies
+
+
+def benchmark_scenario(name, frames, duration, command_interval):
+    print(f"{name} ({duration:.0f} s, a command every {command_interval:.0f} s)")
+
+    board_recognizer = BoardRecognizer(frame_source=ReplayFrameSource(frames))
+    metrics = run_fixed_polling(board_recognizer, duration)
+    print(f"  fixed {FIXED_PAUSE_TIME} s polling | duty cycle {100 * metrics['busy_time'] / duration:5.1f}% | "
+          f"CPU time {metrics['cpu_time']:5.2f} s | {metrics['num_recognitions']} recognitions")
+
+    board_recognizer = BoardRecognizer(frame_source=ReplayFrameSource(frames))
+    metrics, command_latencies = run_scheduler(board_recognizer, duration, command_interval)
+    print(f"  scheduler          | duty cycle {100 * metrics['duty_cycle']:5.1f}% | "
+          f"CPU time {metrics['cpu_time']:5.2f} s | {metrics['num_polls']} polls, "
+          f"{metrics['num_on_demand']} on demand | final poll interval {metrics['poll_interval']:.2f} s")
+    if len(command_latencies) > 0:
+        print(f"  command latency    | {format_latencies(command_latencies)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the board recognition scheduler")
+    parser.add_argument('--duration', type=float, default=DEFAULT_DURATION, help="the duration of each scenario")
+    parser.add_argument('--command-interval', type=float, default=DEFAULT_COMMAND_INTERVAL,
+                        help="the time between two simulated commands")
+    parser.add_argument('--replay-path', default=DEFAULT_REPLAY_PATH, help="the frames with a board to replay")
+    args = parser.parse_args()
+
+    board_frames = ReplayFrameSource.from_path(args.replay_path).frames
+    blank_frame = Image.fromarray(np.full((board_frames[0].size[1], board_frames[0].size[0], 3),
+                                          BLANK_SCREEN_COLOR, dtype=np.uint8))
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # Don't overwrite the board's last known location
+        board_recognition.BOARD_LOCATION_FILE = os.path.join(temp_dir, 'board_location.yaml')
+        benchmark_scenario("Board on screen", board_frames, args.duration, args.command_interval)
+        benchmark_scenario("No board on screen", [blank_frame], args.duration, args.command_interval)
+
+
+if __name__ == '__main__':
+    main()
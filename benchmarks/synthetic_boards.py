@@ -0,0 +1,313 @@
+"""
+This file renders synthetic screenshots of a chessboard, with their ground truth, for benchmarking the board
+recognition. Every screenshot shows a random legal position, with a random board size and location, on a screen with a
+random resolution and a random amount of clutter (rectangles and text) around the board. Its ground truth is the
+position (as a FEN string), which side is at the bottom of the board, and the screen coordinates of the gridlines.
+
+The board is drawn with the reference images of the chess pieces (from the template atlas), which are already in the
+grayscale that the BoardRecognizer compares squares in, so every pixel of the board is gray (R = G = B).
+
+Usage (from the repository's root directory), to save a dataset of screenshots and their ground truth:
+    python -m benchmarks.synthetic_boards --output DIR [--images N] [--seed SEED]
+"""
+import argparse
+import os
+import cv2
+import numpy as np
+import yaml
+from PIL import Image
+
+from src import template_atlas
+
+SCREEN_RESOLUTIONS = [(1280, 720), (1366, 768), (1600, 900), (1920, 1080), (2560, 1440)]
+MIN_BOARD_SIZE = 240 # the smallest width and height (in pixels) of the board
+MAX_BOARD_SIZE_RATIO = 0.95 # the largest width and height of the board, as a fraction of the screen's height
+MAX_CLUTTER = 20 # the largest number of rectangles and text boxes drawn around the board
+PIECE_NAMES = {'p': 'pawn', 'r': 'rook', 'n': 'knight', 'b': 'bishop', 'q': 'queen', 'k': 'king'}
+# The number of each piece (besides the king) that each side has at the start of a game
+INITIAL_PIECE_COUNTS = {'p': 8, 'r': 2, 'n': 2, 'b': 2, 'q': 1}
+EMPTY = '.'
+KNIGHT_OFFSETS = [(1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2)]
+KING_OFFSETS = [(1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1)]
+ORTHOGONAL_DIRECTIONS = [(1, 0), (0, 1), (-1, 0), (0, -1)]
+DIAGONAL_DIRECTIONS = [(1, 1), (-1, 1), (-1, -1), (1, -1)]
+
+
+class SyntheticBoard:
+    """
+    A synthetic screenshot of a chessboard and its ground truth:
+        (a) img: the screenshot, as an RGB PIL Image
+        (b) fen: the position, as a FEN string (white to move)
+        (c) white_at_bottom: True if the board is seen from white's side
+        (d) col_coords, row_coords: the screen coordinates of the board's 9 vertical and 9 horizontal gridlines
+    """
+    def __init__(self, img, fen, white_at_bottom, col_coords, row_coords):
+        self.img = img
+        self.fen = fen
+        self.white_at_bottom = white_at_bottom
+        self.col_coords = col_coords
+        self.row_coords = row_coords
+
+    def get_screen_squares(self):
+        """
+        This function returns the piece on every square, as seen on the screen (i.e. row 0 is the top of the board).
+
+        Output:
+            - return: an 8x8 NumPy array of (name, color) tuples, like the name and color of the ChessPiece objects
+                that the BoardRecognizer identifies
+        """
+        position = fen_to_position(self.fen)
+        if not self.white_at_bottom:
+            position = position[::-1, ::-1]
+        squares = np.empty((8, 8), dtype=object)
+        for row in range(0, 8):
+            for col in range(0, 8):
+                squares[row, col] = _get_piece_name_and_color(position[row, col])
+        return squares
+
+    def get_ground_truth(self):
+        """
+        This function returns the ground truth as a dictionary (ex: to save it as YAML).
+        """
+        return {'fen': self.fen, 'white_at_bottom': self.white_at_bottom,
+                'col_coords': self.col_coords, 'row_coords': self.row_coords}
+
+
+class SyntheticBoardRenderer:
+    """
+    The SyntheticBoardRenderer renders random SyntheticBoards. Given the same seed, it renders the same boards.
+    """
+
+    ''' CONSTRUCTOR '''
+    def __init__(self, seed=None):
+        self.rng = np.random.default_rng(seed)
+        self.piece_imgs = {}
+        for piece in list(PIECE_NAMES) + [piece.upper() for piece in PIECE_NAMES] + [EMPTY]:
+            name, color = _get_piece_name_and_color(piece)
+            self.piece_imgs[piece] = template_atlas.get_reference_imgs(name, color)
+
+    ''' PUBLIC FUNCTIONS '''
+    def render(self, resolution=None, board_size=None, num_clutter=None):
+        """
+        This function renders a screenshot of a random legal position. Any setting that isn't given is random.
+
+        Parameters:
+            - resolution: the screen's resolution, as a (width, height) tuple
+            - board_size: the width and height of the board, in pixels
+            - num_clutter: the number of rectangles and text boxes drawn around the board
+        Output:
+            - return: a SyntheticBoard
+        """
+        if resolution is None:
+            resolution = SCREEN_RESOLUTIONS[self.rng.integers(len(SCREEN_RESOLUTIONS))]
+        screen_width, screen_height = resolution
+        if board_size is None:
+            board_size = self.rng.integers(MIN_BOARD_SIZE, round(MAX_BOARD_SIZE_RATIO * screen_height) + 1)
+        if num_clutter is None:
+            num_clutter = self.rng.integers(MAX_CLUTTER + 1)
+        board_size = int(min(board_size, screen_width, screen_height))
+
+        # Draw the background and the clutter, then the board on top of them
+        screen = np.empty((screen_height, screen_width, 3), dtype=np.uint8)
+        screen[:, :] = self._random_color()
+        for _ in range(num_clutter):
+            self._draw_clutter(screen)
+        position = self.random_position()
+        white_at_bottom = bool(self.rng.integers(2))
+        board, gridlines = self._render_board(position if white_at_bottom else position[::-1, ::-1], board_size)
+        left = int(self.rng.integers(screen_width - board_size + 1))
+        top = int(self.rng.integers(screen_height - board_size + 1))
+        screen[top:top + board_size, left:left + board_size] = board[:, :, np.newaxis]
+
+        return SyntheticBoard(Image.fromarray(screen), position_to_fen(position), white_at_bottom,
+                              [left + int(x) for x in gridlines], [top + int(y) for y in gridlines])
+
+    def random_position(self):
+        """
+        This function generates a random legal position, with white to move. Each side has one king, the kings aren't
+        next to each other, pawns aren't on the first or last rank, each side has no more pieces than it could have
+        after promoting its missing pawns, and black isn't in check.
+
+        Output:
+            - return: an 8x8 NumPy array of FEN piece letters (EMPTY for an empty square), where row 0 is the 8th rank
+                and column 0 is the a-file
+        """
+        while True:
+            position = np.full((8, 8), EMPTY)
+            position[self._random_empty_square(position)] = 'K'
+            black_king = self._random_empty_square(position)
+            if _is_attacked_by(position, black_king, offsets=KING_OFFSETS, attackers='K'):
+                continue
+            position[black_king] = 'k'
+
+            for is_white in (True, False):
+                for piece in self._random_pieces():
+                    piece = piece.upper() if is_white else piece
+                    position[self._random_empty_square(position, is_pawn=piece.lower() == 'p')] = piece
+
+            if not _is_in_check(position, black_king, by_white=True):
+                return position
+
+    ''' PRIVATE FUNCTIONS '''
+    def _random_pieces(self):
+        """
+        This function picks a random set of pieces (besides the king) for one side.
+        """
+        num_pawns = self.rng.integers(INITIAL_PIECE_COUNTS['p'] + 1)
+        pieces = ['p'] * num_pawns
+        for piece in ('r', 'n', 'b', 'q'):
+            pieces += [piece] * self.rng.integers(INITIAL_PIECE_COUNTS[piece] + 1)
+
+        # Some of the missing pawns may have been promoted
+        num_promotions = self.rng.integers(min(2, INITIAL_PIECE_COUNTS['p'] - num_pawns) + 1)
+        pieces += list(self.rng.choice(['q', 'r', 'b', 'n'], size=num_promotions))
+        return pieces
+
+    def _random_empty_square(self, position, is_pawn=False):
+        empty_squares = np.argwhere(position == EMPTY)
+        if is_pawn:
+            empty_squares = empty_squares[(empty_squares[:, 0] > 0) & (empty_squares[:, 0] < 7)]
+        row, col = empty_squares[self.rng.integers(len(empty_squares))]
+        return row, col
+
+    def _render_board(self, squares, board_size):
+        """
+        This function draws the board, as seen on the screen.
+
+        Parameters:
+            - squares: an 8x8 NumPy array of FEN piece letters, where row 0 is the top of the board
+            - board_size: the width and height of the board, in pixels
+        Output:
+            - return: a tuple of
+                (a) the board, as a two dimensional grayscale NumPy array
+                (b) a NumPy array of the 9 gridlines' coordinates within the board (the same for rows and columns)
+        """
+        gridlines = np.round(np.linspace(0, board_size, 9)).astype(int)
+        board = np.empty((board_size, board_size), dtype=np.uint8)
+        for row in range(0, 8):
+            for col in range(0, 8):
+                tile_color = 1 if (col + row) % 2 == 0 else 0
+                square_size = (int(gridlines[col + 1] - gridlines[col]), int(gridlines[row + 1] - gridlines[row]))
+                board[gridlines[row]:gridlines[row + 1], gridlines[col]:gridlines[col + 1]] = cv2.resize(
+                    self.piece_imgs[squares[row, col]][tile_color], square_size, interpolation=cv2.INTER_LINEAR)
+        return board, gridlines
+
+    def _draw_clutter(self, screen):
+        """
+        This function draws either a filled rectangle or a line of text at a random location of the screen.
+        """
+        screen_height, screen_width = screen.shape[:2]
+        x, y = int(self.rng.integers(screen_width)), int(self.rng.integers(screen_height))
+        if self.rng.random() < 0.5:
+            width, height = self.rng.integers(10, screen_width // 3), self.rng.integers(10, screen_height // 3)
+            cv2.rectangle(screen, (x, y), (int(x + width), int(y + height)), self._random_color(), thickness=-1)
+        else:
+            text = ''.join(self.rng.choice(list('abcdefghijklmnopqrstuvwxyz0123456789 '), size=self.rng.integers(5, 30)))
+            cv2.putText(screen, text, (x, y), cv2.FONT_HERSHEY_SIMPLEX, float(self.rng.uniform(0.4, 1.5)),
+                        self._random_color(), thickness=int(self.rng.integers(1, 3)))
+
+    def _random_color(self):
+        return tuple(int(channel) for channel in self.rng.integers(256, size=3))
+
+
+def save_dataset(boards, directory):
+    """
+    This function saves synthetic screenshots (as PNG files) and their ground truth (as ground_truth.yaml) in a
+    directory.
+    """
+    os.makedirs(directory, exist_ok=True)
+    ground_truth = {}
+    for ndx, board in enumerate(boards):
+        fname = f"board-{ndx:05d}.png"
+        board.img.save(os.path.join(directory, fname))
+        ground_truth[fname] = board.get_ground_truth()
+    with open(os.path.join(directory, 'ground_truth.yaml'), 'w') as ground_truth_file:
+        yaml.safe_dump(ground_truth, ground_truth_file)
+
+
+def position_to_fen(position):
+    """
+    This function converts a position (see SyntheticBoardRenderer.random_position()) to a FEN string, with white to
+    move and no castling or en passant rights.
+    """
+    ranks = []
+    for rank in position:
+        fen_rank = ''
+        num_empty = 0
+        for piece in rank:
+            if piece == EMPTY:
+                num_empty += 1
+            else:
+                fen_rank += (str(num_empty) if num_empty > 0 else '') + piece
+                num_empty = 0
+        ranks.append(fen_rank + (str(num_empty) if num_empty > 0 else ''))
+    return '/'.join(ranks) + ' w - - 0 1'
+
+
+def fen_to_position(fen):
+    """
+    This function converts the piece placement of a FEN string to a position (see position_to_fen()).
+    """
+    position = np.full((8, 8), EMPTY)
+    for row, fen_rank in enumerate(fen.split()[0].split('/')):
+        col = 0
+        for char in fen_rank:
+            if char.isdigit():
+                col += int(char)
+            else:
+                position[row, col] = char
+                col += 1
+    return position
+
+
+''' HELPER FUNCTIONS '''
+def _get_piece_name_and_color(piece):
+    if piece == EMPTY:
+        return 'empty', 'empty'
+    return PIECE_NAMES[piece.lower()], 'white' if piece.isupper() else 'black'
+
+
+def _is_in_check(position, king_square, by_white):
+    """
+    Return True if the king on the given square is attacked by the other side's pieces.
+    """
+    def side(piece):
+        return piece.upper() if by_white else piece.lower()
+    # White pawns attack towards the 8th rank (i.e. towards row 0), so they attack a king from the row below it
+    pawn_row_offset = 1 if by_white else -1
+    return (_is_attacked_by(position, king_square, [(pawn_row_offset, -1), (pawn_row_offset, 1)], side('p'))
+            or _is_attacked_by(position, king_square, KNIGHT_OFFSETS, side('n'))
+            or _is_attacked_by(position, king_square, KING_OFFSETS, side('k'))
+            or _is_attacked_by(position, king_square, ORTHOGONAL_DIRECTIONS, side('r') + side('q'), sliding=True)
+            or _is_attacked_by(position, king_square, DIAGONAL_DIRECTIONS, side('b') + side('q'), sliding=True))
+
+
+def _is_attacked_by(position, square, offsets, attackers, sliding=False):
+    """
+    Return True if any of the attackers (a string of FEN piece letters) is found at one of the offsets (as
+    (row, col) tuples) from the square. If sliding, the attackers can be any number of empty squares away.
+    """
+    for row_offset, col_offset in offsets:
+        row, col = square[0] + row_offset, square[1] + col_offset
+        while 0 <= row < 8 and 0 <= col < 8:
+            if position[row, col] in attackers:
+                return True
+            if not sliding or position[row, col] != EMPTY:
+                break
+            row, col = row + row_offset, col + col_offset
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render synthetic chessboard screenshots and their ground truth")
+    parser.add_argument('--output', required=True, help="the directory in which to save the dataset")
+    parser.add_argument('--images', type=int, default=100, help="the number of screenshots to render")
+    parser.add_argument('--seed', type=int, default=0, help="the seed of the random number generator")
+    args = parser.parse_args()
+
+    renderer = SyntheticBoardRenderer(args.seed)
+    save_dataset((renderer.render() for _ in range(args.images)), args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,261 @@
+"""
+This script measures the throughput and the robustness of the text-to-command process (TextToCmdBuffer.add_text() and
+get_command(), and the MoveCommand objects they create), on a generated corpus of transcripts in several categories:
+    (a) valid: commands of every command format, with the squares written as "f3" or "f 3"
+    (b) misinterpreted: valid commands in which words are replaced with their common misinterpretations (see
+        misinterpretations.txt)
+    (c) noisy: valid commands in random case, with filler words before them and punctuation after them
+    (d) cancelled: the beginning of a command, "cancel", then a valid command
+    (e) multiple: several valid commands in one transcript (only the last one is kept, see add_text())
+    (f) overheard: ordinary speech that sounds like a command, but isn't one (ex: "does that exist" isn't "exit")
+    (g) adversarial: random sequences of keywords, misinterpretations, and junk (including empty and non-ASCII text)
+    (h) long: very long transcripts of keywords and junk
+For every category, the script reports the number of transcripts and commands per second, and the memory allocated
+while handling a transcript (the peak, as traced by tracemalloc).
+
+Every transcript is also fuzzed: it's added to an empty buffer, and commands are extracted until there are none left.
+These properties are checked:
+    (a) nothing raises an exception (a crash)
+    (b) the buffer never contains an empty word, and every extracted command is a Command or a valid MoveCommand (a
+        piece name, and squares between a1 and h8)
+    (c) for the categories with expected commands (all but adversarial and long), the extracted commands are exactly
+        the expected ones (otherwise, it's a wrong extraction)
+Crashes and wrong extractions are reported with their transcripts, and the script exits with an error.
+
+Usage (from the repository's root directory):
+    python -m benchmarks.text_to_command_benchmark [--transcripts N] [--seed SEED]
+"""
+import argparse
+import logging
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+from src.command import Command, MoveCommand
+from src.text_to_command import TextToCmdBuffer
+
+DEFAULT_NUM_TRANSCRIPTS = 2000 # the number of transcripts of each category
+NUM_LONG_TRANSCRIPTS = 20
+LONG_TRANSCRIPT_LENGTH = 10000 # the number of words of a long transcript
+MAX_COMMANDS = 1000 # the most commands extracted from a transcript (more means that extraction never ends)
+MISINTERPRETATION_PROBABILITY = 0.5 # the probability that a word is replaced with one of its misinterpretations
+FILLER_WORDS = ['um', 'uh', 'okay', 'so', 'please', 'now', 'hmm', 'alright']
+PUNCTUATION = ['.', ',', '!', '?', '']
+JUNK_WORDS = ['', ' ', 'xyzzy', '42', '999', '-', "'", 'é', '♞', '\t', 'to to', 'a1b2c3', '0', '9', 'the', 'and']
+# Ordinary speech that was once taken for a command, because a word sounds or looks like a keyword
+OVERHEARD_TRANSCRIPTS = ['does that exist', 'exist', 'go back', 'write', 'paws', 'pose', 'council', 'cancer',
+                         'took e5', 'ring e5', 'sing e4', 'wing d5', 'what now', 'with that']
+MAX_REPORTED_ERRORS = 10
+
+
+class CorpusGenerator:
+    """
+    The CorpusGenerator generates the transcripts of every category, with the commands that should be extracted from
+    them (None if any command is acceptable).
+    """
+
+    ''' CONSTRUCTOR '''
+    def __init__(self, buffer, rng):
+        self.rng = rng
+        self.keywords = buffer.keywords_dictionary
+        self.command_formats = buffer.command_formats
+        self.vocabulary = sorted({str(word) for words in self.keywords.values() for word in words})
+        # The misinterpretations of each word, limited to those that stand for a single word
+        self.misinterpretations = {}
+        for misinterpretation in buffer.misinterpretations:
+            if ' ' not in misinterpretation.expected:
+                self.misinterpretations.setdefault(misinterpretation.expected, []).append(misinterpretation.actual)
+
+    ''' PUBLIC FUNCTIONS '''
+    def generate(self, category):
+        """
+        This function generates a transcript of a category.
+
+        Output:
+            - return: a tuple of the transcript, and the list of the texts of the expected commands (or None)
+        """
+        if category == 'valid':
+            words, expected = self._random_command()
+            return self._join(words), [expected]
+        if category == 'misinterpreted':
+            words, expected = self._random_command()
+            return ' '.join(self._misinterpret(word) for word in words), [expected]
+        if category == 'noisy':
+            words, expected = self._random_command()
+            fillers = self._choice(FILLER_WORDS, self.rng.integers(0, 3))
+            text = ' '.join(fillers + [self._join(words)]) + str(self.rng.choice(PUNCTUATION))
+            return ''.join(char.upper() if self.rng.random() < 0.3 else char for char in text), [expected]
+        if category == 'cancelled':
+            words, _ = self._random_command()
+            next_words, expected = self._random_command()
+            partial_words = words[:self.rng.integers(1, len(words) + 1)]
+            return ' '.join(partial_words + ['cancel'] + next_words), [expected]
+        if category == 'multiple':
+            commands = [self._random_command() for _ in range(self.rng.integers(2, 4))]
+            return ' '.join(self._join(words) for words, _ in commands), [commands[-1][1]]
+        if category == 'overheard':
+            return self._choice(OVERHEARD_TRANSCRIPTS, 1)[0], []
+        if category == 'adversarial':
+            return ' '.join(self._random_word() for _ in range(self.rng.integers(0, 12))), None
+        if category == 'long':
+            return ' '.join(self._random_word() for _ in range(LONG_TRANSCRIPT_LENGTH)), None
+        raise ValueError(f"Unknown category: {category}")
+
+    ''' PRIVATE FUNCTIONS '''
+    def _choice(self, words, size):
+        return [str(words[ndx]) for ndx in self.rng.integers(len(words), size=size)]
+
+    def _random_command(self):
+        """
+        This function generates the words of a random command, and the text of the command.
+        """
+        command_format = self.command_formats[self.rng.integers(len(self.command_formats))]
+        words = [self._choice(self.keywords[word_type], 1)[0] for word_type in command_format.components]
+        if command_format.name.find('move') != -1:
+            # "2" stands for "to" where a command format expects "to"
+            expected = MoveCommand([word if word_type != 'to' else 'to'
+                                    for word, word_type in zip(words, command_format.components)]).text()
+        elif command_format.name.find('single') != -1:
+            expected = Command(words.copy()).text()
+        else:
+            return self._random_command() # formats that aren't commands (like "change color") aren't generated
+        return words, expected
+
+    def _join(self, words):
+        """
+        This function joins the words of a command, with each square written as "f3" or "f 3".
+        """
+        text = words[0]
+        for previous_word, word in zip(words, words[1:]):
+            is_square = word.isdigit() and previous_word in self.keywords['letter_words']
+            text += word if is_square and self.rng.random() < 0.5 else ' ' + word
+        return text
+
+    def _misinterpret(self, word):
+        if word in self.misinterpretations and self.rng.random() < MISINTERPRETATION_PROBABILITY:
+            return self._choice(self.misinterpretations[word], 1)[0]
+        return word
+
+    def _random_word(self):
+        source = self.rng.integers(3)
+        if source == 0:
+            return self._choice(self.vocabulary, 1)[0]
+        if source == 1:
+            return self._misinterpret(self._choice(self.vocabulary, 1)[0])
+        return self._choice(JUNK_WORDS, 1)[0]
+
+
+def handle_transcript(buffer, text):
+    """
+    This function adds a transcript to an empty buffer, and extracts commands until there are none left.
+
+    Output:
+        - return: the list of the extracted commands
+    """
+    buffer.clear()
+    buffer.add_text(text)
+    commands = []
+    command = buffer.get_command()
+    while command is not None and len(commands) < MAX_COMMANDS:
+        commands.append(command)
+        command = buffer.get_command()
+    return commands
+
+
+def check_properties(buffer, commands):
+    """
+    This function checks the buffer and the extracted commands (see the top of the file).
+
+    Output:
+        - return: a description of the first broken property, or None
+    """
+    if '' in buffer.words:
+        return f"empty word in the buffer {buffer.words}"
+    if len(commands) >= MAX_COMMANDS:
+        return "the command extraction never ends"
+    for command in commands:
+        if isinstance(command, MoveCommand):
+            squares = [(command.dest_col, command.dest_row)]
+            if command.get_src() is not None:
+                squares.append((command.src_col, command.src_row))
+            if command.piece_name not in buffer.start_move_words or any(
+                    col not in 'abcdefgh' or row not in '12345678' or len(col + row) != 2 for col, row in squares):
+                return f"invalid move {command.data}"
+        elif not isinstance(command, Command):
+            return f"unexpected command type {type(command).__name__}"
+    return None
+
+
+def benchmark_category(buffer, generator, category, num_transcripts):
+    transcripts = [generator.generate(category) for _ in range(num_transcripts)]
+    crashes = []
+    wrong_extractions = []
+    num_commands = 0
+    total_time = 0
+    for text, expected in transcripts:
+        start_time = time.perf_counter()
+        try:
+            commands = handle_transcript(buffer, text)
+        except Exception as e:
+            crashes.append((text, f"{type(e).__name__}: {e}"))
+            continue
+        total_time += time.perf_counter() - start_time
+        num_commands += len(commands)
+        broken_property = check_properties(buffer, commands)
+        if broken_property is not None:
+            wrong_extractions.append((text, broken_property))
+        elif expected is not None and [command.text() for command in commands] != expected:
+            wrong_extractions.append((text, f"expected {expected}, got {[command.text() for command in commands]}"))
+
+    # Measure the memory separately, since tracing it slows everything down
+    peaks = []
+    tracemalloc.start()
+    for text, _ in transcripts[:min(len(transcripts), 200)]:
+        tracemalloc.clear_traces() # which also resets the peak
+        try:
+            handle_transcript(buffer, text)
+        except Exception:
+            pass
+        peaks.append(tracemalloc.get_traced_memory()[1])
+    tracemalloc.stop()
+
+    print(f"  {category:15} {len(transcripts) / total_time:9.0f} transcripts/s | {num_commands / total_time:9.0f} "
+          f"commands/s | peak memory mean {np.mean(peaks) / 1024:8.1f} KiB, max {np.max(peaks) / 1024:8.1f} KiB | "
+          f"{len(crashes)} crashes, {len(wrong_extractions)} wrong extractions")
+    return crashes, wrong_extractions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark and fuzz the text-to-command process")
+    parser.add_argument('--transcripts', type=int, default=DEFAULT_NUM_TRANSCRIPTS,
+                        help="the number of transcripts of each category")
+    parser.add_argument('--seed', type=int, default=0, help="the seed of the random number generator")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    buffer = TextToCmdBuffer()
+    generator = CorpusGenerator(buffer, np.random.default_rng(args.seed))
+    categories = {'valid': args.transcripts, 'misinterpreted': args.transcripts, 'noisy': args.transcripts,
+                  'cancelled': args.transcripts, 'multiple': args.transcripts, 'overheard': args.transcripts,
+                  'adversarial': args.transcripts,
+                  'long': NUM_LONG_TRANSCRIPTS}
+    print("Text to command (transcripts and commands handled per second, memory allocated per transcript)")
+    all_crashes = []
+    all_wrong_extractions = []
+    for category, num_transcripts in categories.items():
+        crashes, wrong_extractions = benchmark_category(buffer, generator, category, num_transcripts)
+        all_crashes.extend((category, text, error) for text, error in crashes)
+        all_wrong_extractions.extend((category, text, error) for text, error in wrong_extractions)
+
+    for title, errors in (("crashes", all_crashes), ("wrong extractions", all_wrong_extractions)):
+        if errors:
+            print(f"{len(errors)} {title}, including:")
+            for category, text, error in errors[:MAX_REPORTED_ERRORS]:
+                print(f"  {category}: {text[:100]!r}: {error}")
+    if all_crashes or all_wrong_extractions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+This script compares the transcribers (i.e. speech recognition backends, see src/transcriber.py) on recorded commands.
+Every WAV file of a directory is transcribed by every transcriber, and each alternative transcript is turned into a
+command by a TextToCmdBuffer. The script reports, for each transcriber:
+    (a) the accuracy: the fraction of the recordings whose most likely transcript is the expected command, and the
+        fraction for which any alternative is the expected command
+    (b) the fraction of the recordings that weren't recognized at all
+    (c) the end-to-end latency, from the recorded audio to the command: throughput, mean, p50, and p99
+    (d) the time to create the transcriber (ex: to load the offline models)
+Transcribers that aren't available on this machine (ex: pocketsphinx not installed) are skipped. The google
+transcriber needs an internet connection. The replay transcriber, a stand-in that knows the transcript of every
+recording, shows the best case.
+
+The expected command of a recording is its file name, with underscores instead of spaces. Anything after a dash is
+ignored, so that a command can be recorded several times (ex: "knight_to_f3-2.wav" is the command "knight to f3").
+
+Usage (from the repository's root directory):
+    python -m benchmarks.transcriber_benchmark --wav-dir DIR [--transcribers NAME ...] [--repeat N]
+"""
+import argparse
+import os
+import time
+import speech_recognition as sr
+
+from src.text_to_command import TextToCmdBuffer
+from src.transcriber import TRANSCRIBER_NAMES, create_transcriber
+from benchmarks.benchmark_utils import format_latencies
+
+MAX_REPORTED_ERRORS = 10
+
+
+def load_recordings(wav_dir):
+    """
+    This function loads every WAV file of a directory.
+
+    Output:
+        - return: a list of (file name, expected text, AudioData) tuples, sorted by file name
+    """
+    recordings = []
+    recognizer = sr.Recognizer()
+    for fname in sorted(os.listdir(wav_dir)):
+        if not fname.lower().endswith('.wav'):
+            continue
+        expected_text = os.path.splitext(fname)[0].split('-')[0].replace('_', ' ')
+        with sr.AudioFile(os.path.join(wav_dir, fname)) as source:
+            recordings.append((fname, expected_text, recognizer.record(source)))
+    return recordings
+
+
+def to_command_text(raw_text):
+    """
+    This function turns a transcript into the text of its command (None if the transcript isn't a command), with a new
+    TextToCmdBuffer, so that the recordings don't depend on each other.
+    """
+    command = TextToCmdBuffer().parse_alternatives([raw_text])[0].command if raw_text.strip() != '' else None
+    return command.text() if command is not None else None
+
+
+def benchmark_transcriber(name, recordings, num_repeats, wav_dir):
+    start_time = time.perf_counter()
+    try:
+        transcriber = create_transcriber(name, wav_dir)
+    except Exception as e:
+        print(f"  {name:8} unavailable: {type(e).__name__}: {e}")
+        return
+    creation_time = time.perf_counter() - start_time
+
+    num_correct = num_correct_alternatives = num_not_recognized = 0
+    latencies = []
+    errors = []
+    for fname, expected_text, audio in recordings:
+        expected_command = to_command_text(expected_text)
+        for _ in range(num_repeats):
+            start_time = time.perf_counter()
+            try:
+                alternatives = transcriber.transcribe(audio)
+                commands = [parsed_text.command for parsed_text in TextToCmdBuffer().parse_alternatives(alternatives)]
+            except sr.UnknownValueError:
+                alternatives, commands = [], []
+            except sr.RequestError as e:
+                print(f"  {name:8} request failed: {e}")
+                return
+            latencies.append(time.perf_counter() - start_time)
+
+            command_texts = [command.text() if command is not None else None for command in commands]
+            if len(alternatives) == 0:
+                num_not_recognized += 1
+            if len(command_texts) > 0 and command_texts[0] == expected_command:
+                num_correct += 1
+            else:
+                errors.append((fname, alternatives))
+            if expected_command in command_texts:
+                num_correct_alternatives += 1
+
+    num_transcriptions = len(recordings) * num_repeats
+    print(f"  {name:8} created in {1000 * creation_time:.1f} ms")
+    print(f"  {name:8} correct: {100 * num_correct / num_transcriptions:5.1f}% | "
+          f"correct in any alternative: {100 * num_correct_alternatives / num_transcriptions:5.1f}% | "
+          f"not recognized: {100 * num_not_recognized / num_transcriptions:5.1f}%")
+    print(f"  {name:8} {format_latencies(latencies)}")
+    for fname, alternatives in errors[:MAX_REPORTED_ERRORS]:
+        print(f"  {name:8} {fname}: heard {alternatives}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the transcribers on recorded commands")
+    parser.add_argument('--wav-dir', required=True, help="the directory of the recorded commands (WAV files)")
+    parser.add_argument('--transcribers', nargs='+', default=TRANSCRIBER_NAMES, choices=TRANSCRIBER_NAMES,
+                        help="the transcribers to compare")
+    parser.add_argument('--repeat', type=int, default=1, help="the number of times to transcribe each recording")
+    args = parser.parse_args()
+
+    recordings = load_recordings(args.wav_dir)
+    if len(recordings) == 0:
+        parser.error(f"No WAV files in {args.wav_dir}")
+    num_commands = sum(to_command_text(expected_text) is not None for _, expected_text, _ in recordings)
+    print(f"Transcribers ({len(recordings)} recordings, {num_commands} of which are named after a command, "
+          f"{args.repeat} transcriptions each)")
+    for name in args.transcribers:
+        benchmark_transcriber(name, recordings, args.repeat, args.wav_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+"""
+This script measures the end-to-end throughput and latency of the voice pipeline, on a machine without sound hardware
+or network: recorded utterances are replayed by a ReplayAudioSource, and go through the same path as the microphone's
+audio (SpeechRecognizer.listen_in_background(), the TranscriptionPool, the raw text queue, and the ControllerThread),
+with the ReplayTranscriber as a stand-in for the speech recognition backend. The board is recognized on a recorded
+screenshot, and the moves are counted instead of being played with the mouse.
+
+The script reports:
+    (a) the throughput: the number of utterances handled per second (replay them faster than real time to find the
+        pipeline's capacity)
+    (b) the end-to-end latency: the time between the end of an utterance (when the user stops speaking) and the end of
+        the handling of its command by the ControllerThread. It includes the pause that ends the utterance
+    (c) what the ControllerThread did: the messages it sent, and the moves it played
+    (d) the transcription pool's metrics: how long the utterances waited for a worker, and the queue's depth
+
+The utterances are the WAV files of a directory, named after their transcript (see audio_source.load_recordings()).
+Without a directory, synthetic utterances (bursts of noise, which only the stand-in transcriber can recognize) are
+generated for a few commands.
+
+Usage (from the repository's root directory):
+    python -m benchmarks.voice_pipeline_benchmark [--wav-dir DIR] [--speed SPEED] [--transcriber-latency SECONDS]
+        [--workers N] [--replay-path PATH] [--color COLOR]
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+import wave
+import numpy as np
+from PyQt5.QtCore import Qt
+
+from src import app_config
+from src.audio_source import ReplayAudioSource
+from src.game_controller import ControllerThread
+from src.speech_to_text import SpeechRecognizer
+from src.transcriber import ReplayTranscriber
+from benchmarks.benchmark_utils import format_latencies
+
+DEFAULT_REPLAY_PATH = 'res/chessboard-sample.png' # the starting position, from black's side
+SYNTHETIC_COMMANDS = ['pawn e5', 'knight to f6', 'pawn d7 to d5', 'bishop c5', 'queen h4', 'rook a6', 'cancel',
+                      'knight c6']
+SYNTHETIC_SAMPLE_RATE = 16000
+SYNTHETIC_DURATION = 0.8 # the duration (in seconds) of a synthetic utterance
+SYNTHETIC_AMPLITUDE = 3000
+POLL_INTERVAL = 0.05 # the time (in seconds) between two checks for the end of the replay
+# The messages of the ControllerThread that are counted, by the beginning of the message
+COUNTED_MESSAGES = ['Your move', 'Your command', 'Illegal move', 'Ambiguous move', 'No speech detected',
+                    'Warning: Chessboard not detected']
+
+
+class ReplayControllerThread(ControllerThread):
+    """
+    A ControllerThread that listens to a ReplayAudioSource with a ReplayTranscriber, and measures when the command of
+    each utterance is handled.
+    """
+
+    ''' CONSTRUCTOR '''
+    def __init__(self, audio_source, transcriber, num_workers, config):
+        self.audio_source = audio_source
+        self.transcriber = transcriber
+        self.num_workers = num_workers
+        self.latencies = []
+        self.num_not_recognized = 0
+        self.num_handled = 0 # the number of replayed recordings whose transcript was handled (or skipped)
+        self.moves = []
+        ControllerThread.__init__(self, None, config=config, move_piece=self._record_move)
+
+    ''' PRIVATE FUNCTIONS '''
+    def _create_speech_recognizer(self):
+        return SpeechRecognizer(self.raw_text_queue, on_audio=self.b_recog_scheduler.request_recognition,
+                                transcriber=self.transcriber, num_workers=self.num_workers,
+                                audio_source=self.audio_source)
+
+    def _handle_final_transcript(self, alternatives):
+        ControllerThread._handle_final_transcript(self, alternatives)
+        end_time = time.perf_counter()
+        if alternatives[0] == SpeechRecognizer.NOT_RECOGNIZED:
+            self.num_not_recognized += 1
+            return
+        # The transcripts are handled in order, so the transcript is the next recording's with the same transcript
+        transcripts = [transcript for _, transcript, _ in self.audio_source.recordings]
+        for recording_ndx in range(self.num_handled, len(self.audio_source.utterance_end_times)):
+            if transcripts[recording_ndx] == alternatives[0]:
+                self.latencies.append(end_time - self.audio_source.utterance_end_times[recording_ndx])
+                self.num_handled = recording_ndx + 1
+                break
+
+    def _record_move(self, start, end, board_coords):
+        self.moves.append((start, end))
+
+
+def write_synthetic_recordings(wav_dir, rng):
+    """
+    This function writes a WAV file of noise for each of the SYNTHETIC_COMMANDS, named after the command.
+    """
+    for command_ndx, command in enumerate(SYNTHETIC_COMMANDS):
+        samples = rng.normal(0, SYNTHETIC_AMPLITUDE, int(SYNTHETIC_DURATION * SYNTHETIC_SAMPLE_RATE))
+        with wave.open(os.path.join(wav_dir, f"{command.replace(' ', '_')}-{command_ndx}.wav"), 'wb') as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(SYNTHETIC_SAMPLE_RATE)
+            wav_file.writeframes(np.clip(samples, -32768, 32767).astype('<i2').tobytes())
+
+
+def run_pipeline(wav_dir, args):
+    audio_source = ReplayAudioSource.from_path(wav_dir, speed=args.speed)
+    transcriber = ReplayTranscriber(wav_dir, latency=args.transcriber_latency)
+    config = app_config.load_app_config()
+    config['board_recognition'] = dict(config.get('board_recognition') or {}, frame_source='replay',
+                                       replay_path=args.replay_path, monitor=None, search_region=None)
+
+    controller = ReplayControllerThread(audio_source, transcriber, args.workers, config)
+    messages = []
+    # The messages are sent from the ControllerThread, and there is no Qt event loop to queue them to
+    controller.send_msg.connect(messages.append, Qt.DirectConnection)
+    controller._set_piece_color([args.color])
+    messages.clear()
+
+    num_recordings = len(audio_source.recordings)
+    audio_duration = len(audio_source.audio) / (audio_source.SAMPLE_RATE * audio_source.SAMPLE_WIDTH)
+    print(f"Voice pipeline ({num_recordings} utterances, {audio_duration:.1f} s of audio replayed at {args.speed}x, "
+          f"transcriber latency {1000 * args.transcriber_latency:.0f} ms, {args.workers} workers)")
+
+    start_time = time.perf_counter()
+    controller.start()
+    pool = controller.cmd_recog.transcription_pool
+    # Every utterance was heard once the replay is over, then wait for the transcriptions to be delivered
+    while not audio_source.is_finished() or pool.num_delivered < pool.num_submitted:
+        time.sleep(POLL_INTERVAL)
+    controller.stop()
+    controller.wait() # the transcripts left in the queue are handled first
+    elapsed_time = time.perf_counter() - start_time
+
+    print(f"  {len(controller.latencies)} of {num_recordings} utterances handled in {elapsed_time:.1f} s "
+          f"({len(controller.latencies) / elapsed_time:.2f} per second), "
+          f"{controller.num_not_recognized} not recognized, {pool.num_submitted} chunks of audio heard")
+    if len(controller.latencies) > 0:
+        print(f"  end-to-end latency: {format_latencies(controller.latencies)}")
+    message_counts = {prefix: sum(message.startswith(prefix) for message in messages) for prefix in COUNTED_MESSAGES}
+    print(f"  messages: {', '.join(f'{prefix}: {count}' for prefix, count in message_counts.items())}, "
+          f"moves played: {len(controller.moves)}")
+    metrics = pool.get_metrics()
+    if len(metrics['wait_times']) > 0:
+        print(f"  wait for a transcription worker: {format_latencies(metrics['wait_times'])}, "
+              f"max queue depth {max(metrics['queue_depths'], default=0)}, {metrics['num_dropped']} dropped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the voice pipeline on replayed utterances")
+    parser.add_argument('--wav-dir', help="the directory of the recorded utterances (WAV files, replayed in "
+                                          "alphabetical order). Synthetic utterances are generated by default")
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help="how many times faster than real time the utterances are replayed")
+    parser.add_argument('--transcriber-latency', type=float, default=0.0,
+                        help="the time (in seconds) that the stand-in transcriber takes for each utterance")
+    parser.add_argument('--workers', type=int, default=3, help="the number of transcription workers")
+    parser.add_argument('--replay-path', default=DEFAULT_REPLAY_PATH,
+                        help="the screenshot (or directory of screenshots, or video) in which to recognize the board")
+    parser.add_argument('--color', default='black', choices=['white', 'black'], help="the user's piece color")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    if args.wav_dir is not None:
+        run_pipeline(args.wav_dir, args)
+    else:
+        with tempfile.TemporaryDirectory() as wav_dir:
+            write_synthetic_recordings(wav_dir, np.random.default_rng(0))
+            run_pipeline(wav_dir, args)
+
+
+if __name__ == '__main__':
+    main()
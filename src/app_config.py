@@ -0,0 +1,41 @@
+"""
+This file loads the settings of Hands-Free Chess from the app configuration file.
+"""
+import logging
+import yaml
+
+APP_CONF_FILE = 'config/hfc_config.yaml'
+
+
+def load_app_config():
+    """
+    Loads the app's settings from the configuration file.
+
+    Output:
+        - return: a dictionary of settings, grouped by component (ex: config['board_recognition']['search_region']).
+            If the configuration file can't be loaded, return an empty dictionary so that every component uses its
+            default settings.
+    """
+    log = logging.getLogger(__name__)
+    try:
+        with open(APP_CONF_FILE, 'r') as conf_file:
+            app_config = yaml.safe_load(conf_file)
+    except (OSError, yaml.YAMLError):
+        log.error("Unable to load the app configuration. Using default settings.", exc_info=True)
+        app_config = None
+    return app_config if app_config is not None else {}
+
+
+def get_setting(app_config, component, setting, default=None):
+    """
+    Returns one of a component's settings, or a default value if the setting is missing or empty.
+
+    Parameters:
+        - app_config: a dictionary of settings (see load_app_config())
+        - component: the name of the component (ex: 'board_recognition')
+        - setting: the name of the setting (ex: 'search_region')
+        - default: the value to return if the setting isn't set
+    """
+    component_config = app_config.get(component) or {}
+    value = component_config.get(setting)
+    return value if value is not None else default
@@ -0,0 +1,270 @@
+"""
+This file defines the AttackMaps, which keep track of the king's safety on a board: the squares attacked by each side,
+and the pieces that check or pin each side's king (see move_legality.py for the bitboards and the rules of the pieces).
+"""
+import logging
+import numpy as np
+
+from src import chess_piece
+from src import move_legality
+from src.move_legality import RAYS, OTHER_COLOR, ORTHOGONAL_DIRECTIONS, ALL_DIRECTIONS
+
+MAX_MOVE_CHANGES = 4 # the most squares that one move changes (castling). Any bigger change rebuilds the maps
+ALL_SQUARES = (1 << 64) - 1
+# The pieces that can pin (or check) along each direction, by direction
+PINNING_PIECES = [('rook', 'queen') if direction in ORTHOGONAL_DIRECTIONS else ('bishop', 'queen')
+                  for direction in ALL_DIRECTIONS]
+
+
+class AttackMaps:
+    """
+    The AttackMaps class keeps track of the following for each side (by color), as bitboards:
+        (a) attacked: the squares its pieces attack
+        (b) checkers: the opponent's pieces that attack its king
+        (c) pinned: its pieces that can't leave the line between its king and an opponent's rook, bishop, or queen
+    These are used to restrict the moves of the user's pieces to the moves that don't leave the user's king in check.
+
+    The squares attacked by every piece are stored, so that when the board changes by one move, only the moved pieces
+    and the rooks, bishops, and queens whose lines go through the move's squares are updated. The maps are only
+    rebuilt from scratch when the board changes by more than one move (ex: after a misrecognition).
+
+    A side's rooks, bishops, and queens attack "through" the opponent's king, so that the king can't escape a check by
+    stepping back along the checking line.
+    """
+
+    ''' CONSTRUCTOR '''
+    def __init__(self, board_state, user_color):
+        """
+        Parameters:
+            - board_state: a BoardState
+            - user_color: the user's color ('black' or 'white'), which is the color at the bottom of the board
+        """
+        self.log = logging.getLogger(__name__)
+        self.user_color = user_color
+        self.board_state = None
+        self.piece_attacks = {} # the squares attacked by each piece, by color, then by the piece's square
+        self.king_squares = {}
+        self.attacked = {}
+        self.checkers = {}
+        self.pinned = {}
+        self.pin_rays = {} # the squares that each pinned piece can move to, by the pinned piece's square
+        self.check_masks = {} # the squares that a piece (besides the king) must move to, to stop a check, by color
+        self.rebuild(board_state)
+
+    ''' PUBLIC FUNCTIONS '''
+    def rebuild(self, board_state):
+        """
+        This function rebuilds the maps from scratch.
+
+        Parameters:
+            - board_state: a BoardState
+        """
+        self.board_state = board_state
+        self._find_kings()
+        self.piece_attacks = {'white': {}, 'black': {}}
+        for color in self.piece_attacks:
+            pieces = board_state.get_occupancy()[color]
+            while pieces:
+                square = (pieces & -pieces).bit_length() - 1
+                pieces &= pieces - 1
+                self._update_piece_attacks(color, square)
+        self._update_king_safety()
+
+    def update(self, board_state):
+        """
+        This function updates the maps to a new board state. If the board changed by one move (i.e. up to
+        MAX_MOVE_CHANGES squares changed), only the attacks that the move could have changed are updated. Otherwise,
+        the maps are rebuilt.
+
+        Parameters:
+            - board_state: a BoardState
+        """
+        changed_squares = np.flatnonzero(board_state.codes.ravel() != self.board_state.codes.ravel())
+        if len(changed_squares) == 0:
+            self.board_state = board_state
+            return
+        if len(changed_squares) > MAX_MOVE_CHANGES:
+            self.log.debug(f"{len(changed_squares)} squares changed. Rebuilding the attack maps")
+            self.rebuild(board_state)
+            return
+
+        self.board_state = board_state
+        self._find_kings()
+        changed = 0
+        for square in changed_squares:
+            changed |= 1 << int(square)
+        # Update the attacks of the pieces on the changed squares, and of the rooks, bishops, and queens whose lines go
+        # through them
+        for color, piece_attacks in self.piece_attacks.items():
+            outdated_squares = [square for square, attacks in piece_attacks.items()
+                                if changed >> square & 1 or (attacks & changed and self._is_sliding_piece(square))]
+            for square in outdated_squares:
+                del piece_attacks[square]
+            for square in outdated_squares:
+                if not changed >> square & 1:
+                    self._update_piece_attacks(color, square)
+            pieces = board_state.get_occupancy()[color] & changed
+            while pieces:
+                square = (pieces & -pieces).bit_length() - 1
+                pieces &= pieces - 1
+                self._update_piece_attacks(color, square)
+        self._update_king_safety()
+
+    def is_in_check(self, color):
+        """
+        This function determines if a side's king is in check.
+        """
+        return self.checkers[color] != 0
+
+    def restrict_destinations(self, name, color, current_pos, destinations):
+        """
+        This function removes the destinations that would leave the user's king in check from the destinations of one
+        of the user's pieces (see move_legality.get_destinations()).
+
+        Parameters:
+            - name: the piece's name (like 'rook', 'pawn', 'king', etc.)
+            - color: the user's color ('black' or 'white')
+            - current_pos: the piece's current position in the form (column, row)
+            - destinations: a bitboard of the squares the piece can be moved to, ignoring the king's safety
+        Output:
+            - return: a bitboard of the squares the piece can be moved to without leaving the user's king in check
+        """
+        col, row = current_pos
+        square = row * 8 + col
+        opponent_attacks = self.attacked[OTHER_COLOR[color]]
+
+        if name == 'king':
+            safe_destinations = destinations & ~opponent_attacks
+            # The king can't castle out of check, or through an attacked square
+            for castling_col, passed_col in ((col + 2, col + 1), (col - 2, col - 1)):
+                if 0 <= castling_col < 8 and safe_destinations >> (square - col + castling_col) & 1:
+                    if self.checkers[color] or opponent_attacks >> (square - col + passed_col) & 1:
+                        safe_destinations &= ~(1 << (square - col + castling_col))
+            return safe_destinations
+
+        safe_destinations = destinations & self.check_masks[color]
+        if self.pinned[color] >> square & 1:
+            safe_destinations &= self.pin_rays[square]
+        if name == 'pawn':
+            # An en passant capture removes a piece that isn't on its destination, so it's checked separately
+            occupancy = self.board_state.get_occupancy()
+            en_passant_destinations = (destinations & move_legality.USER_PAWN_ATTACKS[square]
+                                       & ~(occupancy['white'] | occupancy['black']))
+            safe_destinations &= ~en_passant_destinations
+            while en_passant_destinations:
+                next_square = (en_passant_destinations & -en_passant_destinations).bit_length() - 1
+                en_passant_destinations &= en_passant_destinations - 1
+                if self._is_safe_en_passant(color, square, next_square):
+                    safe_destinations |= 1 << next_square
+        return safe_destinations
+
+    ''' PRIVATE FUNCTIONS '''
+    def _find_kings(self):
+        """
+        This function finds the square of each side's king (None if a side has no king on the board).
+        """
+        code_bytes = self.board_state.codes.tobytes()
+        for color in OTHER_COLOR:
+            square = code_bytes.find(bytes([chess_piece.get_piece_code('king', color)]))
+            self.king_squares[color] = square if square >= 0 else None
+
+    def _get_blockers(self, color):
+        """
+        This function returns the squares that block the rooks, bishops, and queens of a side: every piece, except
+        the opponent's king.
+        """
+        occupancy = self.board_state.get_occupancy()
+        occupied = occupancy['white'] | occupancy['black']
+        opponent_king = self.king_squares[OTHER_COLOR[color]]
+        return occupied & ~(1 << opponent_king) if opponent_king is not None else occupied
+
+    def _get_piece(self, square):
+        return chess_piece.get_piece(self.board_state.codes.item(square))
+
+    def _is_sliding_piece(self, square):
+        return self._get_piece(square).name in move_legality.SLIDING_DIRECTIONS
+
+    def _update_piece_attacks(self, color, square):
+        """
+        This function finds the squares attacked by the piece on a square.
+        """
+        name = self._get_piece(square).name
+        self.piece_attacks[color][square] = move_legality.get_attacks(name, color == self.user_color, square,
+                                                                      self._get_blockers(color))
+
+    def _is_safe_en_passant(self, color, square, next_square):
+        """
+        This function determines if an en passant capture leaves the king in check: if any checker besides the
+        captured pawn is left (besides a rook, bishop, or queen that the move blocks), or if the move opens a line to
+        the king (which removing the captured pawn can do, even if neither pawn is pinned).
+        """
+        king_square = self.king_squares[color]
+        if king_square is None:
+            return True
+        captured_square = next_square + 8
+        other_checkers = self.checkers[color] & ~(1 << captured_square)
+        while other_checkers:
+            checker_square = (other_checkers & -other_checkers).bit_length() - 1
+            other_checkers &= other_checkers - 1
+            if not self._is_sliding_piece(checker_square):
+                return False
+
+        occupancy = self.board_state.get_occupancy()
+        occupied = ((occupancy['white'] | occupancy['black']) & ~(1 << square) & ~(1 << captured_square)
+                    | 1 << next_square)
+        for direction in ALL_DIRECTIONS:
+            blockers = RAYS[direction][king_square] & occupied
+            if blockers:
+                piece = self._get_piece(move_legality.get_first_blocker(direction, blockers))
+                if piece.color == OTHER_COLOR[color] and piece.name in PINNING_PIECES[direction]:
+                    return False
+        return True
+
+    def _update_king_safety(self):
+        """
+        This function updates the attacked squares, the checkers, and the pinned pieces of both sides from the attacks
+        of every piece.
+        """
+        occupancy = self.board_state.get_occupancy()
+        occupied = occupancy['white'] | occupancy['black']
+        for color, piece_attacks in self.piece_attacks.items():
+            attacked = 0
+            for attacks in piece_attacks.values():
+                attacked |= attacks
+            self.attacked[color] = attacked
+
+        self.pin_rays = {}
+        for color, opponent in OTHER_COLOR.items():
+            self.checkers[color] = 0
+            self.pinned[color] = 0
+            self.check_masks[color] = ALL_SQUARES
+            king_square = self.king_squares[color]
+            if king_square is None:
+                continue
+
+            if self.attacked[opponent] >> king_square & 1:
+                for square, attacks in self.piece_attacks[opponent].items():
+                    if attacks >> king_square & 1:
+                        self.checkers[color] |= 1 << square
+            checkers = self.checkers[color]
+            if checkers & (checkers - 1):
+                self.check_masks[color] = 0 # double check: only the king can move
+            elif checkers:
+                checker_square = checkers.bit_length() - 1
+                self.check_masks[color] = checkers | move_legality.get_squares_between(king_square, checker_square)
+
+            # A piece is pinned if it's the first piece on a line from the king, and the second is an opponent's
+            # piece that moves along that line
+            for direction in ALL_DIRECTIONS:
+                blockers = RAYS[direction][king_square] & occupied
+                if not blockers:
+                    continue
+                first_blocker = move_legality.get_first_blocker(direction, blockers)
+                blockers &= RAYS[direction][first_blocker]
+                if not occupancy[color] >> first_blocker & 1 or not blockers:
+                    continue
+                second_blocker = move_legality.get_first_blocker(direction, blockers)
+                pinner = self._get_piece(second_blocker)
+                if pinner.color == opponent and pinner.name in PINNING_PIECES[direction]:
+                    self.pinned[color] |= 1 << first_blocker
+                    self.pin_rays[first_blocker] = RAYS[direction][king_square] & ~RAYS[direction][second_blocker]
@@ -0,0 +1,181 @@
+"""
+This file defines the audio sources that the SpeechRecognizer can listen to:
+    (a) the microphone, with the SpeechRecognition library's Microphone (the default)
+    (b) ReplayAudioSource: replays recorded utterances from an audio file or a directory of audio files, in real time or
+        faster than real time
+"""
+import os
+import threading
+import time
+import speech_recognition as sr
+
+AUDIO_SOURCE_NAMES = ['microphone', 'replay']
+REPLAY_AUDIO_EXTENSIONS = ('.wav', '.aif', '.aiff', '.flac') # the formats that the SpeechRecognition library can read
+REPLAY_SAMPLE_WIDTH = 2 # the sample width (in bytes) of the replayed audio
+REPLAY_CHUNK_SIZE = 1024 # the number of frames in a chunk of replayed audio (like the Microphone's)
+# The silence (in seconds) before each replayed utterance and after the last one. It must be longer than the
+# SpeechRecognizer's pause threshold, so that each utterance is heard on its own, and than its noise sample duration,
+# so that the first utterance isn't mistaken for ambient noise
+REPLAY_GAP_DURATION = 1.2
+
+
+def create_audio_source(name, replay_path=None, sample_rate=None, replay_speed=1.0):
+    """
+    This function creates an audio source from its name.
+
+    Parameters:
+        - name: one of the names in AUDIO_SOURCE_NAMES
+        - replay_path: the audio file or directory of audio files to replay (only used by the 'replay' source)
+        - sample_rate: the sample rate (in Hz) of the audio. If None, the microphone's default rate, or the rate of the
+            first replayed file
+        - replay_speed: how many times faster than real time the audio is replayed (only used by the 'replay' source)
+    Output:
+        - return: an AudioSource object from the SpeechRecognition library
+    """
+    if name == 'microphone':
+        audio_source = sr.Microphone(sample_rate=sample_rate)
+    elif name == 'replay':
+        audio_source = ReplayAudioSource.from_path(replay_path, sample_rate, replay_speed)
+    else:
+        raise ValueError(f"Unknown audio source: {name}. Expected one of: {', '.join(AUDIO_SOURCE_NAMES)}")
+    return audio_source
+
+
+class ReplayAudioSource(sr.AudioSource):
+    """
+    The ReplayAudioSource replays recorded utterances instead of listening to a microphone, which makes it possible to
+    run (and benchmark) the voice pipeline on a machine without sound hardware. The utterances are replayed one after
+    the other, each after REPLAY_GAP_DURATION seconds of silence, then the source stays silent.
+
+    Like a microphone's stream, reading a chunk of audio blocks until the chunk has been "recorded": a chunk lasts
+    REPLAY_CHUNK_SIZE / sample rate seconds, divided by the replay speed. If the reader falls behind, the chunks that
+    were already recorded are returned without waiting. The replay clock starts over every time the source is entered,
+    so the time spent outside of the source (ex: while the listener is paused) isn't skipped.
+
+    The time at which each utterance was fully replayed (i.e. the user stopped speaking) is recorded, to measure the
+    latency of the pipeline (see utterance_end_times).
+    """
+
+    ''' CONSTRUCTOR '''
+    def __init__(self, recordings, sample_rate, speed=1.0, gap_duration=REPLAY_GAP_DURATION):
+        """
+        Parameters:
+            - recordings: a list of (file name, transcript, raw data) tuples, whose raw data is mono, at sample_rate,
+                with REPLAY_SAMPLE_WIDTH bytes per sample (see load_recordings())
+            - sample_rate: the sample rate (in Hz) of the recordings
+            - speed: how many times faster than real time the recordings are replayed
+            - gap_duration: the silence (in seconds) before each recording, and after the last one
+        """
+        if len(recordings) == 0:
+            raise ValueError("A ReplayAudioSource needs at least one recording")
+        if speed <= 0:
+            raise ValueError("The replay speed must be positive")
+        self.SAMPLE_RATE = sample_rate
+        self.SAMPLE_WIDTH = REPLAY_SAMPLE_WIDTH
+        self.CHUNK = REPLAY_CHUNK_SIZE
+        self.stream = None
+        self.recordings = recordings
+        self.speed = speed
+
+        gap = bytes(int(gap_duration * sample_rate) * REPLAY_SAMPLE_WIDTH)
+        self.audio = bytearray()
+        self.utterance_ends = [] # the position (in bytes) of the end of each recording in the audio
+        for _, _, raw_data in recordings:
+            self.audio += gap + raw_data
+            self.utterance_ends.append(len(self.audio))
+        self.audio += gap
+
+        self.position = 0 # the position (in bytes) of the next chunk to read
+        self.chunk_end_time = None # the time at which the last chunk read was fully recorded
+        self.utterance_end_times = [] # the time (from time.perf_counter()) at which each recording was fully replayed
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_path(cls, path, sample_rate=None, speed=1.0):
+        """
+        This function creates a ReplayAudioSource from an audio file, or a directory of audio files (replayed in
+        alphabetical order).
+        """
+        recordings, sample_rate = load_recordings(path, sample_rate)
+        return cls(recordings, sample_rate, speed)
+
+    def __enter__(self):
+        self.stream = self
+        self.chunk_end_time = None
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass # the replay goes on from where it stopped the next time the source is entered
+
+    ''' PUBLIC FUNCTIONS '''
+    def read(self, num_frames):
+        """
+        This function reads the next chunk of audio (silence once every recording was replayed), like a microphone's
+        stream.
+
+        Parameters:
+            - num_frames: the number of frames to read
+        Output:
+            - return: the chunk's raw data
+        """
+        with self.lock:
+            num_bytes = num_frames * self.SAMPLE_WIDTH
+            chunk = bytes(self.audio[self.position:self.position + num_bytes])
+            chunk += bytes(num_bytes - len(chunk))
+            self.position += num_bytes
+
+            bytes_per_second = self.SAMPLE_RATE * self.SAMPLE_WIDTH * self.speed
+            now = time.perf_counter()
+            if self.chunk_end_time is None:
+                self.chunk_end_time = now
+            self.chunk_end_time += num_bytes / bytes_per_second
+            while (len(self.utterance_end_times) < len(self.utterance_ends)
+                   and self.utterance_ends[len(self.utterance_end_times)] <= self.position):
+                utterance_end = self.utterance_ends[len(self.utterance_end_times)]
+                self.utterance_end_times.append(self.chunk_end_time - (self.position - utterance_end) / bytes_per_second)
+            wait_time = self.chunk_end_time - now
+        if wait_time > 0:
+            time.sleep(wait_time)
+        return chunk
+
+    def is_finished(self):
+        """
+        Return True once every recording (and the silence after the last one) was replayed.
+        """
+        return self.position >= len(self.audio)
+
+
+''' HELPER FUNCTIONS '''
+def load_recordings(path, sample_rate=None):
+    """
+    This function loads an audio file, or every audio file of a directory (in alphabetical order), as mono audio with
+    REPLAY_SAMPLE_WIDTH bytes per sample. The transcript of a recording is its file name, with spaces instead of
+    underscores. Anything after a dash is ignored, so that an utterance can be recorded several times (ex:
+    "knight_to_f3-2.wav" is "knight to f3").
+
+    Parameters:
+        - path: the audio file or directory of audio files
+        - sample_rate: the sample rate (in Hz) to convert the recordings to. If None, the rate of the first file
+    Output:
+        - return: a tuple of the list of (file name, transcript, raw data) tuples, and the sample rate
+    """
+    if path is None:
+        raise ValueError("The replay audio source needs the path of the audio to replay")
+    if os.path.isdir(path):
+        audio_files = [os.path.join(path, fname) for fname in sorted(os.listdir(path))
+                       if fname.lower().endswith(REPLAY_AUDIO_EXTENSIONS)]
+    else:
+        audio_files = [path]
+
+    recordings = []
+    recognizer = sr.Recognizer()
+    for audio_file in audio_files:
+        with sr.AudioFile(audio_file) as source:
+            audio = recognizer.record(source)
+        if sample_rate is None:
+            sample_rate = audio.sample_rate
+        fname = os.path.basename(audio_file)
+        transcript = os.path.splitext(fname)[0].split('-')[0].replace('_', ' ')
+        recordings.append((fname, transcript, audio.get_raw_data(convert_rate=sample_rate,
+                                                                 convert_width=REPLAY_SAMPLE_WIDTH)))
+    return recordings, sample_rate
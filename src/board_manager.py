@@ -1,4 +1,9 @@
 import logging
+from collections import OrderedDict
+from src import move_legality
+from src.attack_maps import AttackMaps
+
+LEGAL_MOVE_CACHE_SIZE = 8 # the number of board states (and user colors) whose legal moves are kept
 
 class BoardManager:
     """
@@ -8,21 +13,36 @@ class BoardManager:
         (c) the initial coordinates of the piece (before the move is made)
         (d) the final coordinates of the piece (after the move is made)
     More abstractly, the BoardManager is the link between between MoveCommands and the MouseController
+
+    All of these are looked up in a table of the user's legal moves (see move_legality.get_legal_moves()), which is only
+    built once per board state. Moves that would leave the user's king in check aren't legal: the AttackMaps of the
+    board are updated (incrementally, if the board changed by one move) whenever a table is built. If a GameModel of the
+    board is set, its castling rights and en passant square also restrict the table. The tables of the last few board
+    states are kept in an LRU cache, by the board state's Zobrist hash, since the same board state is usually checked
+    several times per command (and again if the board doesn't change between commands).
     """
 
     UNDETERMINED_COORDINATES = (-1, -1) # static constant for indicating that no possible coordinate has been found
     AMBIGUOUS_COORDINATES = (-2, -2) # static constant for indicating that multiple possible coordinates were found
+    # static constants for the status of a move (see 'get_move_statuses()')
+    LEGAL_MOVE = 'legal'
+    AMBIGUOUS_MOVE = 'ambiguous'
+    ILLEGAL_MOVE = 'illegal'
 
     ''' CONSTRUCTOR '''
     def __init__(self, board_state, color='unknown'):
         """
         Parameters:
-            - board_state: a 8x8 numpy array where each element is a ChessPiece object that contains name and color
+            - board_state: a BoardState, where each square's ChessPiece (which contains its name and color) is looked up
+                by (row, column)
             - color: a string, either "black", "white", or "unknown"
         """
         self.log = logging.getLogger(__name__)
         self.user_color = color
         self.board_state = board_state
+        self._legal_move_tables = OrderedDict() # LRU cache of legal move tables, by (Zobrist hash, user color, rules)
+        self._attack_maps = None
+        self.game_model = None
 
     ''' PUBLIC FUNCTIONS '''
     def is_legal_move(self, command):
@@ -46,13 +66,10 @@ class BoardManager:
         elif initial_coordinates == self.AMBIGUOUS_COORDINATES:
             self.log.warning("Could not set initial coordinates. More than one possible coordinate was found.")
         else:
-            piece = self.board_state[initial_coordinates[1], initial_coordinates[0]]
-            self.log.debug(f"Initial coordinates found. Checking to see if the {piece.color} {piece.name} "
+            self.log.debug(f"Initial coordinates found. Checking to see if the {self.user_color} {command.piece_name} "
                            f"can be moved from {initial_coordinates} to {final_coordinates}")
-            if (piece.name == command.piece_name
-                    and piece.color == self.user_color
-                    and piece.can_be_moved(initial_coordinates, final_coordinates, self.board_state)):
-                is_legal = True
+            # The table only has the user's pieces, by their name on the board
+            is_legal = initial_coordinates in self._get_legal_moves().get((final_coordinates, command.piece_name), [])
 
         self.log.debug(f"Legal move: {is_legal}")
         return is_legal
@@ -99,22 +116,15 @@ class BoardManager:
         initial_coordinates = self.UNDETERMINED_COORDINATES
 
         if command.get_src() is None:
-            num_movable_pieces = 0
             final_coordinates = self.get_final_coordinates(command)
 
-            # Check every row and column to see if the piece at that position can be moved
-            for row in range(0, 8):
-                for col in range(0, 8):
-                    board_piece = self.board_state[row, col]
-                    if (board_piece.can_be_moved((col, row), final_coordinates, self.board_state)
-                            and board_piece.name == command.piece_name
-                            and board_piece.color == self.user_color):
-                        initial_coordinates = (col, row)
-                        num_movable_pieces += 1
-                        self.log.debug(f"{command.piece_name} "
-                                       f"@ {initial_coordinates} can be moved")
-
-            if num_movable_pieces > 1:
+            # Look up every square from which a piece of the given type can be moved to the destination
+            movable_pieces = self._get_legal_moves().get((final_coordinates, command.piece_name), [])
+            num_movable_pieces = len(movable_pieces)
+            if num_movable_pieces == 1:
+                initial_coordinates = movable_pieces[0]
+                self.log.debug(f"{command.piece_name} @ {initial_coordinates} can be moved")
+            elif num_movable_pieces > 1:
                 initial_coordinates = self.AMBIGUOUS_COORDINATES
                 self.log.warning(f"Ambiguous starting coordinates: {num_movable_pieces} "
                                  f"{command.piece_name}s could be moved to {final_coordinates}")
@@ -124,6 +134,31 @@ class BoardManager:
         self.log.debug(f"initial_coordinates: {initial_coordinates}")
         return initial_coordinates
 
+    def get_move_statuses(self, commands):
+        """
+        This function determines if each of several commands (ex: the alternative transcripts of the same audio) is
+        legal, ambiguous, or illegal, given the user's color and the current state of the board. All of the commands
+        are checked against the same table of legal moves.
+
+        Parameters:
+            - commands: a list of MoveCommand objects
+        Output:
+            - return: a list of the status of each command: LEGAL_MOVE, AMBIGUOUS_MOVE, or ILLEGAL_MOVE
+        """
+        legal_moves = self._get_legal_moves()
+        statuses = []
+        for command in commands:
+            movable_pieces = legal_moves.get((self.get_final_coordinates(command), command.piece_name), [])
+            if command.get_src() is not None:
+                is_legal = self._file_rank_to_indices(command.get_src()) in movable_pieces
+                statuses.append(self.LEGAL_MOVE if is_legal else self.ILLEGAL_MOVE)
+            elif len(movable_pieces) > 1:
+                statuses.append(self.AMBIGUOUS_MOVE)
+            else:
+                statuses.append(self.LEGAL_MOVE if len(movable_pieces) == 1 else self.ILLEGAL_MOVE)
+        self.log.debug(f"Move statuses: {[(command.text(), status) for command, status in zip(commands, statuses)]}")
+        return statuses
+
     def get_final_coordinates(self, command):
         """
         This function determines the final or "destination" coordinates of the piece to be moved.
@@ -143,6 +178,13 @@ class BoardManager:
         self.board_state = board_state
         self.log.debug("Board state updated.")
 
+    def set_game_model(self, game_model):
+        """
+        This function sets 'game_model'.
+        """
+        self.game_model = game_model
+        self.log.debug("Game model updated.")
+
     def set_user_color(self, user_color):
         """
         This function sets 'user_color'.
@@ -151,6 +193,47 @@ class BoardManager:
         self.log.debug(f"New user piece color: {user_color}")
 
     ''' PRIVATE FUNCTIONS '''
+    def _get_legal_moves(self):
+        """
+        This function gets the table of the user's legal moves on the current board state (see
+        move_legality.get_legal_moves()), from the cache if possible.
+        """
+        # The game model only applies to its own board
+        game_model = self.game_model
+        if game_model is not None and game_model.board_state != self.board_state:
+            game_model = None
+        key = (self.board_state.get_zobrist_hash(), self.user_color,
+               game_model.get_rules_key() if game_model is not None else None)
+        legal_moves = self._legal_move_tables.get(key)
+        if legal_moves is None:
+            legal_moves = move_legality.get_legal_moves(self.board_state, self.user_color, self._get_attack_maps())
+            if game_model is not None:
+                legal_moves = game_model.restrict_legal_moves(legal_moves)
+            self._legal_move_tables[key] = legal_moves
+            if len(self._legal_move_tables) > LEGAL_MOVE_CACHE_SIZE:
+                self._legal_move_tables.popitem(last=False)
+            self.log.debug(f"Found {sum(map(len, legal_moves.values()))} legal moves")
+        else:
+            self._legal_move_tables.move_to_end(key)
+        return legal_moves
+
+    def _get_attack_maps(self):
+        """
+        This function brings the AttackMaps up to date with the current board state and the user's color.
+
+        Output:
+            - return: the AttackMaps, or None if the user's color is unknown
+        """
+        if self.user_color not in move_legality.OTHER_COLOR:
+            return None
+        if self._attack_maps is None or self._attack_maps.user_color != self.user_color:
+            self._attack_maps = AttackMaps(self.board_state, self.user_color)
+        else:
+            self._attack_maps.update(self.board_state)
+        if self._attack_maps.is_in_check(self.user_color):
+            self.log.debug(f"The {self.user_color} king is in check")
+        return self._attack_maps
+
     def _file_rank_to_indices(self, coords):
         """
         This function converts from "File-Rank"* format to 0-7 index format. "File-Rank" coordinates are independent of
@@ -1,43 +1,61 @@
 import logging
+import os
 import time
-from PIL import ImageGrab
+import yaml
 import numpy as np
 import cv2
-import pyautogui
 import queue
-from sklearn.neighbors import KernelDensity
-from scipy.signal import argrelextrema
-from src.chess_piece import ChessPiece
+from src.chess_piece import PIECE_TYPES, EMPTY_CODE, get_piece, get_piece_code
+from src.board_state import BoardState
+from src.frame_source import ImageGrabFrameSource
+from src.length_clusterer import LengthClusterer
+from src.piece_classifier import PieceClassifier
+from src.template_atlas import REFERENCE_IMG_DIM
 
 
 ''' CUSTOM DATA TYPES '''
-class ConsecutivePixelColorSequence:
+class ConsecutivePixelColorSequences:
     """
-    Each cpcs has a color, start index, and length.
+    A compact collection of consecutive pixel color sequences (cpcs's). Each cpcs has a color, start index, and length.
+    Rather than storing one object per cpcs, the colors, start indices, and lengths are stored in three parallel
+    NumPy arrays.
     """
-    def __init__(self, color, start_pixel, length=1):
-        self.color = color
-        self.start_pixel = start_pixel
-        self.length = length
+    def __init__(self, colors, start_pixels, lengths):
+        self.colors = colors
+        self.start_pixels = start_pixels
+        self.lengths = lengths
+
+    def __len__(self):
+        return len(self.colors)
+
+    def subset(self, indices):
+        """
+        This function returns the cpcs's at the given indices (either an array of indices or a boolean mask).
+        """
+        return ConsecutivePixelColorSequences(self.colors[indices], self.start_pixels[indices], self.lengths[indices])
 
 
 ''' CONSTANTS '''
 SCALED_HEIGHT = 720 # arbitrary low resolution to reduce computation time
-REFERENCE_IMG_DIM = 33 # width and height in pixels
-CHESS_PIECES = [ChessPiece('pawn', 'black'),
-                ChessPiece('rook', 'black'),
-                ChessPiece('knight', 'black'),
-                ChessPiece('bishop', 'black'),
-                ChessPiece('queen', 'black'),
-                ChessPiece('king', 'black'),
-                ChessPiece('pawn', 'white'),
-                ChessPiece('rook', 'white'),
-                ChessPiece('knight', 'white'),
-                ChessPiece('bishop', 'white'),
-                ChessPiece('queen', 'white'),
-                ChessPiece('king', 'white'),
-                ChessPiece('empty', 'empty')]
+CHESS_PIECES = ([get_piece(get_piece_code(name, color)) for color in ('black', 'white') for name in PIECE_TYPES]
+                + [get_piece(EMPTY_CODE)])
 EMPTY_RECOGNITION_THRESHOLD = 1000
+PIECE_CLASSIFIER = PieceClassifier(CHESS_PIECES, EMPTY_RECOGNITION_THRESHOLD)
+# The color (0 for black, 1 for white) of each square's tile, by row and column
+TILE_COLORS = np.array([[1 if (col + row) % 2 == 0 else 0 for col in range(0, 8)] for row in range(0, 8)])
+SCANLINE_BLOCK_SIZE = 32 # number of scanlines that are run-length encoded at once
+CPCS_LENGTH_CLUSTERER = LengthClusterer(round(SCALED_HEIGHT/8))
+BOARD_LOCATION_FILE = 'cache/board_location.yaml' # where the last known location of the board is saved
+NUM_GRIDLINES = 9 # the number of vertical (and horizontal) lines of the board's grid, including its edges
+TRACKING_SAMPLE_INSET = 1 / 12 # how far (as a fraction of a square) the tracking samples are from a square's corners
+TRACKING_COLOR_TOLERANCE = 2 # the largest difference in grayscale value for two tile samples to have the same color
+TRACKING_MIN_MATCH_RATIO = 0.8 # the fraction of tile samples that must match for the board to still be located
+FINGERPRINT_STRIDE = 3 # a square's fingerprint is every FINGERPRINT_STRIDE-th pixel (in both dimensions) of its image
+BOARD_REGION_MARGIN = 1 / 8 # the margin (as a fraction of the board's size) captured around the board while tracking
+# If True, squares that are smaller than the reference images are compared to scaled down reference images, instead
+# of being scaled up
+TEMPLATE_PRESCALING = True
+MIN_SQUARE_SIZE = 8 # the smallest size (in pixels) to which the reference images are scaled down
 
 
 class BoardRecognizer:
@@ -50,15 +68,49 @@ class BoardRecognizer:
     """
 
     ''' CONSTRUCTOR '''
-    def __init__(self):
+    def __init__(self, tracking=True, search_region=None, frame_source=None):
+        """
+        Parameters:
+            - tracking: if True, the board's last known location is reused for as long as the board is still there,
+                instead of searching the whole screen for the board every time it is recognized. While the board is
+                tracked, only the board (plus a margin) is captured, scaled down like the search region (so the board
+                has the same size in the frame as when it was found). The last known location is also saved to (and
+                loaded from) the BOARD_LOCATION_FILE.
+            - search_region: the rectangle of the screen in which to search for the board, as a tuple of
+                (left, top, width, height) in screen coordinates. Use this to search a monitor other than the primary
+                display. If None, the primary display is searched.
+            - frame_source: the FrameSource from which to get the screenshots (see frame_source.py).
+                If None, the screen is captured with PIL's ImageGrab.
+        """
         self.log = logging.getLogger(__name__)
-        self.screen_width = pyautogui.size()[0]
-        self.screen_height = pyautogui.size()[1]
+        self.frame_source = frame_source if frame_source is not None else ImageGrabFrameSource()
+        self.screen_width, self.screen_height = self.frame_source.get_screen_size()
         self.log.debug("Screen size: {" + f"width: {self.screen_width}, height: {self.screen_height}" + "}")
+        self.search_region = tuple(search_region) if search_region is not None else None
+        self.log.debug(f"Search region: {self._get_search_region()}")
+
+        # The current frame, and the x and y coordinates of the board's gridlines within the frame
         self.frame = None
+        self.frame_origin = (0, 0) # the screen coordinates of the frame's top left pixel
+        self.frame_scale = 1 # the number of screen pixels per frame pixel
         self.scaled_col_coords = []
         self.scaled_row_coords = []
 
+        # The x and y coordinates of the board's gridlines on the screen
+        self.board_coords = None
+
+        self.tracking = tracking
+        if self.tracking:
+            self._load_board_location()
+
+        # Each square is only re-classified if its fingerprint changed since the last frame
+        self.square_fingerprints = None
+        self.square_pieces = None
+        self.fingerprinted_coords = None
+        self.board_img = None # the board, scaled to 8 squares of the same size on each side
+        self.num_squares_skipped = 0 # total number of squares whose previous piece was reused
+        self.num_squares_reclassified = 0 # total number of squares that were classified
+
     ''' PUBLIC FUNCTIONS '''
     def endlessly_recognize_board(self, board_queue, pause_time, stop_event):
         """
@@ -86,29 +138,29 @@ class BoardRecognizer:
         Parameters:
             - board_queue: the queue in which to store the board's coordinates and state (i.e. location of each piece)
         Output:
-            - return: none
+            - return: the board's coordinates and state (the same tuple that is stored in the queue), or None if the
+                board wasn't found
             - queue: the boards coordinates and state are stored in the board_queue as a two-element tuple
                 the first element is an array of values representing the x and y coordinates of each line on the board
                 the second element is a 8x8 NumPy array representing the board state (i.e. the location of each piece)
         """
         board_coords = self._get_board_coords()
-        if board_coords is not None:
-            # TODO: properly initialize the numpy array
-            board_state = np.full((8, 8), ChessPiece('unknown', 'unknown'))
-            for row in range(1, 8 + 1):
-                for col in range(1, 8 + 1):
-                    board_state[row - 1][col - 1] = self._identify_piece(col, row)
-            try:
-                board_queue.put_nowait((board_coords, board_state))
-            except queue.Full:
-                board_queue.get()
-                board_queue.put((board_coords, board_state))
+        if board_coords is None:
+            return None
+        board_state = self._identify_pieces()
+        try:
+            board_queue.put_nowait((board_coords, board_state))
+        except queue.Full:
+            board_queue.get()
+            board_queue.put((board_coords, board_state))
+        return board_coords, board_state
 
     ''' PRIVATE FUNCTIONS '''
     def _get_board_coords(self):
         """
         This function finds the chessboard and its coordinates on the screen. It locates the chessboard by
-        searching for the checker pattern.
+        searching for the checker pattern. In tracking mode, the search is skipped if the board is still at its last
+        known location.
 
         Parameters:
             - none
@@ -118,8 +170,94 @@ class BoardRecognizer:
                         and the second list contains the y pixel coordinates of each horizontal line
                       if the chessboard is not detected, return None
         """
-        # Take screenshot
-        self.frame = self._get_processed_screenshot()
+        self.frame_source.next_frame()
+        screen_size_changed = self._update_screen_size()
+
+        # If the board is being tracked, only capture the board and check if it's still where it was last found
+        if self.tracking and not screen_size_changed and self.board_coords is not None:
+            self.frame = self._get_processed_screenshot(self._get_board_region())
+            self.scaled_col_coords, self.scaled_row_coords = self._to_frame_coords(self.board_coords)
+            if self._board_is_still_located():
+                return self.board_coords
+
+        # Search for the board
+        self.frame = self._get_processed_screenshot(self._get_search_region())
+        self._locate_board()
+        if len(self.scaled_col_coords) > 0:
+            self.board_coords = self._to_screen_coords(self.scaled_col_coords, self.scaled_row_coords)
+            if self.tracking:
+                self._save_board_location()
+        else:
+            self.board_coords = None
+
+        return self.board_coords
+
+    def _to_screen_coords(self, frame_col_coords, frame_row_coords):
+        """
+        This function converts gridline coordinates from the current frame's pixels to the screen's pixels.
+
+        Parameters:
+            - frame_col_coords: a list of the x pixel coordinates of each vertical line in the frame
+            - frame_row_coords: a list of the y pixel coordinates of each horizontal line in the frame
+        Output:
+            - return: a tuple of two lists of floats -- the x and y screen coordinates of the lines
+        """
+        screen_col_coords = [self.frame_origin[0] + frame_col_coord * self.frame_scale
+                             for frame_col_coord in frame_col_coords]
+        screen_row_coords = [self.frame_origin[1] + frame_row_coord * self.frame_scale
+                             for frame_row_coord in frame_row_coords]
+        return screen_col_coords, screen_row_coords
+
+    def _to_frame_coords(self, screen_coords):
+        """
+        This function converts gridline coordinates from the screen's pixels to the current frame's pixels.
+
+        Parameters:
+            - screen_coords: a tuple of two lists -- the x and y screen coordinates of the lines
+        Output:
+            - return: a tuple of two lists of integers -- the x and y pixel coordinates of the lines in the frame
+        """
+        frame_col_coords = [round((screen_col_coord - self.frame_origin[0]) / self.frame_scale)
+                            for screen_col_coord in screen_coords[0]]
+        frame_row_coords = [round((screen_row_coord - self.frame_origin[1]) / self.frame_scale)
+                            for screen_row_coord in screen_coords[1]]
+        return frame_col_coords, frame_row_coords
+
+    def _get_search_region(self):
+        """
+        This function returns the rectangle of the screen, as a tuple of (left, top, width, height), in which to search
+        for the board.
+        """
+        if self.search_region is not None:
+            return self.search_region
+        return 0, 0, self.screen_width, self.screen_height
+
+    def _get_board_region(self):
+        """
+        This function returns the rectangle of the screen, as a tuple of (left, top, width, height), that contains the
+        board's last known location plus a margin. The rectangle never extends past the search region.
+        """
+        col_coords, row_coords = self.board_coords
+        margin = BOARD_REGION_MARGIN * (col_coords[-1] - col_coords[0])
+        search_left, search_top, search_width, search_height = self._get_search_region()
+        left = max(search_left, int(col_coords[0] - margin))
+        top = max(search_top, int(row_coords[0] - margin))
+        right = min(search_left + search_width, int(col_coords[-1] + margin) + 1)
+        bottom = min(search_top + search_height, int(row_coords[-1] + margin) + 1)
+        return left, top, right - left, bottom - top
+
+    def _locate_board(self):
+        """
+        This function searches the current frame for the chessboard (i.e. for the checker pattern) and sets the
+        coordinates of the board's gridlines within the frame.
+
+        Parameters:
+            - none
+        Output:
+            - return: none
+            - scaled_col_coords and scaled_row_coords: if the chessboard is detected, set to the x and y pixel
+                coordinates of each vertical and horizontal line in the frame. Otherwise, set to empty lists
+        """
         ss_width = self.frame.shape[1]  # ss is short for screenshot
         ss_height = self.frame.shape[0]
 
@@ -128,79 +266,34 @@ class BoardRecognizer:
         self.scaled_col_coords = []
 
         # FIND COLUMN COORDINATES
+        # Search the rows in the middle half of the screenshot for the checker pattern
         col_coords_are_found = False
-        i = round(ss_height / 4)
-        while i < round((3 / 4) * ss_height) and not col_coords_are_found:
-            # Split row into consecutive pixel color sequences
-            consecutive_color_arr = [ConsecutivePixelColorSequence(self.frame[i, 0], 0)]
-            for j in range(1, ss_width):
-                if self.frame[i, j] == consecutive_color_arr[-1].color:
-                    consecutive_color_arr[-1].length += 1
-                else:
-                    consecutive_color_arr.append(ConsecutivePixelColorSequence(self.frame[i, j], j))
-
-            # 'cpcs' stands for 'ConsecutivePixelColorSequence'
-            # Cluster the cpcs's by length
-            consecutive_color_arr_lengths = [sequence.length for sequence in consecutive_color_arr]
-            cpcs_length_clusters = self._cluster_objects(consecutive_color_arr, consecutive_color_arr_lengths)
-
-            # Find checker pattern
-            for cluster in cpcs_length_clusters:
-                checker_pattern_start_index = self._find_cpcs_checker_pattern(cluster)
-                if checker_pattern_start_index != -1:
-                    col_coords_are_found = True
-
-                    # Set chessboard column pixel start
-                    first_cpcs = cluster[checker_pattern_start_index]
-                    actual_first_square_length = \
-                        cluster[checker_pattern_start_index + 1].start_pixel - first_cpcs.start_pixel
-                    pixel_offset = (actual_first_square_length - first_cpcs.length) / 2
-                    leftmost_chessboard_pixel = first_cpcs.start_pixel - pixel_offset
-
-                    # Set chessboard size
-                    chessboard_size = cluster[checker_pattern_start_index + 7].start_pixel - cluster[
-                        checker_pattern_start_index].start_pixel
-                    chessboard_size = chessboard_size + (chessboard_size / 7) + 1
-
-                    chessboard_size -= 2
-                    break
-
-            i += 1
+        checker_pattern = self._search_scanlines(self.frame, round(ss_height / 4), round((3 / 4) * ss_height))
+        if checker_pattern is not None:
+            col_coords_are_found = True
+            cluster, checker_pattern_start_index = checker_pattern
 
-        # FIND ROW COORDINATES
-        if col_coords_are_found:
-            row_coords_are_found = False
-            i = round(leftmost_chessboard_pixel)
-            while i < ss_width and not row_coords_are_found:
-                # Split column into consecutive pixel color sequences
-                consecutive_color_arr = [ConsecutivePixelColorSequence(self.frame[0, i], 0)]
-                for j in range(1, ss_height):
-                    if self.frame[j, i] == consecutive_color_arr[-1].color:
-                        consecutive_color_arr[-1].length += 1
-                    else:
-                        consecutive_color_arr.append(ConsecutivePixelColorSequence(self.frame[j, i], j))
+            # Set chessboard column pixel start
+            leftmost_chessboard_pixel = self._get_checker_pattern_start(cluster, checker_pattern_start_index)
 
-                # 'cpcs' stands for 'ConsecutivePixelColorSequence'
-                # Cluster the cpcs's by length
-                consecutive_color_arr_lengths = [sequence.length for sequence in consecutive_color_arr]
-                cpcs_length_clusters = self._cluster_objects(consecutive_color_arr, consecutive_color_arr_lengths)
-
-                # Find checker pattern
-                for cluster in cpcs_length_clusters:
-                    checker_pattern_start_index = self._find_cpcs_checker_pattern(cluster)
-                    if checker_pattern_start_index != -1:
-                        row_coords_are_found = True
+            # Set chessboard size
+            chessboard_size = int(cluster.start_pixels[checker_pattern_start_index + 7]
+                                  - cluster.start_pixels[checker_pattern_start_index])
+            chessboard_size = chessboard_size + (chessboard_size / 7) + 1
 
-                        # Set chessboard row pixel start
-                        first_cpcs = cluster[checker_pattern_start_index]
-                        actual_first_square_length = \
-                            cluster[checker_pattern_start_index + 1].start_pixel - first_cpcs.start_pixel
-                        pixel_offset = (actual_first_square_length - first_cpcs.length) / 2
-                        upmost_chessboard_pixel = first_cpcs.start_pixel - pixel_offset
+            chessboard_size -= 2
 
-                        break
+        # FIND ROW COORDINATES
+        # Search the columns to the right of the board's left edge for the checker pattern
+        if col_coords_are_found:
+            row_coords_are_found = False
+            checker_pattern = self._search_scanlines(self.frame.T, round(leftmost_chessboard_pixel), ss_width)
+            if checker_pattern is not None:
+                row_coords_are_found = True
+                cluster, checker_pattern_start_index = checker_pattern
 
-                i += 1
+                # Set chessboard row pixel start
+                upmost_chessboard_pixel = self._get_checker_pattern_start(cluster, checker_pattern_start_index)
 
         # Set the coordinates of every grid line based on the chessboard's
         # leftmost and upmost pixels as well as the board's size
@@ -213,128 +306,303 @@ class BoardRecognizer:
                 self.scaled_col_coords.append(self.scaled_col_coords[-1] + grid_square_size)
             self.scaled_row_coords = [round(row) for row in self.scaled_row_coords]
             self.scaled_col_coords = [round(col) for col in self.scaled_col_coords]
+            self.log.debug(f"Board located at: {self.scaled_col_coords}, {self.scaled_row_coords}")
 
-            # Scale the coordinates back up to the screen's actual resolution
-            fullsize_row_coords = [(scaled_row_coord * self.screen_height) / SCALED_HEIGHT for scaled_row_coord in
-                                   self.scaled_row_coords]
-            fullsize_col_coords = [(scaled_col_coord * self.screen_height) / SCALED_HEIGHT for scaled_col_coord in
-                                   self.scaled_col_coords]
+    def _board_is_still_located(self):
+        """
+        This function checks if the board is still at its last known location, without searching the whole frame.
+        The color of every tile on the board's edges is sampled near two of the tile's corners (where pieces rarely
+        are). The board is still located if the samples form the checker pattern, i.e., if most of the samples from
+        white tiles have one color, and most of the samples from black tiles have another.
 
-            # Set return value
-            board_coords = (fullsize_col_coords, fullsize_row_coords)
-        else:
-            board_coords = None
+        Parameters:
+            - none
+        Output:
+            - return: True if the board is still at the location given by scaled_col_coords and scaled_row_coords,
+                False if it isn't (or if there is no last known location)
+        """
+        if len(self.scaled_col_coords) == 0:
+            return False
+        col_coords = np.array(self.scaled_col_coords)
+        row_coords = np.array(self.scaled_row_coords)
+        if (col_coords.min() < 0 or row_coords.min() < 0
+                or col_coords.max() >= self.frame.shape[1] or row_coords.max() >= self.frame.shape[0]):
+            return False
+
+        # Find the tiles on the board's edges
+        rows, cols = np.nonzero(np.pad(np.zeros((6, 6), dtype=bool), 1, constant_values=True))
+
+        # Sample each of them near their top right and bottom left corners
+        inset_x = np.maximum(1, np.round((col_coords[cols + 1] - col_coords[cols]) * TRACKING_SAMPLE_INSET)).astype(int)
+        inset_y = np.maximum(1, np.round((row_coords[rows + 1] - row_coords[rows]) * TRACKING_SAMPLE_INSET)).astype(int)
+        sample_x = np.concatenate((col_coords[cols + 1] - 1 - inset_x, col_coords[cols] + inset_x))
+        sample_y = np.concatenate((row_coords[rows] + inset_y, row_coords[rows + 1] - 1 - inset_y))
+        samples = self.frame[sample_y, sample_x].astype(int)
+        sample_tile_colors = np.tile(TILE_COLORS[rows, cols], 2)
+
+        # Compare the samples of each tile color to the color most of them have
+        tile_colors = []
+        num_matches = 0
+        for tile_color in (0, 1):
+            tile_samples = samples[sample_tile_colors == tile_color]
+            values, counts = np.unique(tile_samples, return_counts=True)
+            tile_colors.append(values[np.argmax(counts)])
+            num_matches += np.count_nonzero(np.abs(tile_samples - tile_colors[-1]) <= TRACKING_COLOR_TOLERANCE)
+
+        is_still_located = (abs(tile_colors[0] - tile_colors[1]) > TRACKING_COLOR_TOLERANCE
+                            and num_matches >= TRACKING_MIN_MATCH_RATIO * len(samples))
+        if not is_still_located:
+            self.log.debug("Board is no longer at its last known location")
+        return is_still_located
+
+    def _update_screen_size(self):
+        """
+        This function updates the screen size (in case the screen's resolution changed).
 
-        return board_coords
+        Parameters:
+            - none
+        Output:
+            - return: True if the screen size changed, False if it didn't
+        """
+        screen_width, screen_height = self.frame_source.get_screen_size()
+        screen_size_changed = (screen_width, screen_height) != (self.screen_width, self.screen_height)
+        if screen_size_changed:
+            self.screen_width = screen_width
+            self.screen_height = screen_height
+            self.log.debug("New screen size: {" + f"width: {self.screen_width}, height: {self.screen_height}" + "}")
+        return screen_size_changed
+
+    def _load_board_location(self):
+        """
+        This function loads the board's last known location from the BOARD_LOCATION_FILE, unless the location was
+        saved for a different screen size or search region. The location is ignored unless it has the coordinates of
+        NUM_GRIDLINES gridlines in each direction, in increasing order.
+        """
+        try:
+            with open(BOARD_LOCATION_FILE, 'r') as location_file:
+                board_location = yaml.safe_load(location_file)
+            if (board_location['screen_size'] == [self.screen_width, self.screen_height]
+                    and board_location['search_region'] == list(self._get_search_region())):
+                board_coords = (board_location['col_coords'], board_location['row_coords'])
+                if not all(self._are_gridline_coords(coords) for coords in board_coords):
+                    raise ValueError(f"Invalid board location: {board_coords}")
+                self.board_coords = board_coords
+                self.log.debug(f"Loaded last known board location: {self.board_coords}")
+        except FileNotFoundError:
+            self.log.debug("No last known board location")
+        except (yaml.YAMLError, KeyError, TypeError, ValueError):
+            self.log.warning("Unable to load the last known board location", exc_info=True)
 
-    def _identify_piece(self, col, row):
+    @staticmethod
+    def _are_gridline_coords(coords):
         """
-        This function identifies the chess piece at a given location on the board. It uses the Mean Squared Error (mse)
-        to check which chess piece reference image is most similar to the image of the given location on the board.
-        The function returns the piece type that the most similar reference image represents.
+        Return True if coords is a list of NUM_GRIDLINES numbers, in increasing order.
+        """
+        return (isinstance(coords, list) and len(coords) == NUM_GRIDLINES
+                and all(isinstance(coord, (int, float)) and not isinstance(coord, bool) for coord in coords)
+                and all(coord < next_coord for coord, next_coord in zip(coords, coords[1:])))
+
+    def _save_board_location(self):
+        """
+        This function saves the board's location to the BOARD_LOCATION_FILE.
+        """
+        board_location = {'screen_size': [self.screen_width, self.screen_height],
+                          'search_region': [int(value) for value in self._get_search_region()],
+                          'col_coords': [float(coord) for coord in self.board_coords[0]],
+                          'row_coords': [float(coord) for coord in self.board_coords[1]]}
+        try:
+            os.makedirs(os.path.dirname(BOARD_LOCATION_FILE), exist_ok=True)
+            with open(BOARD_LOCATION_FILE, 'w') as location_file:
+                yaml.safe_dump(board_location, location_file)
+        except OSError:
+            self.log.warning("Unable to save the board's location", exc_info=True)
+
+    def _search_scanlines(self, scanlines, first_line, last_line):
+        """
+        This function searches a range of scanlines for the checker pattern. The scanlines are run-length encoded
+        SCANLINE_BLOCK_SIZE at a time, but they are searched in order, so the first scanline that contains the
+        checker pattern is the one that gets used.
+
+        Parameters:
+            - scanlines: a two dimensional NumPy array where each row is a scanline
+                (pass the transpose of the screenshot to search its columns)
+            - first_line: the index of the first scanline to search
+            - last_line: the index after the last scanline to search
+        Output:
+            - return: if the checker pattern is found, return a tuple of the cpcs cluster that contains the pattern and
+                the index at which the pattern begins within that cluster
+                if the checker pattern is not found, return None
+        """
+        for block_start in range(first_line, last_line, SCANLINE_BLOCK_SIZE):
+            block_end = min(block_start + SCANLINE_BLOCK_SIZE, last_line)
+            for cpcs_line in self._encode_scanlines(scanlines[block_start:block_end]):
+                # 'cpcs' stands for 'ConsecutivePixelColorSequence'
+                # Cluster the cpcs's by length
+                for cluster in self._cluster_cpcs(cpcs_line):
+                    checker_pattern_start_index = self._find_cpcs_checker_pattern(cluster.colors)
+                    if checker_pattern_start_index != -1:
+                        return cluster, checker_pattern_start_index
+        return None
+
+    def _identify_pieces(self):
+        """
+        This function identifies the chess piece on every square of the board. The image of every square is compared to
+        the reference image of every chess piece in a single batch (see PieceClassifier). If the squares are smaller
+        than the reference images, the squares are compared to reference images that are scaled down to their size.
+
+        Only squares whose fingerprint (a downsampled copy of the square's image) changed since the last frame are
+        classified. The other squares keep the piece they were identified as in the last frame.
 
         Pre-condition:
             - _get_board_coords() must have successfully located the board's coordinates
         Parameters:
-            - col: an integer (0-7) that represents the column of the piece to be identified
-            - row: an integer (0-7) that represents the row of the piece to be identified
+            - none
         Output:
-            - return: the ChessPiece object which represents the piece at the given location. Note that
-                an empty tile is a type of ChessPiece
-        """
-        # Crop to piece location
-        crop_x1 = self.scaled_col_coords[col-1]
-        crop_x2 = self.scaled_col_coords[col]
-        crop_y1 = self.scaled_row_coords[row-1]
-        crop_y2 = self.scaled_row_coords[row]
-
-        # Crop to square
-        crop_width = crop_x2 - crop_x1
-        crop_height = crop_y2 - crop_y1
-        if crop_width > crop_height:
-            crop_x1 += (crop_width - crop_height)
-        elif crop_height > crop_width:
-            crop_y1 += (crop_height - crop_width)
-
-        # Get cropped image from current frame
-        screen_piece_img = self.frame[crop_y1:crop_y2, crop_x1:crop_x2]
-
-        # Scale the cropped image to match reference image dimension
-        screen_piece_img = cv2.resize(screen_piece_img,
-                                      dsize=(REFERENCE_IMG_DIM, REFERENCE_IMG_DIM),
-                                      interpolation=cv2.INTER_CUBIC)
-
-        # Set color of piece's tile
-        if (col + row) % 2 == 0:
-            tile_color = 1 # white
+            - return: a BoardState which represents the piece on each square. Note that an empty tile is a type of
+                ChessPiece
+        """
+        square_tiles = self._get_square_tiles()
+        classifier = PIECE_CLASSIFIER.get_scaled_classifier(square_tiles.shape[2])
+
+        # Find the squares that changed since the last frame (the fingerprints are a copy, since the board's buffer is
+        # overwritten by the next frame)
+        fingerprints = square_tiles[:, :, ::FINGERPRINT_STRIDE, ::FINGERPRINT_STRIDE].reshape(64, -1)
+        board_coords = (self.scaled_col_coords, self.scaled_row_coords)
+        if self.square_pieces is None or board_coords != self.fingerprinted_coords:
+            is_dirty = np.ones(64, dtype=bool)
+            pieces = np.empty(64, dtype=np.int8)
         else:
-            tile_color = 0 # black
+            is_dirty = np.any(fingerprints != self.square_fingerprints, axis=1)
+            pieces = self.square_pieces.copy()
 
-        # Initialize variables for finding closest resemblance
-        min_img_difference = self._mse(screen_piece_img, CHESS_PIECES[0].img[tile_color])
-        piece = CHESS_PIECES[0]
+        # Classify the squares that changed
+        num_dirty_squares = np.count_nonzero(is_dirty)
+        if num_dirty_squares > 0:
+            square_imgs = square_tiles.reshape(64, classifier.square_size, classifier.square_size)
+            pieces[is_dirty] = classifier.classify(square_imgs[is_dirty], TILE_COLORS.ravel()[is_dirty])
 
-        # Loop through chess pieces
-        for reference_piece in CHESS_PIECES:
-            current_img_difference = self._mse(screen_piece_img, reference_piece.img[tile_color])
-            if current_img_difference < min_img_difference:
-                if not (reference_piece.name == 'empty' and current_img_difference > EMPTY_RECOGNITION_THRESHOLD):
-                    min_img_difference = current_img_difference
-                    piece = reference_piece
+        self.square_fingerprints = fingerprints
+        self.square_pieces = pieces
+        self.fingerprinted_coords = board_coords
+        self.num_squares_reclassified += num_dirty_squares
+        self.num_squares_skipped += 64 - num_dirty_squares
+        self.log.debug(f"Squares re-classified: {num_dirty_squares}, squares skipped: {64 - num_dirty_squares}")
 
-        return piece
+        return BoardState(pieces)
 
-    def _get_processed_screenshot(self):
+    def _get_square_tiles(self):
         """
-        This function takes a screenshot and optimizes it for image recognition 
-        (i.e. scale and reduce to monochromatic)
+        This function splits the board into the images of its 64 squares. The board is cropped out of the current
+        frame and scaled once, to 8 squares of the same size on each side, then split into squares without copying.
+
+        The squares are scaled to the size of the reference images (REFERENCE_IMG_DIM), unless TEMPLATE_PRESCALING is
+        on and the squares are smaller than that. Then, the squares keep their size (and are compared to reference
+        images that are scaled down instead), since scaling the board up would cost more.
 
-        Parameters: none
+        Pre-condition:
+            - _get_board_coords() must have successfully located the board's coordinates
+        Parameters:
+            - none
         Output:
-            - return: a two dimensional NumPy array that represents the scaled down screenshot
+            - return: a NumPy array with the shape (8, 8, square size, square size), where element [row, col] is the
+                image of the square in the given row and column. The array is a view of the scaled board, which is
+                overwritten by the next call
+        """
+        crop_x1, crop_x2 = self.scaled_col_coords[0], self.scaled_col_coords[-1]
+        crop_y1, crop_y2 = self.scaled_row_coords[0], self.scaled_row_coords[-1]
+        square_size = REFERENCE_IMG_DIM
+        if TEMPLATE_PRESCALING:
+            square_size = max(MIN_SQUARE_SIZE, min(square_size, round(min(crop_x2 - crop_x1, crop_y2 - crop_y1) / 8)))
+
+        # Scale the board into a buffer that is only reallocated when the square size changes
+        board_size = 8 * square_size
+        if self.board_img is None or self.board_img.shape != (board_size, board_size):
+            self.board_img = np.empty((board_size, board_size), dtype=np.uint8)
+        cv2.resize(self.frame[crop_y1:crop_y2, crop_x1:crop_x2], dsize=(board_size, board_size), dst=self.board_img,
+                   interpolation=cv2.INTER_CUBIC)
+
+        # Split the board into squares: (row, y, col, x) -> (row, col, y, x)
+        item_size = self.board_img.itemsize
+        return np.lib.stride_tricks.as_strided(
+            self.board_img, shape=(8, 8, square_size, square_size),
+            strides=(square_size * board_size * item_size, square_size * item_size, board_size * item_size, item_size),
+            writeable=False)
+
+    def _get_processed_screenshot(self, region):
+        """
+        This function takes a screenshot of a region of the screen and optimizes it for image recognition
+        (i.e. scale and reduce to monochromatic). The screenshot is scaled by the factor that scales the search region
+        down to a height of SCALED_HEIGHT pixels, so that a region within it (ex: the tracked board) is scaled the same
+        way as the search region. It also sets the frame's origin and scale, which are used for converting between frame
+        and screen coordinates.
+
+        Parameters:
+            - region: the rectangle of the screen to capture, as a tuple of (left, top, width, height)
+        Output:
+            - return: a two dimensional NumPy array that represents the screenshot
         """
         # Take screenshot
-        img = ImageGrab.grab()
+        left, top, width, height = region
+        img = self.frame_source.grab(region)
 
         # Process screenshot
-        img = img.resize((
-            round(SCALED_HEIGHT * self.screen_width / self.screen_height), SCALED_HEIGHT))
+        search_height = self._get_search_region()[3]
+        img = img.resize((round(SCALED_HEIGHT * width / search_height), round(SCALED_HEIGHT * height / search_height)))
+        self.frame_origin = (left, top)
+        self.frame_scale = height / img.size[1]
         img_np = np.array(img)
         processed_screenshot = cv2.cvtColor(img_np, cv2.COLOR_BGR2GRAY)
 
         return processed_screenshot
 
     @staticmethod
-    def _cluster_objects(object_array, value_array):
+    def _encode_scanlines(scanlines):
+        """
+        This function splits every scanline in a block of scanlines into consecutive pixel color sequences
+        (i.e., it run-length encodes the scanlines). The whole block is encoded at once.
+
+        Parameters:
+            - scanlines: a two dimensional NumPy array where each row is a scanline
+        Output:
+            - return: a list with one ConsecutivePixelColorSequences object per scanline
+        """
+        num_lines, line_length = scanlines.shape
+        if num_lines == 0:
+            return []
+
+        # A cpcs starts at the first pixel of every scanline and wherever a pixel differs from its predecessor
+        is_cpcs_start = np.ones(scanlines.shape, dtype=bool)
+        np.not_equal(scanlines[:, 1:], scanlines[:, :-1], out=is_cpcs_start[:, 1:])
+        line_indices, start_pixels = np.nonzero(is_cpcs_start)
+
+        # Every scanline begins a new cpcs, so the lengths can be computed across the flattened block
+        flat_start_pixels = line_indices * line_length + start_pixels
+        lengths = np.diff(flat_start_pixels, append=num_lines * line_length)
+        colors = scanlines[line_indices, start_pixels]
+
+        # Split the block back up into individual scanlines
+        line_bounds = np.searchsorted(line_indices, np.arange(1, num_lines))
+        return [ConsecutivePixelColorSequences(line_colors, line_start_pixels, line_lengths)
+                for line_colors, line_start_pixels, line_lengths
+                in zip(np.split(colors, line_bounds),
+                       np.split(start_pixels, line_bounds),
+                       np.split(lengths, line_bounds))]
+
+    @staticmethod
+    def _cluster_cpcs(cpcs):
         """
-        This function clusters an array of objects based on a linked array of values.
+        This function clusters consecutive pixel color sequences based on their lengths.
         Uses Kernel Density Estimation (KDE) clustering.
 
         Parameters:
-            - object_array: a list of objects to be clustered by their associated values
-            - value_array: the list of values to which each object is associated
+            - cpcs: a ConsecutivePixelColorSequences object to be clustered by length
         Output:
-            - return: a list of lists of objects, where each sub-list represents a cluster
-        """
-        # Compute KDE minima
-        a = np.array(value_array).reshape(-1, 1)
-        kde = KernelDensity(kernel='gaussian', bandwidth=1).fit(a)
-        s = np.linspace(0, round(SCALED_HEIGHT/8), round(SCALED_HEIGHT/8))
-        e = kde.score_samples(s.reshape(-1,1))
-        minima = argrelextrema(e, np.less)[0]
-        minima = np.append(minima, round(SCALED_HEIGHT/8) - 1)
-
-        # Generate array of 'minima' number of arrays
-        clusters = []
-        for _ in minima:
-            clusters.append([])
-
-        # Break up original array of objects into clusters
-        for object_index in range(0, len(object_array)):
-            for minimum_index in range(0, len(minima)):
-                if value_array[object_index] < minima[minimum_index]:
-                    clusters[minimum_index].append(object_array[object_index])
-                    break
+            - return: a list of ConsecutivePixelColorSequences objects, where each one represents a cluster
+        """
+        # Each cpcs belongs to the cluster of the first KDE minimum that is greater than its length
+        # (cpcs's that are longer than every minimum don't belong to any cluster)
+        cluster_indices, num_clusters = CPCS_LENGTH_CLUSTERER.cluster(cpcs.lengths)
+        clusters = [cpcs.subset(cluster_indices == cluster_index) for cluster_index in range(0, num_clusters)]
 
         # Remove the smallest cluster (cpcs's of length 1 or 2)
         if len(clusters) > 0:
@@ -343,55 +611,45 @@ class BoardRecognizer:
         return clusters
 
     @staticmethod
-    def _find_cpcs_checker_pattern(cpcs_array):
+    def _get_checker_pattern_start(cluster, checker_pattern_start_index):
         """
-        This function finds an alternating color pattern of length 8.
+        This function finds the pixel at which the checker pattern (i.e., the edge of the chessboard) begins.
+        The first cpcs of the pattern may be shorter than the first square, so it's centered within the square (but the
+        board can't begin before the frame does).
 
         Parameters:
-            - cpcs_array: an array of ConsecutivePixelColorSequences (cpcs)
+            - cluster: the ConsecutivePixelColorSequences object that contains the checker pattern
+            - checker_pattern_start_index: the index of the cpcs in the cluster at which the pattern begins
         Output:
-            - return: the index of the cpcs in the cpcs_array at which an alternating pattern of length 8 begins
-                return -1 if no pattern is found
+            - return: a float that represents the pixel at which the chessboard begins
         """
-        i = 0
-        pattern_start_index = 0
-        checker_pattern_is_found = False
-        while i < len(cpcs_array) and not checker_pattern_is_found:
-            if i == 0:
-                color_a = cpcs_array[i].color
-            elif i == 1:
-                color_b = color_a
-                color_a = cpcs_array[i].color
-                checker_pattern_counter = 2
-            else:
-                if cpcs_array[i].color == color_b and color_a != color_b:
-                    checker_pattern_counter += 1
-                    if checker_pattern_counter == 8:
-                        checker_pattern_is_found = True
-                else:
-                    checker_pattern_counter = 2
-                    pattern_start_index = i - 1
-                color_b = color_a
-                color_a = cpcs_array[i].color
-            i += 1
-
-        if not checker_pattern_is_found:
-            pattern_start_index = -1
-
-        return pattern_start_index
+        first_cpcs_start = int(cluster.start_pixels[checker_pattern_start_index])
+        actual_first_square_length = int(cluster.start_pixels[checker_pattern_start_index + 1]) - first_cpcs_start
+        pixel_offset = (actual_first_square_length - int(cluster.lengths[checker_pattern_start_index])) / 2
+        return max(0, first_cpcs_start - pixel_offset)
 
     @staticmethod
-    def _mse(image_a, image_b):
+    def _find_cpcs_checker_pattern(cpcs_colors):
         """
-        This function calculates the Mean Squared Error (mse) between two images. The mse is the sum of the squared
-        difference of between each pixel of the two images. The smaller the error, the more similar the images.
+        This function finds an alternating color pattern of length 8.
 
         Parameters:
-            - image_a: a NumPy array that represents one of the two images to be compared
-            - image_b: a NumPy array of the same dimension as image_a and represents the other image to be compared
+            - cpcs_colors: a NumPy array of the colors of a sequence of ConsecutivePixelColorSequences (cpcs)
         Output:
-            - return: a float that represents the mse between the two images
+            - return: the index of the cpcs in the array at which an alternating pattern of length 8 begins
+                return -1 if no pattern is found
         """
-        err = np.sum((image_a.astype("float") - image_b.astype("float")) ** 2)
-        err /= float(image_a.shape[0] * image_a.shape[1])
-        return err
+        if len(cpcs_colors) < 8:
+            return -1
+
+        # The cpcs at index i continues the pattern if it has the same color as the cpcs two before it,
+        # and if that color differs from the color of the cpcs in between
+        continues_pattern = (cpcs_colors[2:] == cpcs_colors[:-2]) & (cpcs_colors[1:-1] != cpcs_colors[:-2])
+
+        # A pattern of length 8 begins wherever the next 6 cpcs's all continue the pattern
+        pattern_lengths = np.convolve(continues_pattern, np.ones(6, dtype=int), mode='valid')
+        pattern_start_indices = np.flatnonzero(pattern_lengths == 6)
+        if len(pattern_start_indices) == 0:
+            return -1
+
+        return int(pattern_start_indices[0])
@@ -0,0 +1,115 @@
+"""
+This file defines the BoardState, a compact representation of the location of every piece on the board.
+"""
+import numpy as np
+
+from src import chess_piece
+
+# The character that represents each piece code when a BoardState is printed
+_PIECE_CODE_CHARS = np.array([' ' if name == 'empty' else '?' if name == 'unknown'
+                              else 'K' if name == 'king' else name[0]
+                              for name, color in chess_piece.PIECE_CODES])
+
+_INDEX_TYPES = (int, np.integer)
+# Whether each piece code is a piece of the given color, by color
+_IS_COLOR_CODE = {color: np.array([piece_color == color for name, piece_color in chess_piece.PIECE_CODES])
+                  for color in ('white', 'black')}
+ZOBRIST_SEED = 0 # the seed of the random Zobrist keys, so that a board's Zobrist hash is the same in every run
+# A random 64-bit key for every piece code on every square. A board's Zobrist hash is the XOR of its squares' keys
+_ZOBRIST_KEYS = np.random.default_rng(ZOBRIST_SEED).integers(2**64, size=(64, len(chess_piece.PIECE_CODES)),
+                                                             dtype=np.uint64)
+_SQUARES = np.arange(64)
+
+
+class BoardState:
+    """
+    The BoardState class stores the piece on every square of the board, as seen on the screen (i.e. row 0 is the top
+    of the board, and column 0 is its left side). Each square is stored as a piece code (see chess_piece.PIECE_CODES)
+    in an 8x8 int8 NumPy array, so a BoardState takes 64 bytes, is hashable, and is cheap to copy and compare.
+
+    Indexing a BoardState with (row, column) returns the (shared) ChessPiece of the square's piece code, so the rules
+    of the pieces work on a BoardState the same way they would on a matrix of ChessPiece objects.
+
+    A BoardState is immutable: its codes are read-only.
+    """
+
+    ''' CONSTRUCTOR '''
+    def __init__(self, codes):
+        """
+        Parameters:
+            - codes: 64 piece codes, as an 8x8 array (or anything that can be reshaped into one), by row then column
+        """
+        # The codes are stored once, as bytes (which are immutable and hashable), and viewed as a read-only array
+        self._code_bytes = np.asarray(codes, dtype=np.int8).reshape(8, 8).tobytes()
+        self.codes = np.frombuffer(self._code_bytes, dtype=np.int8).reshape(8, 8)
+        self._occupancy = None
+        self._zobrist_hash = None
+
+    @classmethod
+    def unknown(cls):
+        """
+        This function returns a BoardState where the piece on every square is unknown (ex: before the board is found).
+        """
+        return cls(np.full((8, 8), chess_piece.UNKNOWN_CODE))
+
+    ''' PUBLIC FUNCTIONS '''
+    def copy(self):
+        return BoardState(self.codes)
+
+    def get_occupancy(self):
+        """
+        This function returns the squares occupied by each color, as bitboards (see move_legality.py). The bitboards
+        are only computed once, since a BoardState is immutable.
+
+        Output:
+            - return: a dictionary with the bitboard of the white pieces and the bitboard of the black pieces, by color
+        """
+        if self._occupancy is None:
+            self._occupancy = {color: int.from_bytes(np.packbits(is_color_code[self.codes].ravel(),
+                                                                 bitorder='little').tobytes(), 'little')
+                               for color, is_color_code in _IS_COLOR_CODE.items()}
+        return self._occupancy
+
+    def get_zobrist_hash(self):
+        """
+        This function returns the board's Zobrist hash: a 64-bit hash of the piece on every square, which (unlike the
+        built-in hash) is the same in every run. The hash is only computed once, since a BoardState is immutable.
+
+        Output:
+            - return: the Zobrist hash, as an int
+        """
+        if self._zobrist_hash is None:
+            self._zobrist_hash = int(np.bitwise_xor.reduce(_ZOBRIST_KEYS[_SQUARES, self.codes.ravel()]))
+        return self._zobrist_hash
+
+    def __getitem__(self, position):
+        """
+        This function returns the ChessPiece on a square, given the square's (row, column). Any other NumPy index
+        (ex: a row) returns a NumPy array of the ChessPieces on the indexed squares.
+        """
+        if isinstance(position, tuple) and len(position) == 2 and all(isinstance(i, _INDEX_TYPES) for i in position):
+            row, col = position
+            if not (-8 <= row < 8 and -8 <= col < 8):
+                raise IndexError(f"Square {position} is not on the board")
+            return chess_piece.get_piece(self._code_bytes[(row % 8) * 8 + col % 8])
+        codes = self.codes[position]
+        if np.ndim(codes) == 0:
+            return chess_piece.get_piece(int(codes))
+        pieces = np.empty(codes.shape, dtype=object)
+        pieces.ravel()[:] = [chess_piece.get_piece(int(code)) for code in codes.ravel()]
+        return pieces
+
+    def __eq__(self, other):
+        return isinstance(other, BoardState) and self._code_bytes == other._code_bytes
+
+    def __hash__(self):
+        return hash(self._code_bytes)
+
+    def __str__(self):
+        """
+        The board as 8 rows of characters (ex: 'K' for a king, 'p' for a pawn, ' ' for an empty square).
+        """
+        return str(_PIECE_CODE_CHARS[self.codes])
+
+    def __repr__(self):
+        return f"BoardState({self.codes.tolist()})"
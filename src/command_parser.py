@@ -0,0 +1,203 @@
+"""
+This file defines the CommandParser, which the TextToCmdBuffer uses to extract commands from its words. The command
+formats of the command dictionary are compiled into a deterministic automaton, so that a command is found in a single
+pass over the words, with one dictionary lookup per word.
+"""
+import os
+import json
+import hashlib
+import logging
+import yaml
+
+from src.command import Command, MoveCommand
+
+CACHE_FILE = 'cache/command_parser.json' # the compiled command dictionary
+TO_WORD_TYPE = 'to'
+MISHEARD_TO = '2' # the word that is heard instead of "to" (see CommandParser)
+NO_MATCH = -1 # the state reached once no command format matches the words
+UNKNOWN_WORD_CLASS = -1 # the word class of every word that isn't a keyword
+
+
+class CommandParser:
+    """
+    The CommandParser extracts a command from the beginning of a list of words, like the command formats of the command
+    dictionary describe it: the longest prefix of the words that matches a command format is the command.
+
+    The command formats are compiled into a deterministic automaton over word classes. Two words are in the same
+    class if they're keywords of the same word types (ex: "e" and "f" are both letter_words). Each state of the
+    automaton is the position in the words and the command formats that still match the words so far. Each of its
+    transitions (by word class) has:
+        (a) the next state (NO_MATCH if no command format matches anymore)
+        (b) the word that replaces the current word, if any: "2" is replaced with "to" where a command format still
+            matching the words expects "to"
+        (c) the type of command ('move' or 'single') of the command formats that end on this word, if any
+
+    Loading and compiling the command dictionary takes about a hundred times longer than loading the compiled parser,
+    so the compiled parser is cached on disk, as JSON (see load()). The cache is invalidated whenever the command
+    dictionary or this file is modified.
+    """
+
+    ''' CONSTRUCTOR '''
+    def __init__(self, command_dictionary):
+        """
+        Parameters:
+            - command_dictionary: the loaded command dictionary, with its 'keywords' and 'command_formats'
+        """
+        self.keywords_dictionary = command_dictionary['keywords']
+        self.command_formats = list(command_dictionary['command_formats'].items()) # (name, components) tuples
+        self.word_classes = {} # the word class of every keyword
+        self.transitions = [] # the transitions of each state, by word class
+        self._compile()
+
+    @classmethod
+    def load(cls, dictionary_file, cache_file=CACHE_FILE):
+        """
+        This function loads the compiled parser of a command dictionary from the cache, or compiles it (and caches
+        it) if the cache is missing, or was compiled from another command dictionary or by another version of this
+        file (the contents of both are hashed).
+
+        Parameters:
+            - dictionary_file: the command dictionary's file
+            - cache_file: the file in which the compiled parser is cached, as JSON
+        Output:
+            - return: a CommandParser object
+        """
+        log = logging.getLogger(__name__)
+        with open(dictionary_file, 'rb') as cmd_dict_file:
+            dictionary_data = cmd_dict_file.read()
+        with open(__file__, 'rb') as parser_source_file:
+            source_hash = hashlib.sha256(parser_source_file.read()).hexdigest()
+        dictionary_hash = hashlib.sha256(dictionary_data).hexdigest()
+        try:
+            with open(cache_file, 'r') as parser_file:
+                cache = json.load(parser_file)
+            if (cache['dictionary_hash'], cache['source_hash']) == (dictionary_hash, source_hash):
+                return cls._from_compiled(cache['parser'])
+            log.debug(f"The cached command parser is outdated. Compiling {dictionary_file}")
+        except (OSError, ValueError, KeyError, TypeError, IndexError):
+            log.debug(f"No cached command parser. Compiling {dictionary_file}")
+
+        parser = cls(yaml.safe_load(dictionary_data))
+        cache = {'dictionary_hash': dictionary_hash, 'source_hash': source_hash, 'parser': parser._to_compiled()}
+        try:
+            # Write to a temporary file first, so that another process never reads a partly written cache
+            os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+            temp_file = f"{cache_file}.{os.getpid()}.tmp"
+            with open(temp_file, 'w') as parser_file:
+                json.dump(cache, parser_file)
+            os.replace(temp_file, cache_file)
+        except OSError:
+            log.warning(f"Unable to cache the command parser in {cache_file}", exc_info=True)
+        return parser
+
+    ''' PUBLIC FUNCTIONS '''
+    def parse(self, words):
+        """
+        This function extracts the command at the beginning of a list of words, in a single pass over the words. Like
+        the TextToCmdBuffer always did, every "2" that stands for "to" is replaced with "to" in the list of words.
+
+        Parameters:
+            - words: a list of words (which may be modified)
+        Output:
+            - return: a move command (ie. MoveCommand object), a normal command (ie. Command object), or None
+        """
+        state = 0
+        command_type = None
+        command_length = 0
+        for word_ndx, word in enumerate(words):
+            transition = self.transitions[state].get(self.word_classes.get(word, UNKNOWN_WORD_CLASS))
+            if transition is None:
+                break
+            state, replacement, end_type = transition
+            if replacement is not None:
+                words[word_ndx] = replacement
+            if end_type is not None:
+                command_type, command_length = end_type, word_ndx + 1
+            if state == NO_MATCH:
+                break
+
+        if command_type == 'move':
+            return MoveCommand(words[:command_length])
+        if command_type == 'single':
+            return Command(words[:command_length])
+        return None
+
+    ''' PRIVATE FUNCTIONS '''
+    def _to_compiled(self):
+        """
+        This function returns the compiled parser as plain data that can be saved as JSON (see _from_compiled()).
+        """
+        return {
+            'keywords': self.keywords_dictionary,
+            'command_formats': self.command_formats,
+            'word_classes': self.word_classes,
+            # JSON objects only have string keys, so each state's transitions are a list of (word class, transition)
+            'transitions': [[[word_class, *transition] for word_class, transition in transitions.items()]
+                            for transitions in self.transitions],
+        }
+
+    @classmethod
+    def _from_compiled(cls, compiled):
+        """
+        This function creates a CommandParser from the plain data of a compiled parser (see _to_compiled()), without
+        compiling it again.
+        """
+        parser = cls.__new__(cls)
+        parser.keywords_dictionary = compiled['keywords']
+        parser.command_formats = [(name, components) for name, components in compiled['command_formats']]
+        parser.word_classes = compiled['word_classes']
+        parser.transitions = [{word_class: (next_state, replacement, end_type)
+                               for word_class, next_state, replacement, end_type in transitions}
+                              for transitions in compiled['transitions']]
+        return parser
+
+    def _compile(self):
+        """
+        This function compiles the command formats into the automaton: starting from the state in which every command
+        format matches, the transitions of every reachable state are found by checking the command formats that still
+        match against a word of each word class, in order (like the TextToCmdBuffer did word by word).
+        """
+        keyword_sets = {word_type: frozenset(words) for word_type, words in self.keywords_dictionary.items()}
+        class_words = [] # a word of each word class
+        class_ndxs = {} # the index of each word class, by the word types that its words are keywords of
+        for word in sorted({word for words in keyword_sets.values() for word in words}):
+            word_types = (frozenset(word_type for word_type, words in keyword_sets.items() if word in words),
+                          word == MISHEARD_TO)
+            if word_types not in class_ndxs:
+                class_ndxs[word_types] = len(class_words)
+                class_words.append(word)
+            self.word_classes[word] = class_ndxs[word_types]
+
+        states = {(0, tuple(range(len(self.command_formats)))): 0}
+        pending_states = list(states)
+        while pending_states:
+            word_ndx, format_indices = pending_states.pop(0)
+            transitions = {}
+            for word_class, class_word in enumerate(class_words):
+                word = class_word
+                next_format_indices = []
+                end_type = None
+                for format_ndx in format_indices:
+                    name, components = self.command_formats[format_ndx]
+                    if word in keyword_sets[components[word_ndx]]:
+                        if word == MISHEARD_TO and components[word_ndx] == TO_WORD_TYPE:
+                            word = TO_WORD_TYPE
+                        if len(components) == word_ndx + 1:
+                            if name.find('move') != -1:
+                                end_type = 'move'
+                            elif name.find('single') != -1:
+                                end_type = 'single'
+                        else:
+                            next_format_indices.append(format_ndx)
+                if not next_format_indices and end_type is None and word == class_word:
+                    continue
+
+                next_state = NO_MATCH
+                if next_format_indices:
+                    next_key = (word_ndx + 1, tuple(next_format_indices))
+                    if next_key not in states:
+                        states[next_key] = len(states)
+                        pending_states.append(next_key)
+                    next_state = states[next_key]
+                transitions[word_class] = (next_state, word if word != class_word else None, end_type)
+            self.transitions.append(transitions)
@@ -0,0 +1,212 @@
+"""
+This file defines the frame sources (i.e. screen capture backends) that the BoardRecognizer can get its frames from:
+    (a) ImageGrabFrameSource: captures the screen with PIL's ImageGrab (the default)
+    (b) MssFrameSource: captures the screen with the mss library, which uses shared memory on X11
+    (c) ReplayFrameSource: replays recorded frames from an image, a directory of images, or a video file
+"""
+import abc
+import logging
+import os
+import threading
+import cv2
+from PIL import Image
+
+FRAME_SOURCE_NAMES = ['imagegrab', 'mss', 'replay']
+REPLAY_IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+
+def create_frame_source(name, replay_path=None):
+    """
+    This function creates a frame source from its name. If the mss library isn't installed, the screen is captured with
+    ImageGrab instead.
+
+    Parameters:
+        - name: one of the names in FRAME_SOURCE_NAMES
+        - replay_path: the image, directory of images, or video file to replay (only used by the 'replay' source)
+    Output:
+        - return: a FrameSource object
+    """
+    if name == 'imagegrab':
+        frame_source = ImageGrabFrameSource()
+    elif name == 'mss':
+        try:
+            frame_source = MssFrameSource()
+        except ImportError:
+            log = logging.getLogger(__name__)
+            log.error("Unable to import mss (pip install mss). Capturing the screen with imagegrab instead.",
+                      exc_info=True)
+            frame_source = ImageGrabFrameSource()
+    elif name == 'replay':
+        frame_source = ReplayFrameSource.from_path(replay_path)
+    else:
+        raise ValueError(f"Unknown frame source: {name}. Expected one of: {', '.join(FRAME_SOURCE_NAMES)}")
+    return frame_source
+
+
+class FrameSource(abc.ABC):
+    """
+    A FrameSource provides the frames (i.e. screenshots) in which the BoardRecognizer looks for the board.
+    Every frame source has:
+        (a) get_screen_size(): the size of the primary display
+        (b) get_monitors(): the rectangle of every monitor, as a list of (left, top, width, height) tuples
+        (c) next_frame(): called once before each board recognition. Live sources capture every region when it is
+            grabbed, so only sources of recorded frames need to do anything here
+        (d) grab(region): an RGB PIL Image of a rectangle of the current frame, given as (left, top, width, height)
+    """
+
+    @abc.abstractmethod
+    def get_screen_size(self):
+        pass
+
+    def get_monitors(self):
+        screen_width, screen_height = self.get_screen_size()
+        return [(0, 0, screen_width, screen_height)]
+
+    def next_frame(self):
+        pass
+
+    @abc.abstractmethod
+    def grab(self, region):
+        pass
+
+
+class ImageGrabFrameSource(FrameSource):
+    """
+    The ImageGrabFrameSource captures the screen with PIL's ImageGrab, and gets the screen's size from PyAutoGUI.
+    Only the primary display is listed as a monitor (use a search region to search the others).
+    """
+
+    ''' CONSTRUCTOR '''
+    def __init__(self):
+        # Imported here because PyAutoGUI can't be imported on a machine without a display
+        from PIL import ImageGrab
+        import pyautogui
+        self.image_grab = ImageGrab
+        self.pyautogui = pyautogui
+
+    ''' PUBLIC FUNCTIONS '''
+    def get_screen_size(self):
+        return tuple(self.pyautogui.size())
+
+    def grab(self, region):
+        left, top, width, height = region
+        return self.image_grab.grab(bbox=(left, top, left + width, top + height), all_screens=True)
+
+
+class MssFrameSource(FrameSource):
+    """
+    The MssFrameSource captures the screen with the mss library (pip install mss), which is faster than ImageGrab
+    (on X11, it uses the shared memory extension). It can also list every monitor. mss lists the monitors in the
+    operating system's order, so the primary display is the monitor at the origin of the screen coordinates (where
+    ImageGrab and PyAutoGUI put it).
+
+    An mss instance can only be used by the thread that created it, so each thread gets its own.
+    """
+
+    ''' CONSTRUCTOR '''
+    def __init__(self):
+        import mss
+        self.mss = mss
+        self.thread_data = threading.local()
+
+    ''' PUBLIC FUNCTIONS '''
+    def get_screen_size(self):
+        # The first monitor in the list is the combination of every monitor
+        monitors = self._get_screenshot_tool().monitors[1:]
+        primary_monitor = next((monitor for monitor in monitors if monitor['left'] == 0 and monitor['top'] == 0),
+                               monitors[0])
+        return primary_monitor['width'], primary_monitor['height']
+
+    def get_monitors(self):
+        # The first monitor in the list is the combination of every monitor
+        return [(monitor['left'], monitor['top'], monitor['width'], monitor['height'])
+                for monitor in self._get_screenshot_tool().monitors[1:]]
+
+    def grab(self, region):
+        left, top, width, height = region
+        screenshot = self._get_screenshot_tool().grab({'left': left, 'top': top, 'width': width, 'height': height})
+        return Image.frombytes('RGB', screenshot.size, screenshot.bgra, 'raw', 'BGRX')
+
+    ''' PRIVATE FUNCTIONS '''
+    def _get_screenshot_tool(self):
+        """
+        This function returns the current thread's mss instance.
+        """
+        if getattr(self.thread_data, 'screenshot_tool', None) is None:
+            self.thread_data.screenshot_tool = self.mss.mss()
+        return self.thread_data.screenshot_tool
+
+
+class ReplayFrameSource(FrameSource):
+    """
+    The ReplayFrameSource replays recorded frames instead of capturing the screen, which makes it possible to run
+    (and benchmark) the board recognition on a machine without a display. Each recorded frame is treated as a
+    screenshot of the primary display.
+    """
+
+    ''' CONSTRUCTOR '''
+    def __init__(self, frames, loop=True):
+        """
+        Parameters:
+            - frames: a list of frames (PIL Images or NumPy arrays), each of which is an RGB screenshot
+            - loop: if True, start over from the first frame after the last one. Otherwise, keep the last frame
+        """
+        if len(frames) == 0:
+            raise ValueError("A ReplayFrameSource needs at least one frame")
+        self.frames = [frame if isinstance(frame, Image.Image) else Image.fromarray(frame) for frame in frames]
+        self.frames = [frame.convert('RGB') if frame.mode != 'RGB' else frame for frame in self.frames]
+        self.loop = loop
+        self.frame_ndx = 0
+        self.num_frames_replayed = 0
+
+    @classmethod
+    def from_path(cls, path, loop=True):
+        """
+        This function creates a ReplayFrameSource from an image, a directory of images (replayed in alphabetical
+        order), or a video file.
+        """
+        if path is None:
+            raise ValueError("The replay frame source needs the path of the frames to replay")
+        if os.path.isdir(path):
+            frame_files = sorted(fname for fname in os.listdir(path) if fname.lower().endswith(REPLAY_IMAGE_EXTENSIONS))
+            frames = [Image.open(os.path.join(path, fname)) for fname in frame_files]
+        elif path.lower().endswith(REPLAY_IMAGE_EXTENSIONS):
+            frames = [Image.open(path)]
+        else:
+            frames = _read_video_frames(path)
+        for frame in frames:
+            frame.load()
+        return cls(frames, loop)
+
+    ''' PUBLIC FUNCTIONS '''
+    def get_screen_size(self):
+        return self.frames[self.frame_ndx].size
+
+    def next_frame(self):
+        if self.num_frames_replayed > 0:
+            if self.frame_ndx + 1 < len(self.frames):
+                self.frame_ndx += 1
+            elif self.loop:
+                self.frame_ndx = 0
+        self.num_frames_replayed += 1
+
+    def grab(self, region):
+        left, top, width, height = region
+        return self.frames[self.frame_ndx].crop((left, top, left + width, top + height))
+
+
+''' HELPER FUNCTIONS '''
+def _read_video_frames(path):
+    """
+    Read every frame of a video file into a list of RGB PIL Images.
+    """
+    video = cv2.VideoCapture(path)
+    if not video.isOpened():
+        raise ValueError(f"Unable to open {path} for replay")
+    frames = []
+    frame_is_read, frame = video.read()
+    while frame_is_read:
+        frames.append(Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)))
+        frame_is_read, frame = video.read()
+    video.release()
+    return frames
@@ -1,31 +1,45 @@
-import threading
 import sys
 import time
-import numpy as np
 import logging
 from PyQt5.QtCore import QThread, pyqtSignal
 import queue
 
-from src.speech_to_text import SpeechRecognizer
+from src.speech_to_text import SpeechRecognizer, PartialTranscript
+from src.audio_source import create_audio_source
 from src.text_to_command import TextToCmdBuffer
 from src.board_recognition import BoardRecognizer
+from src.frame_source import create_frame_source
+from src.transcriber import create_transcriber
 from src.board_manager import BoardManager
 from src.command import Command, MoveCommand
 from src import mouse_controller
-from src import chess_piece
+from src.board_state import BoardState
+from src.game_model import GameModel
+from src import app_config
+from src import recognition_scheduler
+from src import transcription_pool
 
 BOARD_CHECK_PAUSE_TIME = 1.5 # time (in seconds) to wait before rechecking for board
+BOARD_RECOGNITION_TIMEOUT = 2.0 # the longest time (in seconds) to wait for the board to be recognized after a move
+TRANSCRIPT_WAIT_TIME = 0.5 # the longest time (in seconds) to wait for a transcript before checking if it should stop
 
 class ControllerThread(QThread):
     """
     The ControllerThread class is the heart of Hands-Free Chess. The process is as follows:
-        1. Turn audio into text (using the SpeechRecognizer)
-        2. Turn text into commands (using the TextToCmdBuffer)
+        1. Turn audio into text (using the SpeechRecognizer), as a list of alternative transcripts
+        2. Turn each alternative into a command (using the TextToCmdBuffer)
         3. Identify the pieces on the board and their location on the screen (using the BoardRecognizer)
-        4. Determine if the command is legal given the state of the board (using the BoardManager)
+        4. Determine if the commands are legal given the state of the board (using the BoardManager), and pick the most
+           likely alternative that is a legal move
         6. If legal, move the piece (using the mouse_controller module)
 
     In order to decrease lag, the speech recognition and board recognition are executed on separate threads.
+    The board is recognized as soon as the user starts speaking and when a move is given, and is otherwise polled at an
+    adaptive rate (using the RecognitionScheduler).
+
+    The game is followed by a GameModel: every recognized board is compared to it, and the user's moves are applied to
+    it. Once the opponent's move is found, the board can't change until the user moves, so a move is checked against
+    the model's board without waiting for the board to be recognized again.
     """
     send_msg = pyqtSignal(str)
     ui_log = pyqtSignal(str)
@@ -34,7 +48,14 @@ class ControllerThread(QThread):
     help = pyqtSignal()
 
     ''' CONSTRUCTOR '''
-    def __init__(self, recipient):
+    def __init__(self, recipient, config=None, move_piece=None):
+        """
+        Parameters:
+            - recipient: the widget that receives the messages
+            - config: the app's settings (see app_config.load_app_config()). If None, they're loaded from the app
+                configuration file
+            - move_piece: the function that moves a piece on the screen (mouse_controller.move_piece() by default)
+        """
         QThread.__init__(self)
         self.controller_log = logging.getLogger(__name__)
         self.controller_log.debug("Setting up controller")
@@ -43,33 +64,40 @@ class ControllerThread(QThread):
         self.paused = False
         self.name = 'worker'
         self.receiver = recipient
+        self.config = config if config is not None else app_config.load_app_config()
+        self.move_piece = move_piece if move_piece is not None else mouse_controller.move_piece
+
+        self.board_coords = None
+        self.board_state = None
+        self.board_queue = queue.Queue(maxsize=5)
+        self.b_recog = self._create_board_recognizer()
+        self.b_recog_scheduler = self._create_recognition_scheduler()
 
         self.raw_text_queue = queue.Queue(maxsize=10)
         try:
-            self.cmd_recog = SpeechRecognizer(self.raw_text_queue)
+            self.cmd_recog = self._create_speech_recognizer()
         except OSError as e:
             self.controller_log.fatal("Microphone not found", exc_info=True)
             sys.exit(1)
+        except ImportError as e:
+            self.controller_log.fatal(f"Unable to load the speech recognition backend: {e}")
+            sys.exit(1)
         self.txt_to_cmd_buffer = TextToCmdBuffer()
-
-        self.board_coords = None
-        self.board_state = None
-        self.board_queue = queue.Queue(maxsize=5)
-        self.b_recog = BoardRecognizer()
-        self.stop_event = threading.Event()
-        self.b_recog_thread = threading.Thread(target=self.b_recog.endlessly_recognize_board,
-                                               args=(self.board_queue,0.2,self.stop_event))
+        self.early_text = None # the partial transcript of the current utterance whose command was already handled
 
         self.color = None
-        self.b_manager = BoardManager(np.full((8, 8), chess_piece.ChessPiece('unknown', 'unknown')))
+        self.b_manager = BoardManager(BoardState.unknown())
+        self.game_model = None
+        self.num_skipped_recognitions = 0
+        self.num_move_transcriptions = 0 # the transcriptions with a move in any alternative, on a recognized board
+        self.num_lower_ranked_picks = 0 # the transcriptions for which a less likely alternative was picked
 
     ''' PUBLIC '''
     def run(self):
         self.running = True
         try:
             # Start the board recognizer thread
-            self.stop_event.clear()
-            self.b_recog_thread.start()
+            self.b_recog_scheduler.start()
 
             # Start the background listener
             self.cmd_recog.listen_in_background()
@@ -80,13 +108,20 @@ class ControllerThread(QThread):
             # Handle commands as they arrive in the command queue
             while self.running or not self.raw_text_queue.empty():
                 if self.paused:
-                    self.stop_event.set()
+                    self.b_recog_scheduler.stop()
                     self.cmd_recog.stop_listening(wait_for_stop=False)
                     while self.paused:
                         time.sleep(0.1)
                     self.resume()
 
-                self._handle_command(self.raw_text_queue.get())
+                try:
+                    transcript = self.raw_text_queue.get(timeout=TRANSCRIPT_WAIT_TIME)
+                except queue.Empty:
+                    continue
+                if isinstance(transcript, PartialTranscript):
+                    self._handle_partial_transcript(transcript)
+                else:
+                    self._handle_final_transcript(transcript)
 
         except Exception as e:
             self.ui_log.emit(f"Error in thread: {str(e)}")
@@ -96,32 +131,102 @@ class ControllerThread(QThread):
 
     def resume(self):
         self.controller_log.debug("Resuming thread...")
-        self.stop_event.clear()
-        self.b_recog_thread = threading.Thread(target=self.b_recog.endlessly_recognize_board,
-                                               args=(self.board_queue,0.2,self.stop_event))
-        self.b_recog_thread.start()
+        self.b_recog_scheduler.start()
         self.cmd_recog.listen_in_background()
 
     def stop(self):
-        # TODO: fix no-exit bug
         self.ui_log.emit("Exiting thread...")
         self.cmd_recog.stop_listening(wait_for_stop=False)
-        self.stop_event.set()
+        self.b_recog_scheduler.stop()
         self.running = False
 
     ''' PRIVATE '''
-    def _handle_command(self, raw_text):
+    def _create_board_recognizer(self):
+        frame_source = create_frame_source(
+            app_config.get_setting(self.config, 'board_recognition', 'frame_source', 'imagegrab'),
+            app_config.get_setting(self.config, 'board_recognition', 'replay_path'))
+        search_region = app_config.get_setting(self.config, 'board_recognition', 'search_region')
+        monitor = app_config.get_setting(self.config, 'board_recognition', 'monitor')
+        if search_region is None and monitor is not None:
+            monitors = frame_source.get_monitors()
+            if 0 <= monitor < len(monitors):
+                search_region = monitors[monitor]
+            else:
+                self.controller_log.error(f"Monitor {monitor} not found. Searching the primary display instead.")
+        return BoardRecognizer(search_region=search_region, frame_source=frame_source)
+
+    def _create_speech_recognizer(self):
+        transcriber_name = app_config.get_setting(self.config, 'speech_recognition', 'transcriber', 'google')
+        streaming = app_config.get_setting(self.config, 'speech_recognition', 'streaming', False)
+        replay_path = app_config.get_setting(self.config, 'speech_recognition', 'replay_path')
+        transcriber = create_transcriber(transcriber_name, replay_path)
+        audio_source = create_audio_source(
+            app_config.get_setting(self.config, 'speech_recognition', 'audio_source', 'microphone'), replay_path,
+            sample_rate=transcriber.sample_rate if streaming else None,
+            replay_speed=app_config.get_setting(self.config, 'speech_recognition', 'replay_speed', 1.0))
+
+        # The board recognition starts as soon as audio is heard, while the audio is being transcribed
+        return SpeechRecognizer(self.raw_text_queue, on_audio=self.b_recog_scheduler.request_recognition,
+                                transcriber=transcriber, streaming=streaming,
+                                num_workers=app_config.get_setting(self.config, 'speech_recognition',
+                                                                   'transcription_workers',
+                                                                   transcription_pool.NUM_WORKERS),
+                                audio_source=audio_source)
+
+    def _create_recognition_scheduler(self):
+        return recognition_scheduler.RecognitionScheduler(
+            self.b_recog, self.board_queue,
+            min_poll_interval=app_config.get_setting(self.config, 'board_recognition', 'min_poll_interval',
+                                                     recognition_scheduler.MIN_POLL_INTERVAL),
+            max_poll_interval=app_config.get_setting(self.config, 'board_recognition', 'max_poll_interval',
+                                                     recognition_scheduler.MAX_POLL_INTERVAL),
+            max_backoff_interval=app_config.get_setting(self.config, 'board_recognition', 'max_backoff_interval',
+                                                        recognition_scheduler.MAX_BACKOFF_INTERVAL))
+
+    def _handle_partial_transcript(self, partial_transcript):
+        """
+        This function handles the command of a partial transcript (see SpeechRecognizer) while the user is still
+        speaking, if the command is complete (see TextToCmdBuffer.is_complete()), or if the transcript is stable and
+        ends with the command. Only one command is handled early per utterance.
+        """
+        if self.paused or self.color is None or self.early_text is not None:
+            return
+        parsed_texts = self.txt_to_cmd_buffer.parse_alternatives([partial_transcript.text])
+        if len(parsed_texts) == 0 or parsed_texts[0].command is None:
+            return
+        if self.txt_to_cmd_buffer.is_complete(parsed_texts[0]) or (partial_transcript.is_stable
+                                                                    and len(parsed_texts[0].remaining_words) == 0):
+            self.controller_log.info(f"Handling the command of the partial transcript \"{partial_transcript.text}\"")
+            self.early_text = partial_transcript.text
+            self._handle_command([partial_transcript.text])
+
+    def _handle_final_transcript(self, alternatives):
+        """
+        This function handles the alternative transcripts of a whole utterance. If a command of the utterance was
+        already handled (see _handle_partial_transcript()), only the words that follow it are handled.
+        """
+        if self.early_text is not None:
+            early_words = self.early_text.split()
+            self.early_text = None
+            alternatives = [' '.join(alternative.split()[len(early_words):]) for alternative in alternatives
+                            if alternative.split()[:len(early_words)] == early_words]
+            alternatives = [alternative for alternative in alternatives if alternative != '']
+            if len(alternatives) == 0:
+                return
+        self._handle_command(alternatives)
+
+    def _handle_command(self, alternatives):
         if not self.paused:
             if self.color is None:
-                self._set_piece_color(raw_text)
-            elif raw_text == SpeechRecognizer.NOT_RECOGNIZED:
+                self._set_piece_color(alternatives)
+            elif alternatives[0] == SpeechRecognizer.NOT_RECOGNIZED:
                 self.send_msg.emit("No speech detected")
             else:
-                buffer_state = self.txt_to_cmd_buffer.add_text(raw_text)
-                command = self.txt_to_cmd_buffer.get_command()
+                parsed_text = self._select_alternative(self.txt_to_cmd_buffer.parse_alternatives(alternatives))
+                self.txt_to_cmd_buffer.accept(parsed_text)
+                command = parsed_text.command
                 if isinstance(command, MoveCommand):
                     self.send_msg.emit(f"Your move: {command.text()}")
-                    self._update_chessboard()
                     if self.board_state is not None:
                         self._handle_move(command)
                 elif isinstance(command, Command):
@@ -134,21 +239,85 @@ class ControllerThread(QThread):
                     elif command.text() == 'help':
                         self.help.emit()
                 else:
-                    self.send_msg.emit(f"Your command: {' '.join(buffer_state)}...")
+                    self.send_msg.emit(f"Your command: {' '.join(parsed_text.buffer_state)}...")
+
+    def _select_alternative(self, parsed_texts):
+        """
+        This function picks the alternative transcript to act on: the most likely one, unless it isn't a command (or
+        is an illegal or ambiguous move) and a less likely one is a legal and unambiguous move. The board is recognized
+        if any alternative is a move, and all of the moves are checked against it at once.
+
+        Parameters:
+            - parsed_texts: the ParsedText of every alternative transcript, from the most to the least likely
+        Output:
+            - return: the chosen ParsedText
+        """
+        most_likely = parsed_texts[0]
+        moves = [parsed_text for parsed_text in parsed_texts if isinstance(parsed_text.command, MoveCommand)]
+        if len(moves) == 0 or isinstance(most_likely.command, Command):
+            return most_likely
+
+        self._update_chessboard()
+        if self.board_state is None:
+            return moves[0]
+        self.num_move_transcriptions += 1
+        statuses = self.b_manager.get_move_statuses([parsed_text.command for parsed_text in moves])
+        chosen = next((parsed_text for parsed_text, status in zip(moves, statuses)
+                       if status == BoardManager.LEGAL_MOVE), moves[0])
+        if chosen.rank > 0:
+            self.num_lower_ranked_picks += 1
+            self.controller_log.info(f"Picked alternative {chosen.rank + 1} of {len(parsed_texts)} "
+                                     f"(\"{chosen.raw_text}\" instead of \"{most_likely.raw_text}\"). Lower-ranked "
+                                     f"picks: {self.num_lower_ranked_picks} of {self.num_move_transcriptions} moves")
+        return chosen
 
     def _update_chessboard(self):
-        if self.board_queue.empty():
-            self.controller_log.warning("Chessboard data queue is empty")
-            self.send_msg.emit("Warning: Chessboard not detected. Please try again.")
-            self.board_coords = None
-            self.board_state = None
+        self._observe_boards()
+        if self.game_model is not None and self.game_model.is_users_turn and self.board_coords is not None:
+            # The opponent already moved, so the board can't change until the user moves
+            self.board_state = self.game_model.board_state
+            self.num_skipped_recognitions += 1
+            self.controller_log.debug(f"Using the game model's board. Skipped recognitions: "
+                                      f"{self.num_skipped_recognitions}, game model: {self.game_model.metrics}")
         else:
-            self.board_coords, self.board_state = self.board_queue.get()
-            self.b_manager.set_board_state(self.board_state)
+            # Recognize the board now, in case it changed since the last recognition
+            ticket = self.b_recog_scheduler.request_recognition()
+            if not self.b_recog_scheduler.wait_for_recognition(ticket, BOARD_RECOGNITION_TIMEOUT):
+                self.controller_log.warning("Timed out while waiting for the board to be recognized")
+            if not self._observe_boards():
+                self.controller_log.warning("Chessboard data queue is empty")
+                self.send_msg.emit("Warning: Chessboard not detected. Please try again.")
+                self.board_coords = None
+                self.board_state = None
+                return
+
+        self.b_manager.set_board_state(self.board_state)
+        self.b_manager.set_game_model(self.game_model)
 
-            # Log board state
-            formatted_board_state = _format_board_matrix(self.board_state)
-            self.controller_log.info(f"Board state:\n{formatted_board_state}")
+        # Log board state
+        self.controller_log.info(f"Board state:\n{self.board_state}")
+
+    def _observe_boards(self):
+        """
+        This function compares every board recognized since the last call (in order) to the game model, which is
+        started from the first board recognized once the user's color is known.
+
+        Output:
+            - return: True if any board was recognized, else False
+        """
+        is_recognized = False
+        while not self.board_queue.empty():
+            self.board_coords, self.board_state = self.board_queue.get()
+            is_recognized = True
+            if self.color is None:
+                continue
+            if self.game_model is None:
+                self.game_model = GameModel(self.board_state, self.color)
+            else:
+                self.game_model.observe(self.board_state)
+        if is_recognized and self.game_model is not None:
+            self.board_state = self.game_model.board_state
+        return is_recognized
 
     def _handle_move(self, move_command):
         # Get ambiguity and legality of move
@@ -174,10 +343,13 @@ class ControllerThread(QThread):
             self.controller_log.info(f"OK! Moving {move_command.text()}")
             initial_position = self.b_manager.get_initial_coordinates(move_command)
             final_position = self.b_manager.get_final_coordinates(move_command)
-            mouse_controller.move_piece(initial_position, final_position, self.board_coords)
+            self.move_piece(initial_position, final_position, self.board_coords)
+            if self.game_model is not None:
+                self.game_model.apply_user_move(initial_position, final_position)
 
-    def _set_piece_color(self, raw_text):
-        lower = raw_text.lower()
+    def _set_piece_color(self, alternatives):
+        colors = [alternative.lower() for alternative in alternatives if alternative.lower() in ('black', 'white')]
+        lower = colors[0] if len(colors) > 0 else alternatives[0].lower()
         if lower == 'black' or lower == 'white':
             self.color = lower
             self.send_msg.emit(f"Your color: {self.color}")
@@ -192,16 +364,3 @@ class ControllerThread(QThread):
         else:
             self.send_msg.emit(f"You said: {lower}. Please try again. Say \"white\" or \"black.\"")
 
-
-# Useful helper function for aesthetic debugging <3, delete later
-def _format_board_matrix(board_matrix):
-    formatted_matrix = board_matrix.copy()
-    for i in range(0, formatted_matrix.shape[0]):
-        for j in range(0, formatted_matrix.shape[1]):
-            if formatted_matrix[i, j].name == "king":
-                formatted_matrix[i, j] = "K"
-            elif formatted_matrix[i, j].name == "empty":
-                formatted_matrix[i, j] = " "
-            else:
-                formatted_matrix[i, j] = formatted_matrix[i, j].name[0]
-    return formatted_matrix
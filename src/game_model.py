@@ -0,0 +1,245 @@
+"""
+This file defines the GameModel, which follows the game from move to move, instead of relying on a single recognized
+board for everything.
+"""
+import logging
+import numpy as np
+
+from src import chess_piece
+from src.board_state import BoardState
+from src.move_legality import BACK_ROW, KING_START_COLS, OTHER_COLOR
+
+OPPONENT_BACK_ROW = 0 # the row on which the opponent's king and rooks start
+OPPONENT_PAWN_START_ROW = 1 # the row on which the opponent's pawns start
+OPPONENT_PAWN_PUSH_ROW = 3 # the row that the opponent's pawns reach when they move forward by two squares
+ROOK_START_COLS = (0, 7)
+PROMOTION_PIECE = 'queen' # the piece that the user's pawns are promoted to
+
+
+class GameModel:
+    """
+    The GameModel class keeps track of the game, starting from the first recognized board:
+        (a) the board: the user's moves are applied to it, and the opponent's moves are inferred from the difference
+            between the board and the next recognized board
+        (b) the castling rights of each side: a side can't castle with a rook once its king or that rook has moved
+        (c) the en passant square: the square the user's pawns can capture on en passant, right after the opponent
+            moved a pawn forward by two squares
+        (d) whose turn it is: once the opponent's move is found, the board can't change until the user moves, so it
+            doesn't need to be recognized again
+    Like everywhere else, positions are (column, row) as seen on the screen, with the user's pieces at the bottom.
+
+    Every recognized board is compared to the model (see observe()). A recognized board that is neither the model's
+    board nor the model's board after one move of the opponent is a mismatch (ex: a misrecognized board, or a move
+    made with the mouse). The model then restarts from the recognized board. Mismatches are counted and logged.
+    """
+
+    ''' CONSTRUCTOR '''
+    def __init__(self, board_state, user_color):
+        """
+        Parameters:
+            - board_state: the first recognized BoardState
+            - user_color: the user's color ('black' or 'white'), which is the color at the bottom of the board
+        """
+        self.log = logging.getLogger(__name__)
+        self.user_color = user_color
+        self.opponent_color = OTHER_COLOR[user_color]
+        self.board_state = board_state
+        self.is_users_turn = False # whose turn it is isn't known until the opponent's move is found
+        self.en_passant_pos = None
+        self.castling_rights = {self.user_color: self._find_castling_rights(self.user_color, board_state),
+                                self.opponent_color: self._find_castling_rights(self.opponent_color, board_state)}
+        self.metrics = {'matches': 0, 'opponent_moves': 0, 'mismatches': 0}
+
+    ''' PUBLIC FUNCTIONS '''
+    def observe(self, board_state):
+        """
+        This function compares a recognized board to the model, and updates the model.
+
+        Parameters:
+            - board_state: the recognized BoardState
+        Output:
+            - return: 'match' if the board is the model's board, 'opponent move' if it's the model's board after one
+                move of the opponent (which is applied to the model), or 'mismatch' (in which case the model restarts
+                from the recognized board)
+        """
+        if board_state == self.board_state:
+            self.metrics['matches'] += 1
+            return 'match'
+
+        if not self.is_users_turn and self._apply_opponent_move(board_state):
+            self.metrics['opponent_moves'] += 1
+            return 'opponent move'
+
+        self.metrics['mismatches'] += 1
+        num_changes = np.count_nonzero(board_state.codes != self.board_state.codes)
+        self.log.warning(f"The recognized board doesn't match the game model ({num_changes} squares differ). "
+                         f"Restarting the model from the recognized board. Metrics: {self.metrics}")
+        self.log.debug(f"Expected board:\n{self.board_state}\nRecognized board:\n{board_state}")
+        self._restart(board_state)
+        return 'mismatch'
+
+    def apply_user_move(self, current_pos, next_pos):
+        """
+        This function applies a move of the user to the model, which then predicts the board after the move.
+
+        Parameters:
+            - current_pos: the piece's current position in the form (column, row)
+            - next_pos: the piece's destination position in the form (column, row)
+        """
+        (col, row), (next_col, next_row) = current_pos, next_pos
+        codes = self.board_state.codes.copy()
+        name = chess_piece.PIECE_CODES[codes[row, col]][0]
+        if name == 'king':
+            self.castling_rights[self.user_color] = set()
+            if abs(next_col - col) == 2:
+                rook_col = 7 if next_col > col else 0
+                codes[row, (col + next_col) // 2] = codes[row, rook_col]
+                codes[row, rook_col] = chess_piece.EMPTY_CODE
+        elif name == 'pawn':
+            if next_col != col and codes[next_row, next_col] == chess_piece.EMPTY_CODE:
+                codes[next_row + 1, next_col] = chess_piece.EMPTY_CODE # en passant
+            if next_row == 0:
+                codes[row, col] = chess_piece.get_piece_code(PROMOTION_PIECE, self.user_color)
+        codes[next_row, next_col] = codes[row, col]
+        codes[row, col] = chess_piece.EMPTY_CODE
+
+        self.board_state = BoardState(codes)
+        self._update_castling_rights()
+        self.en_passant_pos = None
+        self.is_users_turn = False
+
+    def restrict_legal_moves(self, legal_moves):
+        """
+        This function removes the castling moves and en passant captures that the game's history doesn't allow from a
+        table of the user's legal moves on the model's board (see move_legality.get_legal_moves()).
+
+        Parameters:
+            - legal_moves: a table of the user's legal moves
+        Output:
+            - return: a new table of the user's legal moves
+        """
+        restricted_moves = {}
+        for (next_pos, name), sources in legal_moves.items():
+            if name == 'king':
+                sources = [current_pos for current_pos in sources if abs(next_pos[0] - current_pos[0]) != 2
+                           or (7 if next_pos[0] > current_pos[0] else 0) in self.castling_rights[self.user_color]]
+            elif name == 'pawn' and self.board_state[next_pos[1], next_pos[0]].name == 'empty':
+                sources = [current_pos for current_pos in sources
+                           if current_pos[0] == next_pos[0] or next_pos == self.en_passant_pos]
+            if sources:
+                restricted_moves[(next_pos, name)] = sources
+        return restricted_moves
+
+    def get_rules_key(self):
+        """
+        This function returns the parts of the model (besides the board) that change the user's legal moves, as a
+        hashable key.
+        """
+        return tuple(sorted(self.castling_rights[self.user_color])), self.en_passant_pos
+
+    ''' PRIVATE FUNCTIONS '''
+    def _apply_opponent_move(self, board_state):
+        """
+        This function determines if a recognized board is the model's board after one move of the opponent: a piece of
+        the opponent moved to an empty square or captured a piece of the user (including promotions, en passant
+        captures, and castling). If so, the move is applied to the model.
+
+        Output:
+            - return: True if the move was applied, else False
+        """
+        changed_positions = [(int(col), int(row))
+                             for row, col in np.argwhere(board_state.codes != self.board_state.codes)]
+        before = {pos: self.board_state[pos[1], pos[0]] for pos in changed_positions}
+        after = {pos: board_state[pos[1], pos[0]] for pos in changed_positions}
+        moved_from = [pos for pos in changed_positions
+                      if before[pos].color == self.opponent_color and after[pos].name == 'empty']
+        moved_to = [pos for pos in changed_positions
+                    if after[pos].color == self.opponent_color and before[pos].color in ('empty', self.user_color)]
+        captured = [pos for pos in changed_positions
+                    if before[pos].color == self.user_color and after[pos].name == 'empty']
+        if len(moved_from) + len(moved_to) + len(captured) != len(changed_positions):
+            return False
+
+        if len(moved_from) == 1 and len(moved_to) == 1 and len(captured) <= 1:
+            (col, row), (next_col, next_row) = moved_from[0], moved_to[0]
+            piece, next_piece = before[moved_from[0]], after[moved_to[0]]
+            if piece.name == 'pawn':
+                # An en passant capture takes the user's pawn beside the opponent's pawn, instead of on its destination
+                is_en_passant = captured == [(next_col, row)] and before[captured[0]].name == 'pawn'
+                is_capture = before[moved_to[0]].name != 'empty' or is_en_passant
+                is_double_push = (not is_capture and next_col == col and row == OPPONENT_PAWN_START_ROW
+                                  and next_row == OPPONENT_PAWN_PUSH_ROW)
+                if len(captured) == 1 and not is_en_passant:
+                    return False
+                if not is_double_push and (next_row != row + 1 or abs(next_col - col) != (1 if is_capture else 0)):
+                    return False
+                if next_piece.name != 'pawn' and next_row != BACK_ROW: # only a promotion changes the piece
+                    return False
+                return self._accept(board_state, (col, row + 1) if is_double_push else None)
+            if len(captured) == 0 and next_piece.name == piece.name:
+                return self._accept(board_state, None)
+        elif len(moved_from) == 2 and len(moved_to) == 2 and not captured:
+            if self._is_castling(before, after):
+                return self._accept(board_state, None)
+        return False
+
+    def _is_castling(self, before, after):
+        """
+        This function determines if the changed squares of a board (with the pieces before and after the change, by
+        position) are a castling of the opponent.
+        """
+        king_col = KING_START_COLS[self.user_color]
+        for rook_col in self.castling_rights[self.opponent_color]:
+            step = 1 if rook_col > king_col else -1
+            expected_before = {(king_col, OPPONENT_BACK_ROW): 'king', (rook_col, OPPONENT_BACK_ROW): 'rook',
+                               (king_col + 2 * step, OPPONENT_BACK_ROW): 'empty',
+                               (king_col + step, OPPONENT_BACK_ROW): 'empty'}
+            expected_after = {(king_col, OPPONENT_BACK_ROW): 'empty', (rook_col, OPPONENT_BACK_ROW): 'empty',
+                              (king_col + 2 * step, OPPONENT_BACK_ROW): 'king',
+                              (king_col + step, OPPONENT_BACK_ROW): 'rook'}
+            if ({pos: piece.name for pos, piece in before.items()} == expected_before
+                    and {pos: piece.name for pos, piece in after.items()} == expected_after):
+                return True
+        return False
+
+    def _accept(self, board_state, en_passant_pos):
+        """
+        This function accepts a board after the opponent's move as the model's board.
+        """
+        self.board_state = board_state
+        self._update_castling_rights()
+        self.en_passant_pos = en_passant_pos
+        self.is_users_turn = True
+        self.log.debug(f"Found the opponent's move (en passant square: {en_passant_pos})")
+        return True
+
+    def _restart(self, board_state):
+        """
+        This function restarts the model from a recognized board. The castling rights that were lost are kept lost.
+        """
+        self.board_state = board_state
+        self._update_castling_rights()
+        self.en_passant_pos = None
+        self.is_users_turn = False
+
+    def _update_castling_rights(self):
+        """
+        This function removes the castling rights of the kings and rooks that aren't on their starting squares.
+        """
+        for color in self.castling_rights:
+            self.castling_rights[color] &= self._find_castling_rights(color, self.board_state)
+
+    def _find_castling_rights(self, color, board_state):
+        """
+        This function finds the castling rights that a side could have, given the board: the columns of the rooks that
+        are on their starting squares, if the king is on its starting square.
+
+        Output:
+            - return: a set of the columns of the rooks that the side could castle with
+        """
+        row = BACK_ROW if color == self.user_color else OPPONENT_BACK_ROW
+        king = board_state[row, KING_START_COLS[self.user_color]]
+        if king.name != 'king' or king.color != color:
+            return set()
+        return {col for col in ROOK_START_COLS
+                if board_state[row, col].name == 'rook' and board_state[row, col].color == color}
@@ -0,0 +1,172 @@
+"""
+This file defines the KeywordMatcher, which the TextToCmdBuffer uses to recognize the keywords of the command dictionary
+in the words that the speech recognizer misheard (ex: "nite", "rock", "bishops"), so that the user doesn't have to repeat
+the whole command.
+"""
+import re
+
+MIN_WORD_LENGTH = 3 # shorter words (and keywords) are never matched, since too many words are close to them
+MAX_SHORT_WORD_DISTANCE = 1 # the largest edit distance of a match, for words of up to SHORT_WORD_LENGTH letters
+MAX_LONG_WORD_DISTANCE = 2 # the largest edit distance of a match, for longer words
+SHORT_WORD_LENGTH = 5
+MAX_CACHED_MATCHES = 10000 # the cache of matches is cleared when it grows past this size
+# Common words that sound like a keyword, but are much more likely to be meant as themselves
+COMMON_WORDS = frozenset(['not', 'nut', 'net', 'what', 'wet', 'wit', 'with', 'pin', 'pen'])
+# The spellings that sound alike, in the order in which they're simplified (see get_phonetic_key())
+PHONETIC_RULES = [(re.compile(pattern), sound) for pattern, sound in [
+    (r'[^a-z]', ''), (r'^[kg]n', 'n'), (r'^wr', 'r'), (r'^wh', 'w'), (r'gh', ''), (r'ph', 'f'), (r'ck', 'k'),
+    (r'th', '0'), (r'(sh|ch)', 'X'), (r'dg', 'j'), (r'g(?=[eiy])', 'j'), (r'c(?=[eiy])', 's'), (r'c', 'k'),
+    (r'q', 'kw'), (r'x(?!$)', 'ks'), (r'z', 's'), (r'w(?![aeiou])', ''), (r'(?<=.)[aeiouyh]', ''), (r'^[aeiouy]', 'a'),
+    (r'(.)\1+', r'\1')]]
+
+
+class KeywordMatcher:
+    """
+    The KeywordMatcher finds the keyword that a misheard word stands for, in two steps:
+        (a) the keyword that sounds like the word: the only keyword with the same phonetic key (see get_phonetic_key())
+        (b) otherwise, the keyword that is spelled like the word: the only keyword within the smallest edit distance of
+            the word (up to MAX_SHORT_WORD_DISTANCE or MAX_LONG_WORD_DISTANCE), found with a BK-tree. The keyword must
+            also sound almost like the word: their phonetic keys start with the same sound and are within an edit
+            distance of 1 (so "bishup" is matched to "bishop", but "took" isn't matched to "rook", nor "ring" to "king")
+    If no keyword or more than one keyword matches, the word isn't matched, so that a word is only replaced when the
+    keyword it stands for is clear. Short words and COMMON_WORDS are never matched. The matches are cached, since the
+    same words are misheard over and over.
+    """
+
+    ''' CONSTRUCTOR '''
+    def __init__(self, keywords):
+        """
+        Parameters:
+            - keywords: a list of the keywords to match words against
+        """
+        self.keywords = {keyword for keyword in keywords if len(keyword) >= MIN_WORD_LENGTH}
+        self.phonetic_index = {} # the keywords, by phonetic key
+        self.bk_tree = BKTree()
+        for keyword in sorted(self.keywords):
+            self.phonetic_index.setdefault(get_phonetic_key(keyword), []).append(keyword)
+            self.bk_tree.add(keyword)
+        self.matches = {}
+
+    ''' PUBLIC FUNCTIONS '''
+    def match(self, word):
+        """
+        This function finds the keyword that a word stands for.
+
+        Parameters:
+            - word: a lowercase word
+        Output:
+            - return: the matching keyword, or None if no keyword (or more than one keyword) matches
+        """
+        if word in self.matches:
+            return self.matches[word]
+        keyword = None
+        if len(word) >= MIN_WORD_LENGTH and word not in COMMON_WORDS:
+            if word in self.keywords:
+                keyword = word
+            else:
+                sound_alikes = self.phonetic_index.get(get_phonetic_key(word), [])
+                if len(sound_alikes) == 1:
+                    keyword = sound_alikes[0]
+                elif len(sound_alikes) == 0:
+                    max_distance = MAX_SHORT_WORD_DISTANCE if len(word) <= SHORT_WORD_LENGTH else MAX_LONG_WORD_DISTANCE
+                    keyword = self._find_closest_keyword(word, max_distance)
+        if len(self.matches) >= MAX_CACHED_MATCHES:
+            self.matches.clear()
+        self.matches[word] = keyword
+        return keyword
+
+    ''' PRIVATE FUNCTIONS '''
+    def _find_closest_keyword(self, word, max_distance):
+        """
+        This function finds the only keyword within the smallest edit distance of a word (None if there are several).
+        """
+        phonetic_key = get_phonetic_key(word)
+        neighbors = [(distance, keyword) for distance, keyword in self.bk_tree.search(word, max_distance)
+                     if _sounds_alike(phonetic_key, get_phonetic_key(keyword))]
+        if len(neighbors) == 0:
+            return None
+        min_distance = min(distance for distance, _ in neighbors)
+        closest_keywords = [keyword for distance, keyword in neighbors if distance == min_distance]
+        return closest_keywords[0] if len(closest_keywords) == 1 else None
+
+
+class BKTree:
+    """
+    A BK-tree (Burkhard-Keller tree) of words, in which the words within an edit distance of a word can be found without
+    comparing the word to every word of the tree. Every node is a word, and its children are stored by their edit
+    distance to it. Because the edit distance is a metric, only the children whose distance to the node is within
+    max_distance of the searched word's distance to the node can lead to a match.
+    """
+
+    ''' CONSTRUCTOR '''
+    def __init__(self):
+        self.root = None # a (word, children by distance) tuple
+
+    ''' PUBLIC FUNCTIONS '''
+    def add(self, word):
+        if self.root is None:
+            self.root = (word, {})
+            return
+        node_word, children = self.root
+        while True:
+            distance = get_edit_distance(word, node_word)
+            if distance == 0:
+                return
+            if distance not in children:
+                children[distance] = (word, {})
+                return
+            node_word, children = children[distance]
+
+    def search(self, word, max_distance):
+        """
+        This function finds the words of the tree within an edit distance of a word.
+
+        Output:
+            - return: a list of (distance, word) tuples
+        """
+        neighbors = []
+        nodes = [self.root] if self.root is not None else []
+        while nodes:
+            node_word, children = nodes.pop()
+            distance = get_edit_distance(word, node_word)
+            if distance <= max_distance:
+                neighbors.append((distance, node_word))
+            nodes.extend(child for child_distance, child in children.items()
+                         if distance - max_distance <= child_distance <= distance + max_distance)
+        return neighbors
+
+
+''' HELPER FUNCTIONS '''
+def get_phonetic_key(word):
+    """
+    This function returns a simplified phonetic key of a word (in the spirit of Metaphone), so that words that sound
+    alike have the same key (ex: "knight", "night", and "nite" ===> "nt"; "rook" and "rock" ===> "rk"). Silent letters
+    are removed, spellings of the same sound are merged ("X" stands for "sh" and "ch", and "0" for "th"), and the
+    vowels are removed (besides the first letter).
+    """
+    key = word.lower()
+    for pattern, sound in PHONETIC_RULES:
+        key = pattern.sub(sound, key)
+    return key
+
+
+def _sounds_alike(phonetic_key, other_phonetic_key):
+    """
+    Return True if two phonetic keys start with the same sound and are within an edit distance of 1.
+    """
+    return (phonetic_key[:1] == other_phonetic_key[:1]
+            and get_edit_distance(phonetic_key, other_phonetic_key) <= 1)
+
+
+def get_edit_distance(word, other_word):
+    """
+    This function returns the Levenshtein distance between two words: the smallest number of letters to insert,
+    delete, or replace to turn one word into the other.
+    """
+    previous_row = list(range(len(other_word) + 1))
+    for i, letter in enumerate(word, start=1):
+        row = [i]
+        for j, other_letter in enumerate(other_word, start=1):
+            row.append(min(previous_row[j] + 1, row[j - 1] + 1, previous_row[j - 1] + (letter != other_letter)))
+        previous_row = row
+    return previous_row[-1]
@@ -0,0 +1,101 @@
+"""
+This file defines the LengthClusterer, a one dimensional clusterer for the lengths of consecutive pixel color sequences.
+"""
+import numpy as np
+
+
+class LengthClusterer:
+    """
+    The LengthClusterer class clusters non-negative integer values (like the lengths of consecutive pixel color
+    sequences) using Kernel Density Estimation (KDE). The clusters are separated by the minima of the estimated density.
+
+    Instead of fitting a new KDE for every set of values, the LengthClusterer:
+        (a) builds a histogram of the values
+        (b) convolves the histogram with a Gaussian kernel that is computed once and cached
+        (c) assigns each value to a cluster with a binary search over the density minima
+    The convolution is done in log space (i.e. with a log-sum-exp) so that the density doesn't underflow to zero
+    between clusters that are far apart. As a result, the minima are the same as those of a Gaussian KernelDensity
+    evaluated over the same grid.
+    """
+
+    ''' CONSTRUCTOR '''
+    def __init__(self, max_value, bandwidth=1):
+        """
+        Parameters:
+            - max_value: the end of the grid over which the density is evaluated. The grid has 'max_value' evenly
+                spaced points from 0 to 'max_value' (inclusive), and the index of each density minimum on the grid
+                is used as the boundary between two clusters.
+            - bandwidth: the bandwidth (i.e. standard deviation) of the Gaussian kernel
+        """
+        self.max_value = max_value
+        self.bandwidth = bandwidth
+        self.grid = np.linspace(0, max_value, max_value)
+        self.log_kernel = np.empty((len(self.grid), 0))
+
+    ''' PUBLIC FUNCTIONS '''
+    def get_cluster_bounds(self, values):
+        """
+        This function finds the boundaries between the clusters of a set of values.
+
+        Parameters:
+            - values: a one dimensional NumPy array of non-negative integers
+        Output:
+            - return: a sorted NumPy array of boundaries, where the last boundary is 'max_value' - 1.
+                A value belongs to the cluster of the first boundary that is greater than it.
+        """
+        if len(values) == 0:
+            return np.array([self.max_value - 1])
+        log_density = self._estimate_log_density(values)
+
+        # Find the strict local minima of the density
+        is_minimum = (log_density[1:-1] < log_density[:-2]) & (log_density[1:-1] < log_density[2:])
+        minima = np.flatnonzero(is_minimum) + 1
+
+        return np.append(minima, self.max_value - 1)
+
+    def cluster(self, values):
+        """
+        This function assigns every value to a cluster.
+
+        Parameters:
+            - values: a one dimensional NumPy array of non-negative integers
+        Output:
+            - return: a tuple of
+                (a) a NumPy array with the cluster index of every value. Values that are greater than or equal to
+                    the last boundary get the index 'num_clusters' (i.e. they don't belong to any cluster)
+                (b) num_clusters, the number of clusters
+        """
+        cluster_bounds = self.get_cluster_bounds(values)
+        cluster_indices = np.searchsorted(cluster_bounds, values, side='right')
+        return cluster_indices, len(cluster_bounds)
+
+    ''' PRIVATE FUNCTIONS '''
+    def _estimate_log_density(self, values):
+        """
+        This function estimates the logarithm of the density of the values at every point on the grid. The log of the
+        normalization constant is omitted because it doesn't change the location of the minima.
+
+        Parameters:
+            - values: a one dimensional NumPy array of non-negative integers
+        Output:
+            - return: a NumPy array with the log density at every point on the grid
+        """
+        histogram = np.bincount(values)
+        occupied_bins = np.flatnonzero(histogram)
+        self._extend_log_kernel(len(histogram))
+
+        # Convolve the histogram with the kernel (in log space, using only the occupied bins)
+        log_terms = self.log_kernel[:, occupied_bins] + np.log(histogram[occupied_bins])
+        max_log_terms = log_terms.max(axis=1)
+        return max_log_terms + np.log(np.exp(log_terms - max_log_terms[:, np.newaxis]).sum(axis=1))
+
+    def _extend_log_kernel(self, num_bins):
+        """
+        This function makes sure the cached kernel covers at least 'num_bins' histogram bins. The kernel is a matrix
+        where element [i, j] is the log of the (unnormalized) Gaussian kernel between grid point i and value j.
+        """
+        cached_bins = self.log_kernel.shape[1]
+        if num_bins > cached_bins:
+            num_bins = max(num_bins, 2 * cached_bins)
+            offsets = (self.grid[:, np.newaxis] - np.arange(num_bins)) / self.bandwidth
+            self.log_kernel = -0.5 * offsets ** 2
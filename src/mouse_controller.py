@@ -1,4 +1,3 @@
-import pyautogui
 import logging
 
 def move_piece(start, end, board_coords):
@@ -25,6 +24,8 @@ def move_piece(start, end, board_coords):
     x_end = round((board_coords[0][end[0]] + board_coords[0][end[0]+1]) / 2)
     y_end = round((board_coords[1][end[1]] + board_coords[1][end[1]+1]) / 2)
 
+    # Imported here because PyAutoGUI can't be imported on a machine without a display
+    import pyautogui
     pyautogui.click(x_start, y_start)
     pyautogui.dragTo(x_end, y_end, button='left')
 
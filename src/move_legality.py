@@ -0,0 +1,262 @@
+"""
+This file defines the rules for moving each type of chess piece, using bitboards.
+
+A bitboard is a 64-bit integer with one bit per square of the board. Square (col, row) is bit row * 8 + col, where
+(like everywhere else) row 0 is the top of the board as seen on the screen, and the user's pieces start at the bottom
+(rows 6 and 7). The squares that each piece can move to are found with precomputed tables:
+    (a) KNIGHT_ATTACKS and KING_ATTACKS: the squares a knight or king attacks from every square
+    (b) RAYS: the squares in each of the 8 directions from every square, which are cut at the first piece in the way
+        to find the squares a rook, bishop, or queen can slide to
+    (c) USER_PAWN_ATTACKS and OPPONENT_PAWN_ATTACKS: the squares a pawn attacks from every square (the user's pawns
+        attack up the board, the opponent's pawns attack down the board)
+
+These rules don't consider the safety of the user's king: see attack_maps.py for that.
+"""
+
+# Directions as (row offset, column offset). The first 4 are orthogonal, the last 4 are diagonal.
+DIRECTIONS = [(-1, 0), (0, 1), (1, 0), (0, -1), (-1, -1), (-1, 1), (1, 1), (1, -1)]
+ORTHOGONAL_DIRECTIONS = [0, 1, 2, 3]
+DIAGONAL_DIRECTIONS = [4, 5, 6, 7]
+ALL_DIRECTIONS = ORTHOGONAL_DIRECTIONS + DIAGONAL_DIRECTIONS
+KNIGHT_OFFSETS = [(1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2)]
+BACK_ROW = 7 # the row on which the user's king and rooks start
+PAWN_START_ROW = 6 # the row on which the user's pawns start
+EN_PASSANT_ROW = 3 # the row on which the user's pawns can capture en passant
+# The column on which the user's king starts, by the user's color (the board is flipped for black)
+KING_START_COLS = {'white': 4, 'black': 3}
+OTHER_COLOR = {'white': 'black', 'black': 'white'}
+SLIDING_DIRECTIONS = {'rook': ORTHOGONAL_DIRECTIONS, 'bishop': DIAGONAL_DIRECTIONS, 'queen': ALL_DIRECTIONS}
+
+
+def _build_offset_table(offsets):
+    """
+    Build a table of the squares that are at any of the given (row, col) offsets from every square.
+    """
+    table = []
+    for square in range(64):
+        row, col = divmod(square, 8)
+        bitboard = 0
+        for row_offset, col_offset in offsets:
+            if 0 <= row + row_offset < 8 and 0 <= col + col_offset < 8:
+                bitboard |= 1 << ((row + row_offset) * 8 + col + col_offset)
+        table.append(bitboard)
+    return table
+
+
+def _build_rays():
+    """
+    Build a table of the squares in each direction from every square (not including the square itself).
+    """
+    rays = []
+    for row_offset, col_offset in DIRECTIONS:
+        direction_rays = []
+        for square in range(64):
+            row, col = divmod(square, 8)
+            bitboard = 0
+            row, col = row + row_offset, col + col_offset
+            while 0 <= row < 8 and 0 <= col < 8:
+                bitboard |= 1 << (row * 8 + col)
+                row, col = row + row_offset, col + col_offset
+            direction_rays.append(bitboard)
+        rays.append(direction_rays)
+    return rays
+
+
+KNIGHT_ATTACKS = _build_offset_table(KNIGHT_OFFSETS)
+KING_ATTACKS = _build_offset_table([DIRECTIONS[direction] for direction in ALL_DIRECTIONS])
+USER_PAWN_ATTACKS = _build_offset_table([(-1, -1), (-1, 1)])
+OPPONENT_PAWN_ATTACKS = _build_offset_table([(1, -1), (1, 1)])
+RAYS = _build_rays()
+# A direction is "positive" if the square indices increase along it, so the first piece in the way is the lowest bit
+IS_POSITIVE_DIRECTION = [row_offset > 0 or (row_offset == 0 and col_offset > 0)
+                         for row_offset, col_offset in DIRECTIONS]
+
+
+def can_be_moved(name, color, current_pos, next_pos, board_state):
+    """
+    This function determines if a piece can be moved from point A to point B given the current state of the board.
+    The piece must be one of the user's (i.e. start at the bottom of the board).
+
+    Parameters:
+        - name: the piece's name (like 'rook', 'pawn', 'king', etc.)
+        - color: the piece's color ('black' or 'white')
+        - current_pos: the piece's current position in the form (column, row)
+        - next_pos: the piece's destination position in the form (column, row)
+        - board_state: a BoardState
+    Output:
+        - return: if the piece can be moved from its current position to its next position, then return True,
+            else, return False
+    """
+    next_square = next_pos[1] * 8 + next_pos[0]
+    return bool(get_destinations(name, color, current_pos, board_state) >> next_square & 1)
+
+
+def get_destinations(name, color, current_pos, board_state):
+    """
+    This function finds every square that a piece can be moved to given the current state of the board.
+
+    Parameters:
+        - name: the piece's name (like 'rook', 'pawn', 'king', etc.)
+        - color: the piece's color ('black' or 'white')
+        - current_pos: the piece's current position in the form (column, row)
+        - board_state: a BoardState
+    Output:
+        - return: a bitboard of the squares the piece can be moved to (0 if it isn't a piece that can move)
+    """
+    if color not in OTHER_COLOR:
+        return 0
+    col, row = current_pos
+    square = row * 8 + col
+    occupancy = board_state.get_occupancy()
+    own_pieces = occupancy[color]
+    opponent_pieces = occupancy[OTHER_COLOR[color]]
+    occupied = own_pieces | opponent_pieces
+
+    if name in SLIDING_DIRECTIONS:
+        destinations = _get_sliding_attacks(square, occupied, SLIDING_DIRECTIONS[name])
+    elif name == 'knight':
+        destinations = KNIGHT_ATTACKS[square]
+    elif name == 'king':
+        destinations = KING_ATTACKS[square] | _get_castling_destinations(color, col, row, occupied, board_state)
+    elif name == 'pawn':
+        destinations = _get_pawn_destinations(color, col, row, occupied, opponent_pieces, board_state)
+    else:
+        destinations = 0
+    return destinations & ~own_pieces
+
+
+def get_attacks(name, is_user_piece, square, occupied):
+    """
+    This function finds every square that a piece attacks (i.e. could capture a piece on), including the squares of
+    its own side's pieces (which it defends).
+
+    Parameters:
+        - name: the piece's name (like 'rook', 'pawn', 'king', etc.)
+        - is_user_piece: True if the piece is one of the user's (i.e. its pawns attack up the board)
+        - square: the piece's square (row * 8 + column)
+        - occupied: a bitboard of the squares that block the rooks, bishops, and queens
+    Output:
+        - return: a bitboard of the squares the piece attacks (0 if it isn't a piece that can attack)
+    """
+    if name in SLIDING_DIRECTIONS:
+        return _get_sliding_attacks(square, occupied, SLIDING_DIRECTIONS[name])
+    elif name == 'knight':
+        return KNIGHT_ATTACKS[square]
+    elif name == 'king':
+        return KING_ATTACKS[square]
+    elif name == 'pawn':
+        return USER_PAWN_ATTACKS[square] if is_user_piece else OPPONENT_PAWN_ATTACKS[square]
+    return 0
+
+
+def get_legal_moves(board_state, color, attack_maps=None):
+    """
+    This function finds every legal move of the user's pieces given the current state of the board, as a table of the
+    squares that each type of piece can be moved from, by destination.
+
+    Parameters:
+        - board_state: a BoardState
+        - color: the user's color ('black' or 'white')
+        - attack_maps: the AttackMaps of the board state, to leave out the moves that leave the user's king in check.
+            If None, the king's safety isn't considered
+    Output:
+        - return: a dictionary of the list of positions (in the form (column, row)) from which a piece can be moved,
+            by (destination position, piece name). Destinations that no piece of a type can be moved to are left out
+    """
+    legal_moves = {}
+    if color not in OTHER_COLOR:
+        return legal_moves
+    own_pieces = board_state.get_occupancy()[color]
+    while own_pieces:
+        square = (own_pieces & -own_pieces).bit_length() - 1
+        own_pieces &= own_pieces - 1
+        current_pos = (square % 8, square // 8)
+        name = board_state[current_pos[1], current_pos[0]].name
+        destinations = get_destinations(name, color, current_pos, board_state)
+        if attack_maps is not None:
+            destinations = attack_maps.restrict_destinations(name, color, current_pos, destinations)
+        while destinations:
+            next_square = (destinations & -destinations).bit_length() - 1
+            destinations &= destinations - 1
+            legal_moves.setdefault(((next_square % 8, next_square // 8), name), []).append(current_pos)
+    return legal_moves
+
+
+def get_first_blocker(direction, blockers):
+    """
+    Find the square of the first piece in the way, given the (non-empty) bitboard of the pieces on a ray in the given
+    direction.
+    """
+    if IS_POSITIVE_DIRECTION[direction]:
+        return (blockers & -blockers).bit_length() - 1
+    return blockers.bit_length() - 1
+
+
+def get_squares_between(square, other_square):
+    """
+    Find the squares between two squares on the same row, column, or diagonal (0 if they aren't on the same line).
+    """
+    for direction in ALL_DIRECTIONS:
+        if RAYS[direction][square] >> other_square & 1:
+            return RAYS[direction][square] & ~RAYS[direction][other_square] & ~(1 << other_square)
+    return 0
+
+
+''' HELPER FUNCTIONS '''
+def _get_sliding_attacks(square, occupied, directions):
+    """
+    Find the squares that a piece sliding in the given directions attacks, up to (and including) the first piece in
+    the way in each direction.
+    """
+    attacks = 0
+    for direction in directions:
+        ray = RAYS[direction][square]
+        blockers = ray & occupied
+        if blockers:
+            ray ^= RAYS[direction][get_first_blocker(direction, blockers)]
+        attacks |= ray
+    return attacks
+
+
+def _get_pawn_destinations(color, col, row, occupied, opponent_pieces, board_state):
+    """
+    Find the squares that one of the user's pawns can move to: one square forward (i.e. up), two squares forward from
+    its starting row, or one square diagonally forward to capture (including en passant, which is assumed to be
+    possible whenever an opponent's pawn is beside the user's pawn on the en passant row).
+    """
+    if row == 0:
+        return 0
+    destinations = 0
+    forward = (row - 1) * 8 + col
+    if not occupied >> forward & 1:
+        destinations |= 1 << forward
+        if row == PAWN_START_ROW and not occupied >> (forward - 8) & 1:
+            destinations |= 1 << (forward - 8)
+    for capture_col in (col - 1, col + 1):
+        if 0 <= capture_col < 8:
+            capture = (row - 1) * 8 + capture_col
+            if opponent_pieces >> capture & 1:
+                destinations |= 1 << capture
+            elif row == EN_PASSANT_ROW:
+                captured_piece = board_state[EN_PASSANT_ROW, capture_col]
+                if captured_piece.name == 'pawn' and captured_piece.color == OTHER_COLOR[color]:
+                    destinations |= 1 << capture
+    return destinations
+
+
+def _get_castling_destinations(color, col, row, occupied, board_state):
+    """
+    Find the squares that the user's king can castle to: two squares towards either of its rooks, if the king and the
+    rook are on their starting squares and every square between them is empty. The castling rights (i.e. whether the
+    king or rook already moved) aren't known.
+    """
+    if row != BACK_ROW or col != KING_START_COLS[color]:
+        return 0
+    destinations = 0
+    for rook_col, direction in ((0, 3), (7, 1)):
+        rook = board_state[BACK_ROW, rook_col]
+        rook_square = BACK_ROW * 8 + rook_col
+        between = RAYS[direction][BACK_ROW * 8 + col] & ~RAYS[direction][rook_square] & ~(1 << rook_square)
+        if rook.name == 'rook' and rook.color == color and not between & occupied:
+            destinations |= 1 << (BACK_ROW * 8 + col + (2 if rook_col == 7 else -2))
+    return destinations
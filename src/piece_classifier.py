@@ -0,0 +1,96 @@
+"""
+This file defines the PieceClassifier, which identifies the chess piece on every square of the board at once.
+"""
+import numpy as np
+import cv2
+
+
+class PieceClassifier:
+    """
+    The PieceClassifier class compares images of the board's squares to the reference images of every chess piece.
+    Each square is identified as the piece whose reference image has the smallest Mean Squared Error (mse).
+
+    Rather than comparing one square to one reference image at a time, the reference images are stacked into a
+    single template tensor, and the mse between every square and every reference image is computed with one matrix
+    multiplication, using:
+        sum((a - b)^2) = sum(a^2) - 2 * (a . b) + sum(b^2)
+
+    When the squares on the screen are smaller than the reference images, it's cheaper to scale the reference images
+    down to the squares' size (once) than to scale every frame's squares up. get_scaled_classifier() returns a
+    PieceClassifier whose reference images are scaled to a given size.
+    """
+
+    ''' CONSTRUCTOR '''
+    def __init__(self, chess_pieces, empty_recognition_threshold, square_size=None):
+        """
+        Parameters:
+            - chess_pieces: a list of ChessPiece objects, each with a reference image for a black and a white tile
+            - empty_recognition_threshold: the largest mse at which a square can be identified as empty
+            - square_size: the width and height (in pixels) to scale the reference images to. If None, the reference
+                images are used at their original size
+        """
+        self.chess_pieces = np.empty(len(chess_pieces), dtype=object)
+        self.chess_pieces[:] = chess_pieces
+        self.empty_recognition_threshold = empty_recognition_threshold
+        self.piece_codes = np.array([piece.code for piece in chess_pieces], dtype=np.int8)
+        self.is_empty = np.array([piece.name == 'empty' for piece in chess_pieces])
+        self.scaled_classifiers = {}
+
+        # Template tensor with the shape (tile color * piece, pixel), where tile color is 0 (black) or 1 (white)
+        reference_imgs = [piece.img[tile_color] for tile_color in (0, 1) for piece in chess_pieces]
+        if square_size is not None:
+            reference_imgs = [cv2.resize(img, dsize=(square_size, square_size), interpolation=cv2.INTER_AREA)
+                              for img in reference_imgs]
+        self.square_size = reference_imgs[0].shape[0]
+        self.templates = np.stack([img.ravel() for img in reference_imgs]).astype(np.float64)
+        self.template_sq_norms = np.sum(self.templates ** 2, axis=1).reshape(2, len(chess_pieces))
+
+    ''' PUBLIC FUNCTIONS '''
+    def classify(self, square_imgs, tile_colors):
+        """
+        This function identifies the chess piece in each of a batch of square images.
+
+        Parameters:
+            - square_imgs: a NumPy array with the shape (number of squares, height, width), where the height and width
+                match the dimensions of the reference images (i.e. square_size)
+            - tile_colors: a NumPy array with the color of each square's tile (0 for black, 1 for white)
+        Output:
+            - return: a NumPy array of piece codes (see chess_piece.PIECE_CODES), one for each square. Note that an
+                empty tile is a type of ChessPiece
+        """
+        num_squares = len(square_imgs)
+        num_pixels = self.templates.shape[1]
+        squares = square_imgs.reshape(num_squares, num_pixels).astype(np.float64)
+
+        # Compare every square to every reference image, then keep the comparisons with the square's tile color
+        dot_products = (squares @ self.templates.T).reshape(num_squares, 2, len(self.chess_pieces))
+        dot_products = dot_products[np.arange(num_squares), tile_colors]
+
+        # Compute the mse between every square and every reference image on the square's tile color
+        sq_errors = (np.sum(squares ** 2, axis=1)[:, np.newaxis]
+                     - 2 * dot_products
+                     + self.template_sq_norms[tile_colors])
+        mse = sq_errors / num_pixels
+
+        # An empty tile can only be recognized if its mse is small enough
+        mse[:, self.is_empty] = np.where(mse[:, self.is_empty] > self.empty_recognition_threshold,
+                                         np.inf, mse[:, self.is_empty])
+
+        return self.piece_codes[np.argmin(mse, axis=1)]
+
+    def get_scaled_classifier(self, square_size):
+        """
+        This function returns a PieceClassifier that compares squares of a given size. The scaled classifiers are
+        cached, so the reference images are only scaled once per size.
+
+        Parameters:
+            - square_size: the width and height (in pixels) of the squares to classify
+        Output:
+            - return: a PieceClassifier (this one, if the reference images already have the given size)
+        """
+        if square_size == self.square_size:
+            return self
+        if square_size not in self.scaled_classifiers:
+            self.scaled_classifiers[square_size] = PieceClassifier(self.chess_pieces, self.empty_recognition_threshold,
+                                                                   square_size)
+        return self.scaled_classifiers[square_size]
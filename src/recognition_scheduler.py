@@ -0,0 +1,255 @@
+"""
+This file defines the RecognitionScheduler, which decides when the BoardRecognizer looks at the screen.
+"""
+import logging
+import threading
+import time
+import numpy as np
+
+MIN_POLL_INTERVAL = 0.2 # the time (in seconds) between two recognitions while the board is changing
+MAX_POLL_INTERVAL = 2.0 # the longest time (in seconds) between two recognitions while the board isn't changing
+MAX_BACKOFF_INTERVAL = 10.0 # the longest time (in seconds) between two recognitions while the board isn't found
+IDLE_GROWTH_FACTOR = 1.5 # the polling interval is multiplied by this factor every time the board hasn't changed
+METRICS_LOG_INTERVAL = 60.0 # the time (in seconds) between two logs of the scheduler's metrics
+
+# time.thread_time() is only available since Python 3.7
+_thread_time = getattr(time, 'thread_time', time.process_time)
+
+
+class RecognitionScheduler:
+    """
+    The RecognitionScheduler runs the BoardRecognizer on its own thread, but only when the board is needed:
+        (a) on demand: as soon as request_recognition() is called (ex: when the user starts speaking, or gives a move)
+        (b) otherwise, by polling the screen at an adaptive rate:
+            - while the board is changing, it's recognized every 'min_poll_interval' seconds
+            - while the board isn't changing, the polling interval grows by IDLE_GROWTH_FACTOR after every
+                recognition, up to 'max_poll_interval' seconds
+            - while the board isn't found, the polling interval doubles after every recognition, up to
+                'max_backoff_interval' seconds (i.e. exponential backoff)
+    An on-demand request that finds the board resets the polling interval, since the user is active.
+
+    To help tune the idle cost against the command latency, the scheduler keeps track of its duty cycle (the fraction
+    of the time spent recognizing the board), the CPU time used by its thread, and the latency of the on-demand
+    requests (see get_metrics()).
+    """
+
+    ''' CONSTRUCTOR '''
+    def __init__(self, board_recognizer, board_queue, min_poll_interval=MIN_POLL_INTERVAL,
+                 max_poll_interval=MAX_POLL_INTERVAL, max_backoff_interval=MAX_BACKOFF_INTERVAL):
+        """
+        Parameters:
+            - board_recognizer: the BoardRecognizer to run
+            - board_queue: the queue in which the BoardRecognizer stores the board's coordinates and state
+            - min_poll_interval: the time (in seconds) between two recognitions while the board is changing
+            - max_poll_interval: the longest time (in seconds) between two recognitions while the board isn't changing
+            - max_backoff_interval: the longest time (in seconds) between two recognitions while the board isn't found
+        """
+        self.log = logging.getLogger(__name__)
+        self.board_recognizer = board_recognizer
+        self.board_queue = board_queue
+        self.min_poll_interval = min_poll_interval
+        self.max_poll_interval = max(max_poll_interval, min_poll_interval)
+        self.max_backoff_interval = max(max_backoff_interval, min_poll_interval)
+
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.request_event = threading.Event()
+        self.condition = threading.Condition()
+
+        # Every on-demand request gets a ticket. A request is served once a recognition that started after it is done.
+        self.num_requests = 0
+        self.num_requests_served = 0
+        self.request_times = {} # the time at which each pending request (by ticket) was made
+
+        self.poll_interval = min_poll_interval
+        self.num_consecutive_failures = 0
+        self.last_board = None
+
+        self._reset_metrics()
+
+    ''' PUBLIC FUNCTIONS '''
+    def start(self):
+        """
+        This function starts recognizing the board on a new thread. If the scheduler was stopped, the function waits
+        for the previous thread to finish first, so that only one thread ever uses the BoardRecognizer.
+        """
+        if self.thread is not None and self.thread.is_alive():
+            self.thread.join()
+        self.stop_event.clear()
+        self.poll_interval = self.min_poll_interval
+        self.thread = threading.Thread(target=self._run, name='board_recognition', daemon=True)
+        self.thread.start()
+
+    def stop(self, wait_for_stop=False):
+        """
+        This function tells the scheduler's thread to stop (after the current recognition, if any).
+
+        Parameters:
+            - wait_for_stop: if True, wait until the thread is done
+        """
+        self.stop_event.set()
+        self.request_event.set() # wake the thread up
+        if wait_for_stop and self.thread is not None:
+            self.thread.join()
+
+    def request_recognition(self):
+        """
+        This function asks for the board to be recognized as soon as possible, without waiting for the recognition.
+
+        Output:
+            - return: the request's ticket, which can be given to wait_for_recognition()
+        """
+        with self.condition:
+            self.num_requests += 1
+            ticket = self.num_requests
+            self.request_times[ticket] = time.perf_counter()
+        self.request_event.set()
+        return ticket
+
+    def wait_for_recognition(self, ticket, timeout=None):
+        """
+        This function waits until a recognition that started after a request is done.
+
+        Parameters:
+            - ticket: the request's ticket (see request_recognition())
+            - timeout: the longest time (in seconds) to wait. If None, wait for as long as it takes
+        Output:
+            - return: True if the request was served, False if the timeout expired first
+        """
+        with self.condition:
+            return self.condition.wait_for(lambda: self.num_requests_served >= ticket, timeout)
+
+    def get_metrics(self):
+        """
+        This function returns the scheduler's metrics since the last reset (i.e. since the last log of the metrics).
+
+        Output:
+            - return: a dictionary with:
+                - elapsed_time: the wall time (in seconds) since the last reset
+                - busy_time: the wall time (in seconds) spent recognizing the board
+                - duty_cycle: the fraction of the elapsed time spent recognizing the board
+                - cpu_time: the CPU time (in seconds) used by the scheduler's thread
+                - num_polls, num_on_demand: the number of recognitions that were polled, and that were on demand
+                - num_failures: the number of recognitions in which the board wasn't found
+                - request_latencies: the time (in seconds) between each served request and the end of its recognition
+                - poll_interval: the current polling interval (in seconds)
+        """
+        elapsed_time = time.perf_counter() - self.metrics_start_time
+        return {
+            'elapsed_time': elapsed_time,
+            'busy_time': self.busy_time,
+            'duty_cycle': self.busy_time / elapsed_time if elapsed_time > 0 else 0.0,
+            'cpu_time': self.cpu_time,
+            'num_polls': self.num_polls,
+            'num_on_demand': self.num_on_demand,
+            'num_failures': self.num_failures,
+            'request_latencies': list(self.request_latencies),
+            'poll_interval': self.poll_interval,
+        }
+
+    ''' PRIVATE FUNCTIONS '''
+    def _run(self):
+        """
+        This function recognizes the board (on demand, or when the polling interval is over) until the scheduler is
+        stopped.
+        """
+        self.log.debug("Beginning scheduled board recognition...")
+        thread_start_cpu_time = _thread_time()
+        while not self.stop_event.is_set():
+            is_on_demand = self.request_event.wait(self.poll_interval)
+            if self.stop_event.is_set():
+                break
+            self.request_event.clear()
+            with self.condition:
+                served_requests = self.num_requests
+
+            # Only the time spent recognizing is counted as busy, but all of the thread's CPU time is counted
+            start_time = time.perf_counter()
+            board = self.board_recognizer.recognize_board(self.board_queue)
+            end_time = time.perf_counter()
+            self.busy_time += end_time - start_time
+            self.cpu_time += _thread_time() - thread_start_cpu_time
+            thread_start_cpu_time = _thread_time()
+
+            self._serve_requests(served_requests, end_time)
+            self._update_poll_interval(board, is_on_demand)
+            if is_on_demand:
+                self.num_on_demand += 1
+            else:
+                self.num_polls += 1
+
+            if end_time - self.metrics_start_time >= METRICS_LOG_INTERVAL:
+                self._log_metrics()
+        self._log_metrics()
+        self.log.debug("Scheduled board recognition stopped")
+
+    def _serve_requests(self, served_requests, end_time):
+        """
+        This function marks every request made before the recognition started as served, and wakes up whoever is
+        waiting for them.
+        """
+        with self.condition:
+            for ticket in range(self.num_requests_served + 1, served_requests + 1):
+                self.request_latencies.append(end_time - self.request_times.pop(ticket))
+            self.num_requests_served = max(self.num_requests_served, served_requests)
+            self.condition.notify_all()
+
+    def _update_poll_interval(self, board, is_on_demand):
+        """
+        This function adapts the polling interval to the result of the last recognition.
+
+        Parameters:
+            - board: the board's coordinates and state, as returned by BoardRecognizer.recognize_board(), or None if
+                the board wasn't found
+            - is_on_demand: True if the recognition was requested
+        """
+        if board is None:
+            self.num_failures += 1
+            self.num_consecutive_failures += 1
+            self.poll_interval = min(self.min_poll_interval * 2 ** self.num_consecutive_failures,
+                                     self.max_backoff_interval)
+            if self.num_consecutive_failures == 1:
+                self.log.debug("Board not found. Backing off...")
+        else:
+            self.num_consecutive_failures = 0
+            if is_on_demand or _board_has_changed(self.last_board, board):
+                self.poll_interval = self.min_poll_interval
+            else:
+                self.poll_interval = min(self.poll_interval * IDLE_GROWTH_FACTOR, self.max_poll_interval)
+        self.last_board = board
+
+    def _log_metrics(self):
+        """
+        This function logs the scheduler's metrics, then resets them.
+        """
+        metrics = self.get_metrics()
+        latencies_ms = 1000 * np.array(metrics['request_latencies'])
+        latency_summary = (f"mean {np.mean(latencies_ms):.1f} ms, max {np.max(latencies_ms):.1f} ms"
+                           if len(latencies_ms) > 0 else "none")
+        self.log.info(f"Board recognition over the last {metrics['elapsed_time']:.1f} s: "
+                      f"duty cycle {100 * metrics['duty_cycle']:.1f}%, CPU time {metrics['cpu_time']:.2f} s, "
+                      f"{metrics['num_polls']} polls, {metrics['num_on_demand']} on demand, "
+                      f"{metrics['num_failures']} failures, request latency {latency_summary}, "
+                      f"poll interval {metrics['poll_interval']:.2f} s")
+        self._reset_metrics()
+
+    def _reset_metrics(self):
+        self.metrics_start_time = time.perf_counter()
+        self.busy_time = 0.0
+        self.cpu_time = 0.0
+        self.num_polls = 0
+        self.num_on_demand = 0
+        self.num_failures = 0
+        self.request_latencies = []
+
+
+''' HELPER FUNCTIONS '''
+def _board_has_changed(last_board, board):
+    """
+    Return True if the board's coordinates or state are different from the last recognition's.
+    """
+    if last_board is None:
+        return True
+    last_coords, last_state = last_board
+    coords, state = board
+    return not (np.array_equal(last_coords, coords) and last_state == state)
@@ -1,14 +1,33 @@
 import speech_recognition as sr
+import audioop
 import logging
+import math
+import threading
+
+from src.transcriber import GoogleTranscriber
+from src.transcription_pool import TranscriptionPool, NUM_WORKERS
 
 PAUSE_THRESHOLD = 0.5 # TODO: experiment with this value
 NOISE_SAMPLE_DURATION = 1.0 # the sample duration for estimating the ambient noise
+STABLE_PARTIAL_DURATION = 0.25 # how long (in seconds) a partial transcript must stay the same to be stable
 
 
 class SpeechRecognizer:
     """
-    The SpeechRecognizer class listens to the user's microphone and uses the Google speech recognition API to
-    transcribe every word spoken by the user.
+    The SpeechRecognizer class listens to the user's microphone (or another audio source, see audio_source.py) and uses
+    a Transcriber (the Google speech recognition API by default, see transcriber.py) to transcribe every word spoken by
+    the user.
+
+    Every chunk of audio is transcribed into a list of alternative transcripts (the N best hypotheses), from the most
+    to the least likely, so that a misheard move can be replaced by a less likely, but legal, one.
+
+    By default, a chunk of audio is only transcribed after PAUSE_THRESHOLD seconds of silence. The chunks are
+    transcribed by a TranscriptionPool, so that the next chunk can be transcribed while a slow one still is (if the
+    transcriber is thread-safe), and their transcripts are put in the queue in the order in which they were heard. If
+    the transcriber supports streaming, the SpeechRecognizer can instead stream the audio to it as it's heard, and put a
+    PartialTranscript in the queue whenever the transcript of the utterance so far changes (and once more when it has
+    stayed the same for STABLE_PARTIAL_DURATION seconds). The alternative transcripts of the whole utterance are still
+    put in the queue after the silence, like without streaming.
     """
 
     # TODO: use an actual exception
@@ -17,14 +36,41 @@ class SpeechRecognizer:
     NOT_RECOGNIZED = "-1"
 
     ''' CONSTRUCTOR '''
-    def __init__(self, raw_text_queue):
+    def __init__(self, raw_text_queue, on_audio=None, transcriber=None, streaming=False, num_workers=NUM_WORKERS,
+                 audio_source=None):
+        """
+        Parameters:
+            - raw_text_queue: the queue in which to put the transcribed text, as lists of alternative transcripts
+            - on_audio: an optional function (without arguments) to call as soon as a chunk of audio is heard, before
+                it's transcribed (ex: to start recognizing the board while the audio is being transcribed)
+            - transcriber: the Transcriber that turns audio into text (a GoogleTranscriber by default)
+            - streaming: if True (and the transcriber supports it), stream the audio to the transcriber as it's heard,
+                and put partial transcripts in the queue
+            - num_workers: the number of chunks of audio that can be transcribed at the same time (only 1 if the
+                transcriber isn't thread-safe)
+            - audio_source: the AudioSource to listen to (the microphone by default). To stream, its sample rate must
+                be the transcriber's
+        """
         self.log = logging.getLogger(__name__)
+        self.transcriber = transcriber if transcriber is not None else GoogleTranscriber()
+        self.streaming = streaming and self.transcriber.supports_streaming
+        if streaming and not self.streaming:
+            self.log.warning(f"The {self.transcriber.name} transcriber can't stream. Transcribing after every pause.")
 
         self.recognizer = sr.Recognizer()
         self.recognizer.pause_threshold = PAUSE_THRESHOLD
-        self.mic = sr.Microphone()
+        if audio_source is not None:
+            self.mic = audio_source
+        else:
+            self.mic = sr.Microphone(sample_rate=self.transcriber.sample_rate if self.streaming else None)
 
         self.raw_text_queue = raw_text_queue
+        self.on_audio = on_audio
+        if num_workers > 1 and not self.transcriber.is_thread_safe:
+            self.log.info(f"The {self.transcriber.name} transcriber isn't thread-safe. Transcribing one chunk of audio "
+                          f"at a time.")
+            num_workers = 1
+        self.transcription_pool = TranscriptionPool(self._transcribe, self.raw_text_queue, num_workers)
         self.stop_listening = None # call this function to clean up the speech recognizer
 
         # Adjust the microphone for ambient noise
@@ -40,29 +86,132 @@ class SpeechRecognizer:
         louder than a certain threshold.
         Runs on a separate thread. Listens infinitely, until stop_listening() is called.
         """
-        self.stop_listening = self.recognizer.listen_in_background(self.mic, self._recognize_audio)
+        if self.streaming:
+            self.stop_listening = self._stream_in_background()
+        else:
+            self.transcription_pool.start()
+            self.stop_listening = self.recognizer.listen_in_background(self.mic, self._recognize_audio)
         self.log.info("Listening in background...")
 
     ''' PRIVATE '''
     def _recognize_audio(self, recognizer, audio):
         """
-        This function attempts to transcribe a chunk of audio. The function is called whenever
-        listen_in_background() detects noise.
+        This function hands a chunk of audio off to the transcription pool, without waiting for it to be
+        transcribed (see _transcribe()). The function is called whenever listen_in_background() detects noise.
+
+        Parameters:
+            - recognizer: the Recognizer() object from the SpeechRecognition library (imported as sr) that heard the
+                audio (the audio is transcribed by the transcriber)
+            - audio: an AudioData instance that represents the chunk of audio to be transcribed
+        """
+        if self.on_audio is not None:
+            self.on_audio()
+        self.transcription_pool.submit(audio)
+
+    def _transcribe(self, audio):
+        """
+        This function attempts to transcribe a chunk of audio, on one of the transcription pool's threads.
 
         Parameters:
-            - recognizer: a Recognizer() object from the SpeechRecognition library (imported as sr), transcribe
-                the audio.
             - audio: an AudioData instance that represents the chunk of audio to be transcribed
         Output:
-            - return: none
-            - queue: the transcribed text is put in a queue to be processed by another thread
+            - return: the alternative transcripts (most likely first) as a list, which the transcription pool puts in
+                the queue (in order), to be processed by another thread. If the audio isn't recognized, the list only
+                has NOT_RECOGNIZED. If the transcriber fails, None (nothing is put in the queue)
         """
         try:
-            raw_text = recognizer.recognize_google(audio)
-            self.raw_text_queue.put(raw_text)
-            self.log.info(f"Put \"{raw_text}\" into the raw text queue")
+            alternatives = self.transcriber.transcribe(audio)
+            self.log.info(f"Putting {alternatives} into the raw text queue")
+            return alternatives
         except sr.UnknownValueError:
-            self.log.warning("Google Speech Recognition could not understand audio")
-            self.raw_text_queue.put(self.NOT_RECOGNIZED)
+            self.log.warning(f"The {self.transcriber.name} transcriber could not understand audio")
+            return [self.NOT_RECOGNIZED]
         except sr.RequestError as e:
-            self.log.error(f"Could not request results from Google Speech Recognition service; {e}")
+            self.log.error(f"Could not request results from the {self.transcriber.name} transcriber; {e}")
+            return None
+
+    def _stream_in_background(self):
+        """
+        This function starts streaming the microphone's audio to the transcriber, on a separate thread.
+
+        Output:
+            - return: a function that stops the streaming (like the one returned by the SpeechRecognition library's
+                listen_in_background())
+        """
+        stop_event = threading.Event()
+        stream_thread = threading.Thread(target=self._stream_audio, args=(stop_event,), daemon=True)
+        stream_thread.start()
+
+        def stopper(wait_for_stop=True):
+            stop_event.set()
+            if wait_for_stop:
+                stream_thread.join()
+        return stopper
+
+    def _stream_audio(self, stop_event):
+        """
+        This function reads the microphone's audio in chunks until the stop event is set. An utterance starts with the
+        first chunk that is louder than the energy threshold, and ends after PAUSE_THRESHOLD seconds of quieter chunks.
+        Every chunk of an utterance is streamed to the transcriber.
+
+        Output:
+            - queue: a PartialTranscript whenever the transcript of the utterance so far changes or becomes stable,
+                then the alternative transcripts of the whole utterance (or [NOT_RECOGNIZED]) when it ends
+        """
+        with self.mic as source:
+            seconds_per_chunk = source.CHUNK / source.SAMPLE_RATE
+            num_pause_chunks = int(math.ceil(self.recognizer.pause_threshold / seconds_per_chunk))
+            num_stable_chunks = int(math.ceil(STABLE_PARTIAL_DURATION / seconds_per_chunk))
+            is_speaking = False
+            while not stop_event.is_set():
+                chunk = source.stream.read(source.CHUNK)
+                is_loud = audioop.rms(chunk, source.SAMPLE_WIDTH) > self.recognizer.energy_threshold
+                if not is_speaking:
+                    if not is_loud:
+                        continue
+                    is_speaking = True
+                    num_quiet_chunks = num_unchanged_chunks = 0
+                    partial_text = ''
+                    if self.on_audio is not None:
+                        self.on_audio()
+                    self.transcriber.start_utterance()
+
+                text = self.transcriber.process_audio(sr.AudioData(chunk, source.SAMPLE_RATE, source.SAMPLE_WIDTH))
+                num_quiet_chunks = 0 if is_loud else num_quiet_chunks + 1
+                if text != partial_text:
+                    partial_text, num_unchanged_chunks = text, 0
+                    if text != '':
+                        self.raw_text_queue.put(PartialTranscript(text, is_stable=False))
+                else:
+                    num_unchanged_chunks += 1
+                    if num_unchanged_chunks == num_stable_chunks and text != '':
+                        self.raw_text_queue.put(PartialTranscript(text, is_stable=True))
+
+                if num_quiet_chunks >= num_pause_chunks:
+                    is_speaking = False
+                    self._end_utterance()
+            if is_speaking:
+                self._end_utterance()
+
+    def _end_utterance(self):
+        """
+        This function puts the alternative transcripts of a streamed utterance in the queue, once it has ended.
+        """
+        try:
+            alternatives = self.transcriber.end_utterance()
+            self.raw_text_queue.put(alternatives)
+            self.log.info(f"Put {alternatives} into the raw text queue")
+        except sr.UnknownValueError:
+            self.log.warning(f"The {self.transcriber.name} transcriber could not understand audio")
+            self.raw_text_queue.put([self.NOT_RECOGNIZED])
+
+
+class PartialTranscript:
+    """
+    The transcript of the part of an utterance heard so far (see the SpeechRecognizer's streaming), with:
+        (a) self.text: the transcript
+        (b) self.is_stable: True if the transcript stayed the same for STABLE_PARTIAL_DURATION seconds
+    """
+    def __init__(self, text, is_stable):
+        self.text = text
+        self.is_stable = is_stable
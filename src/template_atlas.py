@@ -0,0 +1,91 @@
+"""
+This file builds and loads the template atlas: every reference image of the chess pieces (res/chess-piece-images/),
+packed into a single NumPy file. Loading the atlas is a single memory-mapped read, instead of decoding every image.
+
+The atlas is built from the reference images, and must be rebuilt whenever they change. To rebuild it (from the
+repository's root directory):
+    python -m src.template_atlas
+"""
+import logging
+import os
+import numpy as np
+from PIL import Image
+
+IMG_DIRECTORY = 'res/chess-piece-images/'
+ATLAS_FILE = 'res/chess-piece-atlas.npy'
+REFERENCE_IMG_DIM = 33 # width and height in pixels
+# Each record of the atlas is one reference image: the image of a piece (of a given color) on a tile (of a given color)
+ATLAS_DTYPE = np.dtype([('name', 'U6'),
+                        ('color', 'U5'),
+                        ('tile_color', 'U5'),
+                        ('img', np.uint8, (REFERENCE_IMG_DIM, REFERENCE_IMG_DIM))])
+
+_atlas = None
+_atlas_index = None # the index of each record in the atlas, by (name, color, tile color)
+
+
+def build_atlas(img_directory=IMG_DIRECTORY, atlas_file=ATLAS_FILE):
+    """
+    This function packs every reference image of a directory into an atlas, and saves it.
+
+    Parameters:
+        - img_directory: the directory of reference images, each named '<name>-<color>-<tile color>.png'
+            (ex: 'pawn-white-black.png' is a white pawn on a black tile)
+        - atlas_file: the file in which to save the atlas. If None, the atlas isn't saved
+    Output:
+        - return: the atlas, as a NumPy array of records with the ATLAS_DTYPE
+    """
+    fnames = sorted(fname for fname in os.listdir(img_directory) if fname.endswith('.png'))
+    atlas = np.empty(len(fnames), dtype=ATLAS_DTYPE)
+    for ndx, fname in enumerate(fnames):
+        name, color, tile_color = fname[:-len('.png')].split('-')
+        atlas[ndx] = (name, color, tile_color, np.array(Image.open(os.path.join(img_directory, fname))))
+    if atlas_file is not None:
+        np.save(atlas_file, atlas)
+    return atlas
+
+
+def load_atlas():
+    """
+    This function loads the atlas (memory-mapped, read-only). The atlas is only loaded once, and shared by every
+    ChessPiece (and so, by every PieceClassifier). If the atlas file is missing, it's built from the reference images.
+
+    Output:
+        - return: the atlas, as a NumPy array of records with the ATLAS_DTYPE
+    """
+    global _atlas, _atlas_index
+    if _atlas is None:
+        try:
+            _atlas = np.load(ATLAS_FILE, mmap_mode='r')
+        except FileNotFoundError:
+            log = logging.getLogger(__name__)
+            log.warning(f"Template atlas not found at {ATLAS_FILE}. Building it from {IMG_DIRECTORY}")
+            try:
+                _atlas = build_atlas()
+            except OSError:
+                log.warning("Unable to save the template atlas", exc_info=True)
+                _atlas = build_atlas(atlas_file=None)
+        _atlas_index = {(str(record['name']), str(record['color']), str(record['tile_color'])): ndx
+                        for ndx, record in enumerate(_atlas)}
+    return _atlas
+
+
+def get_reference_imgs(name, color):
+    """
+    This function gets a piece's reference images from the atlas.
+
+    Parameters:
+        - name: the piece's name (like 'rook', or 'empty')
+        - color: the piece's color ('black', 'white', or 'empty')
+    Output:
+        - return: a list of two read-only NumPy arrays: the piece's image on a black tile, then on a white tile
+    Raises:
+        - KeyError: if the atlas doesn't have the piece's images
+    """
+    atlas = load_atlas()
+    return [atlas['img'][_atlas_index[(name, color, tile_color)]] for tile_color in ('black', 'white')]
+
+
+if __name__ == '__main__':
+    built_atlas = build_atlas()
+    print(f"Packed {len(built_atlas)} reference images into {ATLAS_FILE} ({built_atlas.nbytes} bytes)")
@@ -2,13 +2,16 @@
 This class handles the following process:
 text -> words -> commands
 """
-import yaml
+import re
 import logging
-from src.command import Command
-from src.command import MoveCommand
+from src.command_parser import CommandParser
+from src.keyword_matcher import KeywordMatcher
 
 COMMAND_DICTIONARY_FILE = 'res/speech-to-command/command_dictionary.yaml'
 MISINTERPRETATIONS_FILE = 'res/speech-to-command/misinterpretations.txt'
+MISINTERPRETATION_WORD = re.compile(r"[^\s.,!?]+") # the words in which misinterpretations are looked for
+MISINTERPRETATION_END = '' # the key of the expected interpretation, in the trie node of a misinterpretation's last word
+PUNCTUATION = '.,!?' # the punctuation that is removed from around the unknown words (ex: "help?" ===> "help")
 
 
 class TextToCmdBuffer:
@@ -23,18 +26,18 @@ class TextToCmdBuffer:
         self.log = logging.getLogger(__name__)
         self.words = []
 
-        # Load keywords and command formats from a file
-        self.command_formats = []
-        self.keywords_dictionary = {}
-        with open(COMMAND_DICTIONARY_FILE) as cmd_dict_file:
-            cmd_dictionary = yaml.safe_load(cmd_dict_file)
-            for key, value in cmd_dictionary.items():
-                if key == 'keywords':
-                    self.keywords_dictionary = value
-            for key, value in cmd_dictionary.items():
-                if key == 'command_formats':
-                    for format_type, command_type in value.items():
-                        self.command_formats.append(CommandFormat(format_type, command_type))
+        # Load keywords and command formats from the compiled command dictionary
+        self.parser = CommandParser.load(COMMAND_DICTIONARY_FILE)
+        self.keywords_dictionary = self.parser.keywords_dictionary
+        self.command_formats = [CommandFormat(format_type, command_type)
+                                for format_type, command_type in self.parser.command_formats]
+
+        self.vocabulary = {str(word) for words in self.keywords_dictionary.values() for word in words}
+        # The single commands act as soon as they're heard (ex: "exit" quits the app), so ordinary words that sound
+        # like them (ex: "exist", "paws") must never be taken for them: they're only recognized when heard exactly
+        self.keyword_matcher = KeywordMatcher(self.vocabulary - {str(word) for word
+                                                                 in self.keywords_dictionary['single_command_words']})
+        self.num_matched_words = 0 # the number of unknown words replaced with the keyword they sound or look like
 
         self.start_cmd_words = self.keywords_dictionary['single_command_words'].copy()
         self.start_move_words = self.keywords_dictionary['start_move_words'].copy()
@@ -47,12 +50,14 @@ class TextToCmdBuffer:
                 actual, expected = line.split(',')
                 expected = expected.rstrip('\n')
                 self.misinterpretations.append(Misinterpretation(actual, expected))
+        self.misinterpretation_trie = _build_misinterpretation_trie(self.misinterpretations)
 
     ''' PUBLIC FUNCTIONS '''
     def add_text(self, raw_text):
         """
         Convert raw text into a list of new words and update the word buffer accordingly.
 
+        Unknown words are replaced with the keywords they sound or look like (ex: "rock" ===> "rook").
         All new words that precede a "start command" word are discarded (if the word buffer is empty),
         and all new words that precede the word "cancel" are discard. The word buffer is emptied if a new command is
         being started. Otherwise, the new words are simply appended to the word buffer.
@@ -73,6 +78,9 @@ class TextToCmdBuffer:
         # Split up the single string into multiple words
         new_words = self._split_into_words(reinterpreted_text)
 
+        # Replace the unknown words with the keywords they sound or look like, if any
+        new_words = self._match_unknown_words(new_words)
+
         # Discard all new words that precede a "start command" word (if the old word buffer is empty)
         # and discard all new words that precede the word "cancel"
         for i, word in reversed(list(enumerate(new_words))):
@@ -83,6 +91,10 @@ class TextToCmdBuffer:
                 if len(new_words) > i + 1:
                     new_words = new_words[i+1:]
 
+        if len(new_words) == 0:
+            self.log.debug("No words to add")
+            return self.words
+
         # Empty the old word buffer if the first new word is a "start command" word
         if new_words[0] in self.start_cmd_words:
             self.clear()
@@ -110,40 +122,9 @@ class TextToCmdBuffer:
         Return:
             - command: a move command (ie. Move object), a normal command (ie. Command object), or None
         """
-        command = None
-        word_ndx = 0
-        possible_formats = self.command_formats.copy()
-
         self.log.debug(f"Before command extraction: {self.words}")
 
-        # Check to see if the sequence of the first 'word_ndx' number of words matches a command format
-        while word_ndx < len(self.words) and len(possible_formats) > 0:
-            format_ndx = 0
-
-            # Loop through every possible format
-            while format_ndx < len(possible_formats):
-                possible_format = possible_formats[format_ndx]
-
-                if self.words[word_ndx] in self.keywords_dictionary[possible_format.get_word_type(word_ndx)]:
-                    # Fix the 2/to misinterpretation
-                    if self.words[word_ndx] == '2' and possible_format.get_word_type(word_ndx) == 'to':
-                        self.words[word_ndx] = 'to'
-
-                    # If the first 'word_ndx' number of words matches a command format,
-                    # set the return value to the command that the first 'word_ndx' number of words represents
-                    if possible_format.length == word_ndx + 1:
-                        if possible_format.name.find('move') != -1:
-                            command = MoveCommand(self.words[:word_ndx + 1])
-                        elif possible_format.name.find('single') != -1:
-                            command = Command(self.words[:word_ndx + 1])
-                        possible_formats.pop(format_ndx)
-                    else:
-                        format_ndx += 1
-
-                # Remove all invalid formats
-                else:
-                    possible_formats.pop(format_ndx)
-            word_ndx += 1
+        command = self.parser.parse(self.words)
 
         if command is not None:
             del self.words[:command.length]
@@ -152,6 +133,60 @@ class TextToCmdBuffer:
 
         return command
 
+    def parse_alternatives(self, raw_texts):
+        """
+        Parse every alternative transcript of the same audio, as if it was added to the buffer (see add_text() and
+        get_command()), without changing the buffer. Call accept() with the chosen alternative to update the buffer.
+
+        Parameters:
+            - raw_texts: a list of alternative strings, from the most to the least likely
+        Return:
+            - a list of ParsedText objects, in the same order (without the alternatives that have no words)
+        """
+        parsed_texts = []
+        original_words = self.words
+        for rank, raw_text in enumerate(raw_texts):
+            if raw_text.strip() == '':
+                continue
+            self.words = original_words.copy()
+            buffer_state = self.add_text(raw_text).copy()
+            command = self.get_command()
+            parsed_texts.append(ParsedText(rank, raw_text, buffer_state, command, self.words))
+        self.words = original_words
+        return parsed_texts
+
+    def accept(self, parsed_text):
+        """
+        Update the buffer as if the given alternative (see parse_alternatives()) was added to it, and its command was
+        extracted.
+
+        Parameters:
+            - parsed_text: a ParsedText object returned by parse_alternatives()
+        """
+        self.words = parsed_text.remaining_words.copy()
+
+    def is_complete(self, parsed_text):
+        """
+        Determine if more words can't change the command of a parsed text (see parse_alternatives()): a command was
+        extracted, no words follow it, and no longer command format starts with the command's words.
+        (ex: "knight to f3" is complete, but "knight f3" isn't, since it could be followed by "to g5")
+
+        Parameters:
+            - parsed_text: a ParsedText object returned by parse_alternatives()
+        Return:
+            - True if the command is complete, else False
+        """
+        command = parsed_text.command
+        if command is None or len(parsed_text.remaining_words) > 0:
+            return False
+        command_words = parsed_text.buffer_state[:command.length]
+        for command_format in self.command_formats:
+            if command_format.length > command.length and all(
+                    word in self.keywords_dictionary[command_format.get_word_type(word_ndx)]
+                    for word_ndx, word in enumerate(command_words)):
+                return False
+        return True
+
     def clear(self):
         """
         Clear the TextToCmdBuffer of every word.
@@ -161,7 +196,10 @@ class TextToCmdBuffer:
     ''' PRIVATE FUNCTIONS '''
     def _fix_misinterpretations(self, text):
         """
-        Fix commonly misinterpreted words.
+        Fix commonly misinterpreted words, in a single pass from left to right over the words of the text. At each
+        word, the longest misinterpreted phrase that starts with it (in words) is replaced, and the search continues
+        after the phrase, so that a replacement is never reinterpreted. Only whole words are replaced
+        (ex: "night" is replaced in "night f3", but not in "knight f3").
 
         Parameters:
             - text: a lowercase string to be reinterpreted
@@ -169,12 +207,57 @@ class TextToCmdBuffer:
             - the string with corrected misinterpretations
         """
         self.log.debug(f"Text (with misinterpretations): {text}")
-        fixed_text = text
-        for misinterpretation in self.misinterpretations:
-            fixed_text = fixed_text.replace(misinterpretation.actual, misinterpretation.expected)
+        word_spans = [match.span() for match in MISINTERPRETATION_WORD.finditer(text)]
+        words = [text[start:end] for start, end in word_spans]
+        fixed_parts = []
+        fixed_end = 0 # the end of the text that has been reinterpreted
+        word_ndx = 0
+        while word_ndx < len(words):
+            # Follow the trie for as long as the words match, and remember the longest misinterpretation found
+            node = self.misinterpretation_trie
+            expected, phrase_end = None, word_ndx
+            for next_ndx in range(word_ndx, len(words)):
+                node = node.get(words[next_ndx])
+                if node is None:
+                    break
+                if MISINTERPRETATION_END in node:
+                    expected, phrase_end = node[MISINTERPRETATION_END], next_ndx + 1
+            if expected is None:
+                word_ndx += 1
+                continue
+            fixed_parts.extend([text[fixed_end:word_spans[word_ndx][0]], expected])
+            fixed_end = word_spans[phrase_end - 1][1]
+            word_ndx = phrase_end
+        fixed_parts.append(text[fixed_end:])
+        fixed_text = ''.join(fixed_parts)
         self.log.debug(f"Text (without misinterpretations): {fixed_text}")
         return fixed_text
 
+    def _match_unknown_words(self, words):
+        """
+        Replace every word that isn't a keyword with the keyword that it sounds or looks like (see KeywordMatcher), if
+        there is one, once its punctuation is removed. Other unknown words are kept, and punctuation on its own is
+        removed.
+
+        Parameters:
+            - words: a list of words
+        Return:
+            - the list of words, with the matched keywords
+        """
+        matched_words = []
+        for word in words:
+            if word not in self.vocabulary:
+                word = word.strip(PUNCTUATION)
+                if word == '':
+                    continue
+            keyword = self.keyword_matcher.match(word) if word not in self.vocabulary else None
+            if keyword is not None:
+                self.num_matched_words += 1
+                self.log.debug(f"Unknown word \"{word}\" matched to \"{keyword}\" "
+                               f"({self.num_matched_words} matched words)")
+            matched_words.append(keyword if keyword is not None else word)
+        return matched_words
+
     @staticmethod
     def _split_into_words(text):
         """
@@ -207,11 +290,7 @@ class TextToCmdBuffer:
         words.append(temp_alpha)
 
         # Remove empty words
-        for i, part in enumerate(words):
-            if part == '':
-                words.remove(part)
-
-        return words
+        return [word for word in words if word != '']
 
 
 class CommandFormat:
@@ -248,6 +327,23 @@ class CommandFormat:
             return ""
 
 
+class ParsedText:
+    """
+    For every alternative transcript parsed by the TextToCmdBuffer, there is
+        (a) self.rank: the rank of the alternative (0 for the most likely)
+        (b) self.raw_text: the alternative's raw text
+        (c) self.buffer_state: the list of words in the word buffer after the alternative is added
+        (d) self.command: the command extracted from the word buffer (or None)
+        (e) self.remaining_words: the list of words left in the word buffer after the command is extracted
+    """
+    def __init__(self, rank, raw_text, buffer_state, command, remaining_words):
+        self.rank = rank
+        self.raw_text = raw_text
+        self.buffer_state = buffer_state
+        self.command = command
+        self.remaining_words = remaining_words
+
+
 class Misinterpretation:
     """
     For every common misinterpretation, there is
@@ -257,3 +353,24 @@ class Misinterpretation:
     def __init__(self, actual, expected):
         self.actual = actual
         self.expected = expected
+
+
+''' HELPER FUNCTIONS '''
+def _build_misinterpretation_trie(misinterpretations):
+    """
+    Build a trie of the misinterpreted phrases, word by word: every node is a dictionary of the next nodes by word,
+    and the node of a phrase's last word has its expected interpretation at MISINTERPRETATION_END. If a phrase is
+    misinterpreted more than once, its first interpretation is kept.
+
+    Parameters:
+        - misinterpretations: a list of Misinterpretation objects
+    Return:
+        - the root node of the trie
+    """
+    trie = {}
+    for misinterpretation in misinterpretations:
+        node = trie
+        for word in MISINTERPRETATION_WORD.findall(misinterpretation.actual):
+            node = node.setdefault(word, {})
+        node.setdefault(MISINTERPRETATION_END, misinterpretation.expected)
+    return trie
@@ -0,0 +1,298 @@
+"""
+This file defines the transcribers (i.e. speech recognition backends) that the SpeechRecognizer can turn audio into text
+with:
+    (a) GoogleTranscriber: sends the audio to the Google Web Speech API (the default)
+    (b) SphinxTranscriber: transcribes the audio on this machine with CMU PocketSphinx (see SPHINX_REQUIREMENT), which
+        works offline. Only the commands of the command dictionary can be recognized (see build_grammar())
+    (c) ReplayTranscriber: a stand-in for the recordings replayed by a ReplayAudioSource, which knows their transcripts
+"""
+import abc
+import os
+import logging
+import threading
+import time
+import yaml
+import speech_recognition as sr
+
+from src.audio_source import REPLAY_SAMPLE_WIDTH, load_recordings
+
+TRANSCRIBER_NAMES = ['google', 'sphinx', 'replay']
+COMMAND_DICTIONARY_FILE = 'res/speech-to-command/command_dictionary.yaml'
+GRAMMAR_FILE = 'cache/commands.jsgf' # generated from the command dictionary
+GRAMMAR_NAME = 'commands'
+# The PocketSphinx release that the SphinxTranscriber uses (5.x and later no longer have the pocketsphinx.pocketsphinx
+# module, nor Decoder.default_config())
+SPHINX_REQUIREMENT = 'pocketsphinx==0.1.15'
+SPHINX_SAMPLE_RATE = 16000 # the sample rate (in Hz) of PocketSphinx's acoustic model
+SPHINX_SAMPLE_WIDTH = 2 # the sample width (in bytes) of PocketSphinx's acoustic model
+# The digits of the command dictionary, as they are spoken (and written in the pronunciation dictionary)
+SPOKEN_DIGITS = {'1': 'one', '2': 'two', '3': 'three', '4': 'four', '5': 'five', '6': 'six', '7': 'seven', '8': 'eight'}
+
+
+def create_transcriber(name, replay_path=None):
+    """
+    This function creates a transcriber from its name.
+
+    Parameters:
+        - name: one of the names in TRANSCRIBER_NAMES
+        - replay_path: the audio file or directory of audio files that is replayed (only used by the 'replay'
+            transcriber)
+    Output:
+        - return: a Transcriber object
+    """
+    if name == 'google':
+        transcriber = GoogleTranscriber()
+    elif name == 'sphinx':
+        transcriber = SphinxTranscriber()
+    elif name == 'replay':
+        transcriber = ReplayTranscriber(replay_path)
+    else:
+        raise ValueError(f"Unknown transcriber: {name}. Expected one of: {', '.join(TRANSCRIBER_NAMES)}")
+    return transcriber
+
+
+class Transcriber(abc.ABC):
+    """
+    A Transcriber turns a chunk of audio (an AudioData instance from the SpeechRecognition library) into a list of
+    alternative transcripts, from the most to the least likely (see transcribe()). Like the SpeechRecognition library,
+    it raises sr.UnknownValueError if the audio isn't recognized, and sr.RequestError if the backend fails.
+
+    A thread-safe transcriber can transcribe several chunks of audio at the same time (see the TranscriptionPool).
+    Only a StreamingTranscriber can transcribe an utterance as it's heard.
+    """
+    name = None
+    supports_streaming = False
+    is_thread_safe = False
+    sample_rate = None # the sample rate (in Hz) that the transcriber expects, if any
+
+    @abc.abstractmethod
+    def transcribe(self, audio):
+        pass
+
+
+class StreamingTranscriber(Transcriber):
+    """
+    A StreamingTranscriber can also transcribe an utterance as it's heard:
+        (a) start_utterance(): called when the user starts speaking
+        (b) process_audio(audio): called with every chunk of audio, returns the transcript of the utterance so far
+        (c) end_utterance(): called after the user stops speaking, returns the alternative transcripts of the whole
+            utterance (like transcribe())
+    The audio of a stream must have the transcriber's sample rate (if it has one).
+    """
+    supports_streaming = True
+
+    @abc.abstractmethod
+    def start_utterance(self):
+        pass
+
+    @abc.abstractmethod
+    def process_audio(self, audio):
+        pass
+
+    @abc.abstractmethod
+    def end_utterance(self):
+        pass
+
+
+class GoogleTranscriber(Transcriber):
+    """
+    The GoogleTranscriber sends the audio to the Google Web Speech API, which returns the N best transcripts. Its
+    latency depends on the network, and it doesn't work offline. Every transcription is a separate request, so
+    several chunks of audio can be transcribed at the same time.
+    """
+    name = 'google'
+    is_thread_safe = True
+
+    ''' CONSTRUCTOR '''
+    def __init__(self):
+        self.recognizer = sr.Recognizer()
+
+    ''' PUBLIC FUNCTIONS '''
+    def transcribe(self, audio):
+        # With show_all, the API's response is returned as is: an empty list if the audio isn't recognized,
+        # else a dictionary with the list of alternatives
+        response = self.recognizer.recognize_google(audio, show_all=True)
+        alternatives = []
+        if isinstance(response, dict):
+            alternatives = [alternative['transcript'] for alternative in response.get('alternative', [])
+                            if alternative.get('transcript', '').strip() != '']
+        if len(alternatives) == 0:
+            raise sr.UnknownValueError()
+        return alternatives
+
+
+class SphinxTranscriber(StreamingTranscriber):
+    """
+    The SphinxTranscriber transcribes the audio with CMU PocketSphinx, using the English models that come with the
+    SpeechRecognition library. The decoder is restricted to a JSGF grammar of the commands (see build_grammar()), so
+    that only commands can be heard, which makes the small offline models accurate enough for a few dozen words.
+
+    The decoder is loaded once, since loading the models takes much longer than decoding a command. PocketSphinx
+    only returns the best transcript when it's restricted to a grammar, so there is a single alternative. The decoder
+    can stream: its hypothesis is updated with every chunk of audio. Since there is a single decoder, it can only
+    transcribe one chunk of audio at a time.
+    """
+    name = 'sphinx'
+    sample_rate = SPHINX_SAMPLE_RATE
+
+    ''' CONSTRUCTOR '''
+    def __init__(self, dictionary_file=COMMAND_DICTIONARY_FILE, grammar_file=GRAMMAR_FILE):
+        """
+        Parameters:
+            - dictionary_file: the command dictionary from which the grammar is built
+            - grammar_file: where to write the grammar (it's only rewritten when it doesn't match the command
+                dictionary)
+        """
+        try:
+            from pocketsphinx import pocketsphinx
+            pocketsphinx.Decoder.default_config
+        except (ImportError, AttributeError) as e:
+            raise ImportError(f"The sphinx transcriber requires {SPHINX_REQUIREMENT} "
+                              f"(pip install {SPHINX_REQUIREMENT}): {e}") from e
+        self.log = logging.getLogger(__name__)
+        write_grammar(dictionary_file, grammar_file)
+
+        model_dir = os.path.join(os.path.dirname(os.path.realpath(sr.__file__)), 'pocketsphinx-data', 'en-US')
+        config = pocketsphinx.Decoder.default_config()
+        config.set_string('-hmm', os.path.join(model_dir, 'acoustic-model'))
+        config.set_string('-dict', os.path.join(model_dir, 'pronounciation-dictionary.dict'))
+        config.set_string('-jsgf', grammar_file)
+        config.set_string('-logfn', os.devnull)
+        self.decoder = pocketsphinx.Decoder(config)
+        self.log.info(f"Loaded the PocketSphinx decoder with the grammar {grammar_file}")
+
+    ''' PUBLIC FUNCTIONS '''
+    def transcribe(self, audio):
+        self.start_utterance()
+        self._process_raw_data(audio, is_full_utterance=True)
+        return self.end_utterance()
+
+    def start_utterance(self):
+        self.decoder.start_utt()
+
+    def process_audio(self, audio):
+        self._process_raw_data(audio, is_full_utterance=False)
+        return self._get_hypothesis()
+
+    def end_utterance(self):
+        self.decoder.end_utt()
+        hypothesis = self._get_hypothesis()
+        if hypothesis == '':
+            raise sr.UnknownValueError()
+        return [hypothesis]
+
+    ''' PRIVATE FUNCTIONS '''
+    def _process_raw_data(self, audio, is_full_utterance):
+        raw_data = audio.get_raw_data(convert_rate=SPHINX_SAMPLE_RATE, convert_width=SPHINX_SAMPLE_WIDTH)
+        self.decoder.process_raw(raw_data, False, is_full_utterance)
+
+    def _get_hypothesis(self):
+        """
+        This function returns the decoder's current transcript, with digits (an empty string if nothing was heard).
+        """
+        hypothesis = self.decoder.hyp()
+        return from_spoken_words(hypothesis.hypstr) if hypothesis is not None else ''
+
+
+class ReplayTranscriber(Transcriber):
+    """
+    The ReplayTranscriber is a stand-in for a speech recognition backend, for the recordings replayed by a
+    ReplayAudioSource: it finds the recording whose samples are in the audio, and returns the recording's transcript
+    (see load_recordings()). Since it needs no network and no models, the rest of the voice pipeline can be tested and
+    benchmarked on its own. A latency can be added to every transcription to simulate a real backend.
+
+    The recordings are loaded again at the sample rate of the audio, the first time that it's heard, so that their
+    samples are converted exactly like the replayed ones.
+    """
+    name = 'replay'
+    is_thread_safe = True
+
+    ''' CONSTRUCTOR '''
+    def __init__(self, replay_path, latency=0.0):
+        """
+        Parameters:
+            - replay_path: the audio file or directory of audio files that is replayed
+            - latency: the time (in seconds) that every transcription takes
+        """
+        if replay_path is None:
+            raise ValueError("The replay transcriber needs the path of the replayed audio")
+        self.replay_path = replay_path
+        self.latency = latency
+        self.recordings = {} # the (transcript, raw data) tuples of the recordings, by sample rate
+        self.lock = threading.Lock()
+
+    ''' PUBLIC FUNCTIONS '''
+    def transcribe(self, audio):
+        if self.latency > 0:
+            time.sleep(self.latency)
+        raw_data = audio.get_raw_data(convert_width=REPLAY_SAMPLE_WIDTH)
+        for transcript, recording_data in self._get_recordings(audio.sample_rate):
+            if recording_data in raw_data:
+                return [transcript]
+        raise sr.UnknownValueError()
+
+    ''' PRIVATE FUNCTIONS '''
+    def _get_recordings(self, sample_rate):
+        with self.lock:
+            if sample_rate not in self.recordings:
+                recordings, _ = load_recordings(self.replay_path, sample_rate)
+                self.recordings[sample_rate] = [(transcript, raw_data) for _, transcript, raw_data in recordings
+                                                if len(raw_data) > 0]
+            return self.recordings[sample_rate]
+
+
+''' HELPER FUNCTIONS '''
+def build_grammar(command_dictionary):
+    """
+    This function builds a JSGF grammar from the command dictionary: every command format is a sequence of its
+    keywords (ex: "knight to f three"). Digits are written as they are spoken.
+
+    Parameters:
+        - command_dictionary: the loaded command dictionary, with its 'keywords' and 'command_formats'
+    Output:
+        - return: the grammar, as a string
+    """
+    keywords = command_dictionary['keywords']
+    command_formats = command_dictionary['command_formats']
+    lines = ['#JSGF V1.0;', f'grammar {GRAMMAR_NAME};',
+             f"public <{GRAMMAR_NAME}> = {' | '.join(f'<{name}>' for name in command_formats)};"]
+    for name, components in command_formats.items():
+        lines.append(f"<{name}> = {' '.join(f'<{component}>' for component in components)};")
+    for word_type in sorted({component for components in command_formats.values() for component in components}):
+        spoken_words = []
+        for word in keywords[word_type]:
+            spoken_word = SPOKEN_DIGITS.get(str(word), str(word))
+            if spoken_word not in spoken_words:
+                spoken_words.append(spoken_word)
+        lines.append(f"<{word_type}> = {' | '.join(spoken_words)};")
+    return '\n'.join(lines) + '\n'
+
+
+def write_grammar(dictionary_file, grammar_file):
+    """
+    This function writes the JSGF grammar of a command dictionary (see build_grammar()) to a file, unless the file
+    already has this exact grammar. Since the file is checked against the grammar itself, it's rewritten whenever it
+    was modified, or built from another command dictionary.
+    """
+    with open(dictionary_file) as cmd_dict_file:
+        grammar = build_grammar(yaml.safe_load(cmd_dict_file))
+    try:
+        with open(grammar_file) as jsgf_file:
+            if jsgf_file.read() == grammar:
+                return
+    except OSError:
+        pass
+    # Write to a temporary file first, so that another process never reads a partly written grammar
+    os.makedirs(os.path.dirname(grammar_file), exist_ok=True)
+    temp_file = f"{grammar_file}.{os.getpid()}.tmp"
+    with open(temp_file, 'w') as jsgf_file:
+        jsgf_file.write(grammar)
+    os.replace(temp_file, grammar_file)
+
+
+def from_spoken_words(text):
+    """
+    This function writes the spoken digits of a transcript as digits (ex: "knight f three" ===> "knight f 3").
+    """
+    digits = {spoken_word: digit for digit, spoken_word in SPOKEN_DIGITS.items()}
+    return ' '.join(digits.get(word, word) for word in text.split())
@@ -0,0 +1,173 @@
+"""
+This file defines the TranscriptionPool, which the SpeechRecognizer uses to transcribe chunks of audio on several
+threads, without blocking the thread that listens to the microphone.
+"""
+import logging
+import queue
+import threading
+import time
+import numpy as np
+
+NUM_WORKERS = 3 # the number of chunks of audio that can be transcribed at the same time
+MAX_PENDING_CHUNKS = 10 # the most chunks of audio that can wait for a worker (more are dropped)
+METRICS_LOG_INTERVAL = 60.0 # the time (in seconds) between two logs of the pool's metrics
+
+
+class TranscriptionPool:
+    """
+    The TranscriptionPool transcribes chunks of audio on a bounded number of worker threads, so that a slow
+    transcription (ex: a network request to the Google Web Speech API) doesn't hold up the next chunks:
+        (a) submit(audio) gives the chunk a sequence number and puts it in a bounded queue, without waiting for it to be
+            transcribed. If 'max_pending_chunks' chunks are already waiting for a worker, the chunk is dropped
+        (b) the first idle worker transcribes the chunk
+        (c) the transcripts are put in the output queue in the order in which their chunks were submitted: a transcript
+            is held back until the transcripts of all the chunks submitted before it are delivered
+    The workers are daemon threads, which wait for chunks for as long as the program runs.
+
+    To help tune the number of workers, the pool keeps track of the queue's depth (the number of chunks waiting for a
+    worker), and of how long each chunk waits for a worker (see get_metrics()).
+    """
+
+    ''' CONSTRUCTOR '''
+    def __init__(self, transcribe, output_queue, num_workers=NUM_WORKERS, max_pending_chunks=MAX_PENDING_CHUNKS):
+        """
+        Parameters:
+            - transcribe: the function that transcribes a chunk of audio. It returns what to put in the output queue,
+                or None to put nothing (the chunk's place in the order is still skipped)
+            - output_queue: the queue in which to put the transcripts, in order
+            - num_workers: the number of worker threads
+            - max_pending_chunks: the most chunks of audio that can wait for a worker
+        """
+        self.log = logging.getLogger(__name__)
+        self.transcribe = transcribe
+        self.output_queue = output_queue
+        self.num_workers = max(num_workers, 1)
+        self.pending_chunks = queue.Queue(maxsize=max_pending_chunks) # (sequence number, audio, submit time) tuples
+        self.workers = []
+        self.lock = threading.RLock() # guards the submissions and the metrics
+
+        self.num_submitted = 0 # the sequence number of the next chunk
+        self.num_delivered = 0 # the sequence number of the next transcript to put in the output queue
+        self.transcripts = {} # the transcripts that wait for the transcripts before them, by sequence number
+        self.delivery_lock = threading.Lock()
+
+        self._reset_metrics()
+
+    ''' PUBLIC FUNCTIONS '''
+    def start(self):
+        """
+        This function starts the worker threads, unless they were already started.
+        """
+        if len(self.workers) > 0:
+            return
+        for worker_ndx in range(self.num_workers):
+            worker = threading.Thread(target=self._work, name=f'transcription_{worker_ndx}', daemon=True)
+            worker.start()
+            self.workers.append(worker)
+        self.log.debug(f"Started {self.num_workers} transcription workers")
+
+    def submit(self, audio):
+        """
+        This function queues a chunk of audio to be transcribed, without waiting for it.
+
+        Parameters:
+            - audio: the chunk of audio, as given to the transcribe function
+        Output:
+            - return: True if the chunk was queued, False if it was dropped because too many chunks are waiting
+        """
+        with self.lock:
+            try:
+                self.pending_chunks.put_nowait((self.num_submitted, audio, time.perf_counter()))
+            except queue.Full:
+                self.num_dropped += 1
+                self.log.warning(f"{self.pending_chunks.maxsize} chunks of audio are waiting to be transcribed. "
+                                 f"Dropping the new chunk")
+                return False
+            self.num_submitted += 1
+            self.queue_depths.append(self.pending_chunks.qsize())
+        return True
+
+    def get_metrics(self):
+        """
+        This function returns the pool's metrics since the last reset (i.e. since the last log of the metrics).
+
+        Output:
+            - return: a dictionary with:
+                - elapsed_time: the wall time (in seconds) since the last reset
+                - num_transcribed, num_dropped: the number of chunks that were transcribed, and that were dropped
+                - queue_depth: the number of chunks currently waiting for a worker
+                - queue_depths: the number of chunks waiting for a worker, right after each chunk was submitted
+                - wait_times: the time (in seconds) that each transcribed chunk waited for a worker
+                - transcription_times: the time (in seconds) that each chunk took to transcribe
+        """
+        with self.lock:
+            return {
+                'elapsed_time': time.perf_counter() - self.metrics_start_time,
+                'num_transcribed': len(self.transcription_times),
+                'num_dropped': self.num_dropped,
+                'queue_depth': self.pending_chunks.qsize(),
+                'queue_depths': list(self.queue_depths),
+                'wait_times': list(self.wait_times),
+                'transcription_times': list(self.transcription_times),
+            }
+
+    ''' PRIVATE FUNCTIONS '''
+    def _work(self):
+        """
+        This function transcribes the queued chunks of audio, one at a time, for as long as the program runs.
+        """
+        while True:
+            sequence_number, audio, submit_time = self.pending_chunks.get()
+            start_time = time.perf_counter()
+            try:
+                transcript = self.transcribe(audio)
+            except Exception:
+                # The chunk's place in the order must still be skipped, or the next transcripts would never be delivered
+                self.log.error("Unable to transcribe a chunk of audio", exc_info=True)
+                transcript = None
+            end_time = time.perf_counter()
+            with self.lock:
+                self.wait_times.append(start_time - submit_time)
+                self.transcription_times.append(end_time - start_time)
+            self._deliver(sequence_number, transcript)
+
+            if end_time - self.metrics_start_time >= METRICS_LOG_INTERVAL:
+                self._log_metrics()
+
+    def _deliver(self, sequence_number, transcript):
+        """
+        This function puts a transcript in the output queue, followed by the transcripts that were waiting for it, or
+        holds it back until the transcripts of the chunks submitted before it are delivered.
+        """
+        with self.delivery_lock:
+            self.transcripts[sequence_number] = transcript
+            while self.num_delivered in self.transcripts:
+                transcript = self.transcripts.pop(self.num_delivered)
+                self.num_delivered += 1
+                if transcript is not None:
+                    self.output_queue.put(transcript)
+
+    def _log_metrics(self):
+        """
+        This function logs the pool's metrics, then resets them.
+        """
+        with self.lock:
+            metrics = self.get_metrics()
+            if metrics['elapsed_time'] < METRICS_LOG_INTERVAL:
+                return # another worker just logged them
+            self._reset_metrics()
+        wait_times_ms = 1000 * np.array(metrics['wait_times'])
+        wait_summary = (f"mean {np.mean(wait_times_ms):.1f} ms, max {np.max(wait_times_ms):.1f} ms"
+                        if len(wait_times_ms) > 0 else "none")
+        max_queue_depth = max(metrics['queue_depths'], default=0)
+        self.log.info(f"Transcription over the last {metrics['elapsed_time']:.1f} s: "
+                      f"{metrics['num_transcribed']} chunks transcribed, {metrics['num_dropped']} dropped, "
+                      f"wait for a worker {wait_summary}, queue depth {metrics['queue_depth']} "
+                      f"(max {max_queue_depth})")
+
+    def _reset_metrics(self):
+        self.metrics_start_time = time.perf_counter()
+        self.num_dropped = 0
+        self.queue_depths = []
+        self.wait_times = []
+        self.transcription_times = []